@@ -1,3 +1,11 @@
 from coretypes.__version__ import __version__
+from coretypes.bars_frame import BarsFrame
+from coretypes.panel import IndexedBarsPanel
 from coretypes.quote_fetcher import QuotesFetcher
+from coretypes.securities import SecurityTable
+from coretypes.store import BarsStore
+from coretypes.symbols import SymbolTable
+from coretypes.sync import SyncEngine
+from coretypes.trade_calendar import TradingCalendar
 from coretypes.types import *
+from coretypes.valuation import ValuationCube
@@ -0,0 +1,308 @@
+"""复权计算
+
+`bars_dtype`中的`factor`字段为累积复权因子(后复权因子)。对任一参考时间点，复权后的价格为
+`price * factor / factor_ref`，成交量为`volume * factor_ref / factor`，成交额保持不变。
+
+- 前复权：以最后一根k线为参考点
+- 后复权：以第一根k线为参考点
+- 也可以指定任意参考日期，以该日期(含)之前最后一根k线为参考点
+
+本模块的函数对`BarsArray`、`BarsWithLimitArray`和`BarsPanel`都适用，对`BarsPanel`会按证券分别
+确定参考点，整个过程没有Python循环。复权后`factor`字段保持不变。
+
+`AdjustFactors`从除权除息记录(`xrxd_info_dtype`)和日线收盘价计算上述复权因子，以代替上游提供的
+`factor`。
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+from coretypes.symbols import SymbolTable
+from coretypes.types import BarsArray, Frame, code_id_dtype
+
+_price_cols = ("open", "high", "low", "close", "high_limit", "low_limit")
+
+
+def _ref_positions(
+    frames: np.ndarray,
+    groups: Optional[np.ndarray],
+    forward: bool,
+    ref: Optional[Frame],
+) -> np.ndarray:
+    """计算每一行所对应参考点所在的行号"""
+    n = len(frames)
+    if groups is None:
+        groups = np.zeros(n, dtype=np.int64)
+
+    order = np.lexsort((frames, groups))
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    counts = np.diff(np.r_[starts, n])
+
+    if ref is None:
+        pos = starts + counts - 1 if forward else starts
+    else:
+        # 每组中frame <= ref的最后一行，如果没有，则取该组的第一行
+        ref = np.datetime64(ref, "s")
+        candidates = np.where(frames[order] <= ref, np.arange(n), -1)
+        pos = np.maximum.reduceat(candidates, starts)
+        pos = np.where(pos < 0, starts, pos)
+
+    # 将每组的参考点展开到组内每一行，并还原为原始顺序
+    result = np.empty(n, dtype=np.int64)
+    result[order] = order[np.repeat(pos, counts)]
+    return result
+
+
+def adjust(
+    bars: BarsArray,
+    forward: bool = True,
+    ref: Optional[Frame] = None,
+    inplace: bool = False,
+) -> BarsArray:
+    """对行情数据进行复权
+
+    Args:
+        bars: `BarsArray`, `BarsWithLimitArray`或者`BarsPanel`
+        forward: 为真时进行前复权，否则进行后复权。如果指定了`ref`，则忽略此参数
+        ref: 参考日期。复权后，该日期(含)之前最后一根k线的价格与复权前相同
+        inplace: 为真时直接修改`bars`，避免拷贝
+
+    Returns:
+        复权后的行情数据。如果`inplace`为真，则返回`bars`本身
+    """
+    if not inplace:
+        bars = bars.copy()
+
+    if len(bars) == 0:
+        return bars
+
+    names = bars.dtype.names
+    groups = None
+    if "code" in names:
+        _, groups = np.unique(bars["code"], return_inverse=True)
+        groups = groups.reshape(-1)
+
+    factor = bars["factor"].astype(np.float64)
+    pos = _ref_positions(bars["frame"], groups, forward, ref)
+    ratio = factor / factor[pos]
+
+    for name in _price_cols:
+        if name in names:
+            col = bars[name]
+            np.multiply(col, ratio, out=col, casting="unsafe")
+
+    col = bars["volume"]
+    np.divide(col, ratio, out=col, casting="unsafe")
+
+    return bars
+
+
+xr_factor_dtype = np.dtype(
+    [
+        ("code", code_id_dtype),
+        ("frame", "datetime64[s]"),
+        ("ratio", "f8"),
+        ("factor", "f8"),
+    ]
+)
+"""除权除息事件的类型：code为`SymbolTable`中的编号，frame为除权除息日，ratio为该事件的复权比例，
+factor为(含)该事件之后的累积复权因子"""
+
+
+def _keys(ids: np.ndarray, frames: np.ndarray) -> np.ndarray:
+    """(证券编号, 时间)的合并键，可以直接排序和二分查找"""
+    seconds = frames.astype("datetime64[s]").astype(np.int64)
+    return (ids.astype(np.int64) << 35) + (seconds + (1 << 34))
+
+
+def _fill(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), 0.0, values)
+
+
+class AdjustFactors:
+    """由除权除息记录计算的累积复权因子(后复权因子)
+
+    每个除权除息事件的复权比例为`前收盘价 / 除权除息参考价`，其中
+
+    ```
+    除权除息参考价 = (前收盘价 - 每10股派息 / 10) / (1 + (每10股送股 + 每10股转增) / 10)
+    ```
+
+    前收盘价为除权除息日之前最后一个交易日的收盘价。某一日的累积复权因子是该证券在此日(含)之前所有
+    事件的复权比例之积，没有事件时为1。同一证券同一天的多条记录会合并为一个事件。
+
+    Examples:
+        >>> factors = AdjustFactors()  # doctest: +SKIP
+        >>> unresolved = factors.update(xrxd, daily_bars)  # doctest: +SKIP
+        >>> bars = factors.apply(bars, code="000001.XSHE")  # doctest: +SKIP
+        >>> adjust(bars)  # doctest: +SKIP
+    """
+
+    def __init__(self):
+        self.symbols = SymbolTable()
+        self._events = np.empty(0, dtype=xr_factor_dtype)
+        self._keys = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    @property
+    def events(self) -> np.ndarray:
+        """全部事件，为`xr_factor_dtype`类型的数组，按(code, frame)排序"""
+        return self._events
+
+    def _events_of(
+        self, xrxd: np.ndarray, closes: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """由`xrxd`生成事件，返回(事件, 无法计算的记录的掩码)
+
+        同一证券同一天的多条记录先将送股、转增和派息分别相加，再计算一个复权比例。
+        """
+        valid = ~np.isnat(xrxd["a_xr_date"])
+        ids = self.symbols.intern(xrxd["code"]).reshape(-1)
+        days = xrxd["a_xr_date"].astype("datetime64[D]").astype("datetime64[s]")
+
+        keys, inverse = np.unique(_keys(ids[valid], days[valid]), return_inverse=True)
+        inverse = inverse.reshape(-1)
+        shares = np.zeros(len(keys))
+        dividend = np.zeros(len(keys))
+        np.add.at(
+            shares,
+            inverse,
+            _fill(xrxd["bonus_ratio"][valid]) + _fill(xrxd["transfer_ratio"][valid]),
+        )
+        np.add.at(dividend, inverse, _fill(xrxd["dividend_ratio"][valid]))
+
+        first = np.zeros(len(keys), dtype=np.int64)
+        first[inverse[::-1]] = np.arange(len(inverse))[::-1]
+        event_ids = ids[valid][first]
+        event_days = days[valid][first]
+
+        close_ids = self.symbols.intern(closes["code"]).reshape(-1)
+        close_keys = _keys(close_ids, closes["frame"])
+        order = np.argsort(close_keys, kind="stable")
+        close_keys = close_keys[order]
+        close_ids = close_ids[order]
+        close = closes["close"].astype(np.float64)[order]
+
+        # 除权除息日之前最后一个交易日的收盘价
+        pos = np.searchsorted(close_keys, keys, side="left") - 1
+        found = pos >= 0
+        found[found] = close_ids[pos[found]] == event_ids[found]
+        if len(close) == 0:
+            prev = np.full(len(keys), np.nan)
+        else:
+            prev = np.where(found, close[np.maximum(pos, 0)], np.nan)
+        ref = (prev - dividend / 10) / (1 + shares / 10)
+        found &= (prev > 0) & (ref > 0)
+
+        events = np.empty(found.sum(), dtype=xr_factor_dtype)
+        events["code"] = event_ids[found]
+        events["frame"] = event_days[found]
+        events["ratio"] = prev[found] / ref[found]
+
+        unresolved = np.zeros(len(xrxd), dtype=bool)
+        unresolved[valid] = ~found[inverse]
+        return events, unresolved
+
+    def update(self, xrxd: np.ndarray, closes: np.ndarray) -> np.ndarray:
+        """加入新的除权除息记录并更新累积复权因子
+
+        只需计算新记录的复权比例，再重新计算累积乘积。新记录与已有事件的(code, 除权除息日)相同时，
+        替换已有事件，因此同一天的记录需在同一次调用中给出。
+
+        Args:
+            xrxd: `xrxd_info_dtype`类型的记录，可以包含多支证券。a_xr_date为NaT的记录(未实施的方案)
+                会被忽略
+            closes: 日线数据，需包含code、frame和close字段(比如日线的`BarsPanel`)，至少包含各除权
+                除息日之前的最后一个交易日
+
+        Returns:
+            因缺少前收盘价等原因无法计算的记录(不含a_xr_date为NaT的记录)，可以在补齐数据后再次调用
+        """
+        xrxd = np.asarray(xrxd)
+        if len(xrxd) == 0:
+            return xrxd
+
+        events, unresolved = self._events_of(xrxd, closes)
+        keys = _keys(events["code"], events["frame"])
+
+        # 与已有事件合并，新事件替换相同键的已有事件
+        kept = ~np.isin(self._keys, keys)
+        merged = np.concatenate([self._events[kept], events])
+        merged_keys = np.concatenate([self._keys[kept], keys])
+        order = np.argsort(merged_keys, kind="stable")
+        self._events = merged[order]
+        self._keys = merged_keys[order]
+        self._accumulate()
+
+        return xrxd[unresolved]
+
+    def _accumulate(self):
+        """按证券分组计算复权比例的累积乘积"""
+        events = self._events
+        if len(events) == 0:
+            return
+
+        log_ratio = np.log(events["ratio"])
+        total = np.cumsum(log_ratio)
+        codes = events["code"]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        base = np.r_[0.0, total][starts]
+        counts = np.diff(np.r_[starts, len(events)])
+        events["factor"] = np.exp(total - np.repeat(base, counts))
+
+    def factors(self, codes, frames) -> np.ndarray:
+        """返回各(code, frame)对应的累积复权因子
+
+        Args:
+            codes: 证券代码，可以是单个代码(此时适用于全部`frames`)或者与`frames`等长的数组
+            frames: 时间，可以是日期或者分钟线的时间，也可以是单个时间
+
+        Returns:
+            与`frames`等长的float64数组(`frames`为单个时间时长度为1)，没有事件的证券或者第一个事件之前
+            为1
+        """
+        frames = np.atleast_1d(np.asarray(frames, dtype="datetime64[s]"))
+        if len(self._events) == 0:
+            return np.ones(len(frames))
+
+        ids = self.symbols.lookup(codes).reshape(-1)
+        if len(ids) == 1 and len(frames) != 1:
+            ids = np.repeat(ids, len(frames))
+
+        # 除权除息日当天零点及之后的时间都适用该事件
+        pos = np.searchsorted(self._keys, _keys(ids, frames), side="right") - 1
+        found = (pos >= 0) & (ids >= 0)
+        found[found] = self._events["code"][pos[found]] == ids[found]
+        return np.where(found, self._events["factor"][np.maximum(pos, 0)], 1.0)
+
+    def apply(
+        self, bars: BarsArray, code: Optional[str] = None, inplace: bool = False
+    ) -> BarsArray:
+        """将`bars`的factor字段替换为本表计算的复权因子
+
+        Args:
+            bars: `BarsArray`, `BarsWithLimitArray`或者`BarsPanel`
+            code: 当`bars`不包含code字段时，其证券代码
+            inplace: 为真时直接修改`bars`，避免拷贝
+        """
+        if not inplace:
+            bars = bars.copy()
+
+        if "code" in bars.dtype.names:
+            codes = bars["code"]
+        elif code is not None:
+            codes = code
+        else:
+            raise ValueError("code is required when bars has no code field")
+
+        if len(bars):
+            bars["factor"] = self.factors(codes, bars["frame"])
+
+        return bars
+
+
+__all__ = ["AdjustFactors", "adjust", "xr_factor_dtype"]
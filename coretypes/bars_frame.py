@@ -0,0 +1,156 @@
+"""列式(struct-of-arrays)存储的行情数据容器。
+
+`bars_dtype`等类型是结构体数组(array-of-structs)，当只需要读取其中一两列(比如`close`)时，
+每次访问都要跨过整条记录，浪费内存带宽。`BarsFrame`为每一列保存一个独立的数组，切片和列投影
+都只产生视图，不拷贝数据。
+"""
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from coretypes.types import BarsArray, bars_dtype, bars_with_limit_dtype
+
+
+class BarsFrame:
+    """列式存储的行情数据。
+
+    每一列都是一个一维的`numpy.ndarray`，列名与`bars_dtype`(或者`bars_with_limit_dtype`)的字段名
+    一致。可以通过`frame["close"]`取得单列，`frame[["frame", "close"]]`进行列投影，
+    `frame[10:20]`进行行切片。后两者返回的仍然是`BarsFrame`，且与原对象共享内存。
+
+    Examples:
+        >>> bars = np.zeros(3, dtype=bars_dtype)
+        >>> bf = BarsFrame.from_bars(bars)
+        >>> bf["close"].flags["C_CONTIGUOUS"]
+        True
+        >>> len(bf[1:])
+        2
+    """
+
+    __slots__ = ("_columns", "_source")
+
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        source: Optional[np.ndarray] = None,
+    ):
+        """构造函数
+
+        Args:
+            columns: 列名到一维数组的映射，各列长度必须一致。列的顺序即为字典的顺序。
+            source: 如果各列都是某个结构化数组的字段视图，则为该结构化数组。`to_bars`将直接返回它。
+        """
+        lengths = {len(col) for col in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"all columns must have same length, got {lengths}")
+
+        self._columns = {name: np.asarray(col) for name, col in columns.items()}
+        self._source = source
+
+    @classmethod
+    def from_bars(cls, bars: np.ndarray, contiguous: bool = True) -> "BarsFrame":
+        """从`bars_dtype`、`bars_with_limit_dtype`等结构化数组构建`BarsFrame`
+
+        Args:
+            bars: 结构化数组
+            contiguous: 为真时，每一列都拷贝为连续的数组，以获得最佳的读取性能；否则每一列都是
+                `bars`的字段视图(带步长，不拷贝)，`to_bars`也将直接返回`bars`本身。
+
+        Returns:
+            BarsFrame对象
+        """
+        if bars.dtype.names is None:
+            raise TypeError("bars must be a structured array")
+
+        if contiguous:
+            columns = {
+                name: np.ascontiguousarray(bars[name]) for name in bars.dtype.names
+            }
+            return cls(columns)
+
+        columns = {name: bars[name] for name in bars.dtype.names}
+        return cls(columns, source=bars)
+
+    def to_bars(self, dtype: np.dtype = None) -> BarsArray:
+        """转换为结构化数组
+
+        如果`BarsFrame`是由`from_bars(..., contiguous=False)`构建的，并且`dtype`与原数组一致，则直接
+        返回原数组(的切片)，不发生拷贝。
+
+        Args:
+            dtype: 目标类型，默认为`bars_dtype`。当`BarsFrame`包含`high_limit`和`low_limit`列时，
+                默认为`bars_with_limit_dtype`。
+
+        Returns:
+            结构化数组
+        """
+        if dtype is None:
+            if "high_limit" in self._columns and "low_limit" in self._columns:
+                dtype = bars_with_limit_dtype
+            else:
+                dtype = bars_dtype
+
+        dtype = np.dtype(dtype)
+        if self._source is not None and self._source.dtype == dtype:
+            return self._source
+
+        missing = [name for name in dtype.names if name not in self._columns]
+        if missing:
+            raise KeyError(f"columns {missing} are required by dtype but not found")
+
+        bars = np.empty(len(self), dtype=dtype)
+        for name in dtype.names:
+            bars[name] = self._columns[name]
+
+        return bars
+
+    @property
+    def columns(self) -> List[str]:
+        """列名列表"""
+        return list(self._columns.keys())
+
+    def __len__(self) -> int:
+        for col in self._columns.values():
+            return len(col)
+
+        return 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(
+        self, key: Union[str, Iterable[str], slice, int]
+    ) -> Union[np.ndarray, "BarsFrame"]:
+        if isinstance(key, str):
+            return self._columns[key]
+
+        if isinstance(key, (slice, int, np.integer)):
+            if not isinstance(key, slice):
+                key = slice(key, int(key) + 1 or None)
+
+            source = None if self._source is None else self._source[key]
+            return BarsFrame(
+                {name: col[key] for name, col in self._columns.items()}, source
+            )
+
+        if isinstance(key, np.ndarray) and key.dtype != object:
+            # 布尔或者整数索引，会产生拷贝
+            return BarsFrame({name: col[key] for name, col in self._columns.items()})
+
+        names = list(key)
+        return BarsFrame({name: self._columns[name] for name in names})
+
+    def __repr__(self) -> str:
+        return f"BarsFrame(len={len(self)}, columns={self.columns})"
+
+
+__all__ = ["BarsFrame"]
@@ -1,4 +1,5 @@
 from .base import *
+from .batch import *
 from .client import *
 from .entrust import *
 from .server import *
@@ -1,7 +1,13 @@
-import io
+import datetime
+import inspect
+import sys
 import traceback
 from enum import IntEnum
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import numpy as np
+
+from coretypes.types import Frame
 
 
 class ErrorCodes(IntEnum):
@@ -26,27 +32,173 @@ class ErrorCodes(IntEnum):
     TradePirceNotMeet = 4006
 
 
+_registry: Dict[int, Type["TradeError"]] = {}
+"""错误代码到异常类的映射，在类定义时填充"""
+
+
+def error_class(error_code: int) -> Type["TradeError"]:
+    """返回以`error_code`注册的异常类
+
+    Raises:
+        KeyError: `error_code`没有注册
+    """
+    klass = _registry.get(int(error_code))
+    if klass is None:
+        raise KeyError(f"error code {error_code} is not registered")
+
+    return klass
+
+
+stack_limit = 20
+"""`with_stack`时最多记录的栈帧数"""
+
+_stack_every = 1
+_stack_every_by_code: Dict[int, int] = {}
+_stack_counters: Dict[int, int] = {}
+
+
+def set_stack_sampling(every: int = 1, overrides: Optional[Dict[int, int]] = None):
+    """设置`with_stack`时调用栈的采样率
+
+    对每个错误代码分别计数，每`every`个指定了`with_stack`的异常中只有一个记录调用栈。`every`为1时
+    全部记录，为0时全部不记录。
+
+    Args:
+        every: 全局的采样间隔
+        overrides: 按错误代码指定的采样间隔，优先于`every`
+    """
+    global _stack_every
+
+    _stack_every = every
+    _stack_every_by_code.clear()
+    _stack_every_by_code.update({int(k): v for k, v in (overrides or {}).items()})
+    _stack_counters.clear()
+
+
+def _sampled(code: int) -> bool:
+    every = _stack_every_by_code.get(code, _stack_every)
+    if every <= 1:
+        return every == 1
+
+    n = _stack_counters.get(code, 0)
+    _stack_counters[code] = n + 1
+    return n % every == 0
+
+
+def _capture(frame, limit: int) -> List[Tuple[Any, int]]:
+    """记录从`frame`开始向外的栈帧的(code, 行号)，不持有栈帧本身，也不读取源码"""
+    frames = []
+    while frame is not None and len(frames) < limit:
+        frames.append((frame.f_code, frame.f_lineno))
+        frame = frame.f_back
+
+    return frames
+
+
+def _rebuild(klass: type, args: tuple, state: dict) -> "TradeError":
+    """`TradeError.__reduce__`的重建函数，不调用`__init__`，以免重复采样调用栈"""
+    obj = klass.__new__(klass, *args)
+    obj.__dict__.update(state)
+    return obj
+
+
+def _encode(value: Any) -> Any:
+    """将构造参数转换为可以json串行化的值"""
+    if isinstance(value, np.generic):
+        value = value.item()
+
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+
+    return value
+
+
+def _decode_frame(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+
+    try:
+        if len(value) == 10:
+            return datetime.date.fromisoformat(value)
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return value
+
+
 class TradeError(Exception):
     """交易错误基类
 
     在交易和回测过程产生的各种异常，包括客户端参数错误、账户错误、交易限制等。由于需要本异常信息可能需要从服务器传递到客户端并重建，所以需要有串行化能力（使用json)，以及需要传递callstack trace.
+
+    串行化时，除了可读的`msg`外，还会在`args`中以结构化的方式保存构造参数(即`__init__`中除`with_stack`
+    以外的参数，子类需将它们保存为同名属性)。反串行化时，按`error_code`在注册表中查找异常类，再以`args`
+    调用其构造函数，不需要解析`msg`。每个定义了`error_code`的子类(无论继承层次多深)都会在定义时自动注册。
     """
 
     error_code = ErrorCodes.Unknown
 
+    _fields: tuple = ("msg",)
+    """构造参数名，在类定义时从`__init__`的签名中获取"""
+
+    _frame_fields: frozenset = frozenset()
+    """类型为`Frame`的构造参数名，反串行化时将其从ISO格式的字符串转换回日期"""
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        params = [
+            p
+            for name, p in inspect.signature(cls.__init__).parameters.items()
+            if name not in ("self", "with_stack")
+            and p.kind not in (p.VAR_POSITIONAL, p.VAR_KEYWORD)
+        ]
+        cls._fields = tuple(p.name for p in params)
+        cls._frame_fields = frozenset(p.name for p in params if p.annotation == Frame)
+
+        # 只注册自己声明了error_code的类，避免未声明的子类覆盖父类的注册
+        if "error_code" in cls.__dict__:
+            _registry[int(cls.error_code)] = cls
+
     def __init__(self, msg: str, with_stack: bool = False):
         self.error_msg = msg
-        self.stack = None
-        if with_stack:
-            buffer = io.StringIO()
-            traceback.print_stack(file=buffer, limit=20)
-            stack = buffer.getvalue()
-
-            # last 2 lines are print_stack and etc.
-            self.stack = "\n".join(stack.split("\n")[:-2])
+        self._stack: Optional[str] = None
+        self._frames: Optional[List[Tuple[Any, int]]] = None
+        if with_stack and _sampled(int(self.error_code)):
+            # 构造时只记录栈帧的位置，格式化推迟到访问`stack`时
+            self._frames = _capture(sys._getframe(1), stack_limit)
+
+    @property
+    def stack(self) -> Optional[str]:
+        """调用栈的文本，未记录时为None"""
+        if self._stack is None and self._frames is not None:
+            summary = traceback.StackSummary.from_list(
+                [
+                    (code.co_filename, lineno, code.co_name, None)
+                    for code, lineno in reversed(self._frames)
+                ]
+            )
+            self._stack = "".join(summary.format()).rstrip("\n")
+            self._frames = None
+
+        return self._stack
+
+    @stack.setter
+    def stack(self, value: Optional[str]):
+        self._stack = value
+        self._frames = None
+
+    @property
+    def msg(self) -> str:
+        return self.error_msg
+
+    def __reduce__(self):
+        # 记录的栈帧包含code对象，无法pickle，先格式化为文本
+        state = dict(self.__dict__, _stack=self.stack, _frames=None)
+        return _rebuild, (type(self), self.args, state)
 
     @classmethod
     def parse_msg(cls, msg: str) -> dict:
+        """从`msg`中解析出构造参数。仅用于兼容不带`args`的旧格式"""
         raise NotImplementedError
 
     @classmethod
@@ -56,36 +208,48 @@ class TradeError(Exception):
         error_msg = e["msg"]
         stack = e.get("stack")
 
-        for klass in cls.__subclasses__():
-            if klass.error_code.value == error_code:
-                try:
-                    obj = klass(**klass.parse_msg(error_msg))
-                    if stack is not None:
-                        obj.stack = stack
-
-                    return obj
-                except Exception:
-                    te = TradeError(f"异常对象构建时出错。原错误代码：{error_code}, 原错误消息：{error_msg}")
-                    te.stack = stack
-                    return te
-        else:
+        klass = _registry.get(error_code)
+        if klass is None:
             te = TradeError(f"未知错误类型。错误代码: {error_code}, 错误消息为{error_msg}")
             te.stack = stack
             return te
 
+        try:
+            args = e.get("args")
+            if args is None:
+                args = klass.parse_msg(error_msg)
+            elif klass._frame_fields:
+                args = {
+                    k: _decode_frame(v) if k in klass._frame_fields else v
+                    for k, v in args.items()
+                }
+
+            obj = klass(**args)
+            obj.stack = stack
+            return obj
+        except Exception:
+            te = TradeError(f"异常对象构建时出错。原错误代码：{error_code}, 原错误消息：{error_msg}")
+            te.stack = stack
+            return te
+
     def as_json(self):
-        """将对象串行化为json字符串，以遍可以通过网络传输"""
+        """将对象串行化为json字符串，以遍可以通过网络传输
+
+        如果子类没有将某个构造参数保存为同名属性，则不输出`args`，反串行化时退回到解析`msg`。
+        """
+        d = {"error_code": int(self.error_code), "msg": self.error_msg}
+        missing = object()
+        args = {name: getattr(self, name, missing) for name in self._fields}
+        if all(value is not missing for value in args.values()):
+            d["args"] = {name: _encode(value) for name, value in args.items()}
+
         if self.stack is not None:
-            return {
-                "error_code": self.error_code.value,
-                "msg": self.error_msg,
-                "stack": self.stack,
-            }
-        else:
-            return {
-                "error_code": self.error_code.value,
-                "msg": self.error_msg,
-            }
+            d["stack"] = self.stack
+
+        return d
 
     def __str__(self):
         return f"{self.error_code}: {self.error_msg}"
+
+
+_registry[int(TradeError.error_code)] = TradeError
@@ -0,0 +1,376 @@
+"""按列存储的交易错误批次
+
+回测中的一次委托被拒绝时，逐个构造`TradeError`并通过`as_json`串行化的代价很高。`TradeErrorBatch`
+将错误按列记录在一个结构化数组中：
+
+| 列      | 类型          | 说明                                             |
+| ------- | ------------- | ------------------------------------------------ |
+| code    | i4            | 错误代码，即`ErrorCodes`                         |
+| security| i4            | 字符串参数(security、account等)在符号表中的编号  |
+| time    | datetime64[s] | 第一个`Frame`类型的参数，没有时为NaT             |
+| time2   | datetime64[s] | 第二个`Frame`类型的参数                          |
+| value   | f8            | 第一个数值参数(price、required等)，没有时为NaN   |
+| value2  | f8            | 第二个数值参数                                   |
+
+各错误类的构造参数按类型依次放入上述各列。批次可以一次性地串行化，需要时再按下标重建单个的
+`TradeError`；按错误代码、证券、日期的计数通过`np.unique`向量化地完成。
+
+注意重建的时间参数均为`datetime.datetime`类型。
+"""
+import datetime
+import inspect
+from typing import Any, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from coretypes.errors.trade.base import ErrorCodes, TradeError, error_class
+from coretypes.symbols import SymbolTable
+from coretypes.types import Frame, code_id_dtype
+
+trade_error_batch_dtype = np.dtype(
+    [
+        ("code", "i4"),
+        ("security", code_id_dtype),
+        ("time", "datetime64[s]"),
+        ("time2", "datetime64[s]"),
+        ("value", "f8"),
+        ("value2", "f8"),
+    ]
+)
+"""`TradeErrorBatch`中每条记录的类型"""
+
+_slots = {
+    str: ("security",),
+    Frame: ("time", "time2"),
+    float: ("value", "value2"),
+}
+
+_layouts: Dict[type, Tuple[Tuple[str, str], ...]] = {}
+
+
+def _layout(klass: type) -> Tuple[Tuple[str, str], ...]:
+    """返回`klass`的(构造参数名, 列名)映射
+
+    Raises:
+        TypeError: 构造参数没有类型注解，或者同一类型的参数多于对应的列数
+    """
+    layout = _layouts.get(klass)
+    if layout is not None:
+        return layout
+
+    params = inspect.signature(klass.__init__).parameters
+    used: Dict[Any, int] = {}
+    pairs = []
+    for name in klass._fields:
+        kind = params[name].annotation
+        if kind is inspect.Parameter.empty:
+            raise TypeError(
+                f"{klass.__name__}.{name} has no type annotation, annotate it as "
+                "str, Frame, float or int to store it in a batch"
+            )
+
+        kind = float if kind is int else kind
+        slots = _slots.get(kind, ())
+        i = used.get(kind, 0)
+        if i >= len(slots):
+            raise TypeError(f"{klass.__name__}.{name} cannot be stored in a batch")
+
+        used[kind] = i + 1
+        pairs.append((name, slots[i]))
+
+    layout = _layouts[klass] = tuple(pairs)
+    return layout
+
+
+def _to_time(value: Any) -> np.datetime64:
+    if value is None:
+        return np.datetime64("NaT", "s")
+
+    return np.datetime64(value, "s")
+
+
+def _from_time(value: np.datetime64) -> Optional[datetime.datetime]:
+    return None if np.isnat(value) else value.item()
+
+
+class TradeErrorBatch:
+    """按列存储的交易错误批次
+
+    Examples:
+        >>> batch = TradeErrorBatch()
+        >>> batch.append(CashError("acc001", 1000.0, 10.0))
+        >>> batch.record(ErrorCodes.TradeReachBuyLimit, ["000001.XSHE"] * 2, ["2022-01-04", "2022-01-05"])
+        >>> batch.count_by_code()  # doctest: +SKIP
+        {<ErrorCodes.TradeNoCash: 4001>: 1, <ErrorCodes.TradeReachBuyLimit: 4003>: 2}
+        >>> batch[1]  # doctest: +SKIP
+        BuylimitError('000001.XSHE', datetime.datetime(2022, 1, 4, 0, 0))
+    """
+
+    def __init__(self):
+        self.symbols = SymbolTable()
+        self._data = np.empty(0, dtype=trade_error_batch_dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def data(self) -> np.ndarray:
+        """全部记录，为`trade_error_batch_dtype`类型的数组(存储的视图)"""
+        return self._data[: self._size]
+
+    def _reserve(self, n: int) -> np.ndarray:
+        """追加`n`条空记录并返回它们，容量按倍数增长"""
+        size = self._size + n
+        if size > len(self._data):
+            grown = np.empty(
+                max(size, len(self._data) * 2, 16), trade_error_batch_dtype
+            )
+            grown[: self._size] = self._data[: self._size]
+            self._data = grown
+
+        rows = self._data[self._size : size]
+        rows["security"] = -1
+        rows["time"] = rows["time2"] = np.datetime64("NaT")
+        rows["value"] = rows["value2"] = np.nan
+        self._size = size
+        return rows
+
+    # ---------------------------------------------------------------------
+    # 记录
+    # ---------------------------------------------------------------------
+    def append(self, error: TradeError):
+        """追加一个错误对象"""
+        layout = _layout(type(error))
+        row = self._reserve(1)[0]
+        row["code"] = int(error.error_code)
+        for name, column in layout:
+            value = getattr(error, name)
+            if column == "security":
+                row[column] = self.symbols.intern(value)
+            elif column.startswith("time"):
+                row[column] = _to_time(value)
+            else:
+                row[column] = value
+
+    def extend(self, errors: Iterable[Union[TradeError, "TradeErrorBatch"]]):
+        """追加多个错误对象，或者另一个批次中的全部错误"""
+        if isinstance(errors, TradeErrorBatch):
+            other = errors.data
+            rows = self._reserve(len(other))
+            rows[:] = other
+            valid = other["security"] >= 0
+            rows["security"][valid] = self.symbols.intern(
+                errors.symbols.decode(other["security"][valid])
+            )
+            return
+
+        for error in errors:
+            self.append(error)
+
+    def record(
+        self,
+        error_code: Union[ErrorCodes, int],
+        securities: Union[str, Sequence[str], None] = None,
+        times: Any = None,
+        values: Any = None,
+        values2: Any = None,
+        times2: Any = None,
+    ):
+        """向量化地追加多个同类错误，不构造错误对象
+
+        各参数按`trade_error_batch_dtype`中的列给出，可以是标量或者等长的数组；均为标量时追加一条。
+
+        Args:
+            error_code: 错误代码，需已注册
+            securities: 字符串参数，比如证券代码或者账户名
+            times: 第一个时间参数
+            values: 第一个数值参数
+            values2: 第二个数值参数
+            times2: 第二个时间参数
+
+        Raises:
+            ValueError: 给出的列与该错误类的构造参数不一致
+        """
+        klass = error_class(error_code)
+        layout = _layout(klass)
+
+        columns = {
+            "security": securities,
+            "time": times,
+            "time2": times2,
+            "value": values,
+            "value2": values2,
+        }
+        expected = {column for _, column in layout}
+        given = {column for column, value in columns.items() if value is not None}
+        if given != expected:
+            raise ValueError(
+                f"{klass.__name__} is stored in columns {sorted(expected)}, "
+                f"but got {sorted(given)}"
+            )
+        n = max([np.size(v) for v in columns.values() if v is not None] + [1])
+
+        rows = self._reserve(n)
+        rows["code"] = int(error_code)
+        for column, value in columns.items():
+            if value is None:
+                continue
+            if column == "security":
+                rows[column] = self.symbols.intern(value)
+            elif column.startswith("time"):
+                rows[column] = np.asarray(value, dtype="datetime64[s]")
+            else:
+                rows[column] = value
+
+    # ---------------------------------------------------------------------
+    # 重建
+    # ---------------------------------------------------------------------
+    def __getitem__(self, i: int) -> TradeError:
+        """重建第`i`个错误对象"""
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+
+        row = self._data[i]
+        klass = error_class(row["code"])
+        kwargs = {}
+        for name, column in _layout(klass):
+            if column == "security":
+                code_id = int(row[column])
+                kwargs[name] = None if code_id < 0 else self.symbols.codes[code_id]
+            elif column.startswith("time"):
+                kwargs[name] = _from_time(row[column])
+            else:
+                kwargs[name] = float(row[column])
+
+        return klass(**kwargs)
+
+    def __iter__(self) -> Iterator[TradeError]:
+        for i in range(self._size):
+            yield self[i]
+
+    # ---------------------------------------------------------------------
+    # 统计
+    # ---------------------------------------------------------------------
+    def counts(self, by: Union[str, Sequence[str]] = "code") -> np.ndarray:
+        """按`by`分组计数
+
+        Args:
+            by: 分组的键，为"code"、"security"、"day"之一或者它们的组合
+
+        Returns:
+            结构化数组，包含各个键以及count字段，按键排序。security为证券代码(字符串)，day为
+            `datetime64[D]`
+        """
+        keys = [by] if isinstance(by, str) else list(by)
+        data = self.data
+        columns = {
+            "code": data["code"],
+            "security": data["security"],
+            "day": data["time"].astype("datetime64[D]"),
+        }
+        unknown = set(keys) - set(columns)
+        if unknown:
+            raise ValueError(f"cannot group by {sorted(unknown)}")
+
+        grouped = np.empty(len(data), dtype=[(k, columns[k].dtype) for k in keys])
+        for k in keys:
+            grouped[k] = columns[k]
+        uniques, counts = np.unique(grouped, return_counts=True)
+
+        dtype = [(k, object if k == "security" else uniques.dtype[k]) for k in keys]
+        result = np.empty(len(uniques), dtype=dtype + [("count", "i8")])
+        for k in keys:
+            if k == "security":
+                ids = uniques[k]
+                names = np.full(len(ids), None, dtype=object)
+                names[ids >= 0] = self.symbols.decode(ids[ids >= 0])
+                result[k] = names
+            else:
+                result[k] = uniques[k]
+        result["count"] = counts
+        return result
+
+    def count_by_code(self) -> Dict[Union[ErrorCodes, int], int]:
+        """各错误代码的错误数
+
+        已注册的代码以其异常类的`error_code`为键，通常是`ErrorCodes`，自定义的异常类也可以是整数；
+        未注册的代码以整数为键。
+        """
+        counts = self.counts("code")
+        result: Dict[Union[ErrorCodes, int], int] = {}
+        for code, n in zip(counts["code"].tolist(), counts["count"].tolist()):
+            try:
+                code = error_class(code).error_code
+            except KeyError:
+                pass
+            result[code] = n
+
+        return result
+
+    def count_by_security(self) -> Dict[str, int]:
+        """各证券(或者账户)的错误数，不含没有字符串参数的错误"""
+        counts = self.counts("security")
+        return {
+            code: int(n)
+            for code, n in zip(counts["security"], counts["count"])
+            if code is not None
+        }
+
+    def count_by_day(self) -> Dict[datetime.date, int]:
+        """每天的错误数，不含没有时间参数的错误"""
+        counts = self.counts("day")
+        return {
+            day.item(): int(n)
+            for day, n in zip(counts["day"], counts["count"])
+            if not np.isnat(day)
+        }
+
+    # ---------------------------------------------------------------------
+    # 串行化
+    # ---------------------------------------------------------------------
+    def as_json(self) -> dict:
+        """一次性地串行化为可json化的字典，各列为列表，时间为自epoch起的秒数(NaT为None)"""
+        data = self.data
+        d: Dict[str, Any] = {"symbols": self.symbols.codes.tolist()}
+        for name in trade_error_batch_dtype.names:
+            column = data[name]
+            if name.startswith("time"):
+                seconds = column.astype(np.int64).astype(object)
+                seconds[np.isnat(column)] = None
+                d[name] = seconds.tolist()
+            elif name.startswith("value"):
+                values = column.astype(object)
+                values[np.isnan(column)] = None
+                d[name] = values.tolist()
+            else:
+                d[name] = column.tolist()
+
+        return d
+
+    @classmethod
+    def from_json(cls, d: dict) -> "TradeErrorBatch":
+        """从`as_json`的结果重建批次，不重建单个的错误对象"""
+        batch = cls()
+        batch.symbols.intern(d["symbols"])
+
+        rows = batch._reserve(len(d["code"]))
+        for name in trade_error_batch_dtype.names:
+            column = d[name]
+            if name.startswith("time"):
+                seconds = np.array(
+                    [np.iinfo(np.int64).min if v is None else v for v in column],
+                    dtype=np.int64,
+                )
+                rows[name] = seconds.astype("datetime64[s]")
+            elif name.startswith("value"):
+                rows[name] = np.array(column, dtype=float)
+            else:
+                rows[name] = column
+
+        return batch
+
+
+__all__ = ["TradeErrorBatch", "trade_error_batch_dtype"]
@@ -24,6 +24,7 @@ class AccountConflictError(TradeError):
     error_code = ErrorCodes.ClientAccountConflict
 
     def __init__(self, account: str, with_stack: bool = False):
+        self.account = account
         super().__init__(f"账户名{account}已被占用", with_stack=with_stack)
 
     @classmethod
@@ -38,6 +39,8 @@ class AccountStoppedError(TradeError):
     error_code = ErrorCodes.ClientAccountStopped
 
     def __init__(self, bid_time: Frame, stop_time: Frame, with_stack: bool = False):
+        self.bid_time = bid_time
+        self.stop_time = stop_time
         super().__init__(f"下单时间为{bid_time},而账户已于{stop_time}冻结。", with_stack=with_stack)
 
     @classmethod
@@ -52,13 +55,15 @@ class TimeRewindError(TradeError):
     error_code = ErrorCodes.ClientTimeRewind
 
     def __init__(self, cur: Frame, last_trade_time: Frame, with_stack: bool = False):
+        self.cur = cur
+        self.last_trade_time = last_trade_time
         super().__init__(
-            "委托时间必须递增出现。当前{cur}, 前一个委托时间{last_trade_time}", with_stack=with_stack
+            f"委托时间必须递增出现。当前{cur}, 前一个委托时间{last_trade_time}", with_stack=with_stack
         )
 
     @classmethod
     def parse_msg(cls, msg: str) -> dict:
-        m = re.match(r"委托时间必须递增出现。当前(.*?), 前一个委托时间(.*?)", msg)
+        m = re.match(r"委托时间必须递增出现。当前(.*?), 前一个委托时间(.*)", msg)
         return {
             "cur": m.group(1),  # type: ignore
             "last_trade_time": m.group(2),  # type: ignore
@@ -11,6 +11,8 @@ class GenericError(TradeError):
     error_code = ErrorCodes.TradeGeneric
 
     def __init__(self, security: str, time: Frame, with_stack: bool=False):
+        self.security = security
+        self.time = time
         super().__init__(f"委托{security}在{time}发生未知错误", with_stack=with_stack)
 
     @classmethod
@@ -34,6 +36,9 @@ class CashError(TradeError):
         available: float,
         with_stack: bool = False,
     ):
+        self.account = account
+        self.required = required
+        self.available = available
         super().__init__(
             f"账户{account}资金不足, 需要{required}, 当前{available}", with_stack=with_stack
         )
@@ -44,7 +49,7 @@ class CashError(TradeError):
         return {
             "account": m.group(1),  # type: ignore
             "required": float(m.group(2)),  # type: ignore
-            "available": float(m.group(3)),  # type: ignore
+            "available": float(m.group(4)),  # type: ignore
         }
 
 
@@ -54,11 +59,13 @@ class BuylimitError(TradeError):
     error_code = ErrorCodes.TradeReachBuyLimit
 
     def __init__(self, security: str, time: Frame, with_stack: bool = False):
+        self.security = security
+        self.time = time
         super().__init__(f"不能在涨停板上买入{security}, {time}", with_stack=with_stack)
 
     @classmethod
     def parse_msg(cls, msg: str) -> dict:
-        m = re.match(r"不能在涨停板上买入(.*?), (.*?)", msg)
+        m = re.match(r"不能在涨停板上买入(.*?), (.*)", msg)
         return {
             "security": m.group(1),  # type: ignore
             "time": m.group(2),  # type: ignore
@@ -71,11 +78,13 @@ class SellLimitError(TradeError):
     error_code = ErrorCodes.TradeReachSellLimit
 
     def __init__(self, security: str, time: Frame, with_stack: bool = False):
+        self.security = security
+        self.time = time
         super().__init__(f"不能在跌停板上卖出{security}, {time}", with_stack=with_stack)
 
     @classmethod
     def parse_msg(cls, msg: str) -> dict:
-        m = re.match(r"不能在跌停板上卖出(.*?), (.*?)", msg)
+        m = re.match(r"不能在跌停板上卖出(.*?), (.*)", msg)
         return {
             "security": m.group(1),  # type: ignore
             "time": m.group(2),  # type: ignore
@@ -88,6 +97,8 @@ class PositionError(TradeError):
     error_code = ErrorCodes.TradeNoPosition
 
     def __init__(self, security: str, time: Frame, with_stack: bool = False):
+        self.security = security
+        self.time = time
         super().__init__(f"{security}在{time}期间没有持仓", with_stack=with_stack)
 
     @classmethod
@@ -107,7 +118,9 @@ class PriceNotMeet(TradeError):
     def __init__(
         self, security: str, price: float, order_time: Frame, with_stack: bool = False
     ):
-
+        self.security = security
+        self.price = price
+        self.order_time = order_time
         super().__init__(
             f"{security}在{order_time}之后未达到委托价:{price}", with_stack=with_stack
         )
@@ -128,6 +141,8 @@ class VolumeNotMeet(TradeError):
     error_code = ErrorCodes.TradeVolNotEnough
 
     def __init__(self, security: str, price: float, with_stack: bool = False):
+        self.security = security
+        self.price = price
         super().__init__(f"{security}委托价{price}达到，但成交量为零", with_stack=with_stack)
 
     @classmethod
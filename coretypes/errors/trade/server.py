@@ -10,6 +10,8 @@ class NoDataForMatch(TradeError):
     error_code = ErrorCodes.ServerNoDataForMatch
 
     def __init__(self, security: str, order_time: Frame, with_stack: bool = False):
+        self.security = security
+        self.order_time = order_time
         super().__init__(f"没有匹配到{security}在{order_time}的成交数据", with_stack=with_stack)
 
     @classmethod
@@ -27,6 +29,8 @@ class NoData(TradeError):
     error_code = ErrorCodes.ServerNoData
 
     def __init__(self, security: str, time: Frame, with_stack: bool = False):
+        self.security = security
+        self.time = time
         super().__init__(
             f"获取{security}在{time}的行情数据失败，请检查日期是否为交易日，或者当天是否停牌", with_stack=with_stack
         )
@@ -0,0 +1,7 @@
+from .base import *
+from .batch import *
+from .cache import *
+from .loadtest import *
+from .pool import *
+from .scheduler import *
+from .synthetic import *
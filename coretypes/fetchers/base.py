@@ -0,0 +1,92 @@
+"""fetcher包装器的基类
+
+`FetcherWrapper`将`QuotesFetcher`的所有接口转发给被包装的fetcher，是`BatchingFetcher`、
+`ScheduledFetcher`、`CachingFetcher`、`FetcherPool`等组件的共同基类。
+"""
+import datetime
+from typing import Dict, List, Union
+
+import numpy
+
+from coretypes.quote_fetcher import QuotesFetcher
+from coretypes.types import Frame, FrameType
+
+
+class FetcherWrapper(QuotesFetcher):
+    """包装另一个`QuotesFetcher`的基类
+
+    所有接口都通过`_call`转发给被包装的`fetcher`。子类只需要重写它关心的接口，比如批量合并、缓存等；
+    或者重写`_call`，对所有接口统一进行处理，比如调度。
+
+    包装器及其子类不记录`fetcher_metrics`指标，调用由被包装的fetcher记录。
+    """
+
+    record_metrics = False
+
+    def __init__(self, fetcher: QuotesFetcher):
+        self.fetcher = fetcher
+
+    async def _call(self, method: str, *args, **kwargs):
+        """调用被包装的`fetcher`的`method`方法。子类可以重写此方法，对所有接口统一进行处理"""
+        return await getattr(self.fetcher, method)(*args, **kwargs)
+
+    async def get_quota(self) -> int:
+        return await self._call("get_quota")
+
+    async def get_security_list(self) -> numpy.ndarray:
+        return await self._call("get_security_list")
+
+    async def get_bars(
+        self,
+        sec: str,
+        end: Frame,
+        n_bars: int,
+        frame_type: FrameType,
+        allow_unclosed=True,
+    ) -> numpy.ndarray:
+        return await self._call(
+            "get_bars", sec, end, n_bars, frame_type, allow_unclosed=allow_unclosed
+        )
+
+    async def get_price(
+        self,
+        sec: Union[List, str],
+        end_at: Union[str, datetime.datetime],
+        n_bars: int,
+        frame_type: str,
+    ) -> Dict[str, numpy.recarray]:
+        return await self._call("get_price", sec, end_at, n_bars, frame_type)
+
+    async def create_instance(self, **kwargs):
+        return await self._call("create_instance", **kwargs)
+
+    async def get_all_trade_days(self):
+        return await self._call("get_all_trade_days")
+
+    async def get_valuation(
+        self, code: Union[str, List[str]], day: Frame
+    ) -> numpy.ndarray:
+        return await self._call("get_valuation", code, day)
+
+    async def get_fund_list(self, codes: Union[str, List[str]] = None) -> numpy.ndarray:
+        return await self._call("get_fund_list", codes)
+
+    async def get_fund_portfolio_stock(
+        self, codes: Union[str, List[str]], pub_date: Union[str, datetime.date] = None
+    ) -> numpy.array:
+        return await self._call("get_fund_portfolio_stock", codes, pub_date)
+
+    async def get_fund_net_value(
+        self,
+        codes: Union[str, List[str]],
+        day: datetime.date = None,
+    ) -> numpy.array:
+        return await self._call("get_fund_net_value", codes, day)
+
+    async def get_fund_share_daily(
+        self, codes: Union[str, List[str]] = None, day: datetime.date = None
+    ) -> numpy.array:
+        return await self._call("get_fund_share_daily", codes, day)
+
+
+__all__ = ["FetcherWrapper"]
@@ -0,0 +1,161 @@
+"""合并并发的`get_bars`请求
+
+服务在开盘等时刻会并发地为成千上万支证券调用`get_bars`，而上游的`get_price`可以一次取多支证券，
+且消耗相同的quota。`BatchingFetcher`在一个很短的时间窗口内收集参数(end, n_bars, frame_type)相同的
+`get_bars`调用，合并为一次`get_price`调用，再将结果分发给各个调用者。完全相同的在途请求只会发出一次。
+"""
+import asyncio
+from typing import Dict, Tuple
+
+import numpy as np
+
+from coretypes.fetchers.base import FetcherWrapper
+from coretypes.quote_fetcher import QuotesFetcher
+from coretypes.types import BarsArray, Frame, FrameType, bars_dtype
+
+
+def _fail(futures, e: BaseException):
+    """以异常`e`结束尚未完成的`futures`，`e`为`CancelledError`时取消它们"""
+    for future in futures:
+        if future.done():
+            continue
+        if isinstance(e, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(e)
+
+
+class BatchingFetcher(FetcherWrapper):
+    """合并`get_bars`请求的fetcher
+
+    由于`get_price`没有`allow_unclosed`参数，只有`allow_unclosed`为真的请求会合并为`get_price`调用；
+    其它请求仍然逐个调用`get_bars`，但同样会对在途的相同请求去重。
+
+    Examples:
+        >>> fetcher = BatchingFetcher(upstream, window=0.005)  # doctest: +SKIP
+        >>> await asyncio.gather(*[fetcher.get_bars(sec, end, 10, FrameType.DAY) for sec in secs])  # doctest: +SKIP
+    """
+
+    def __init__(
+        self, fetcher: QuotesFetcher, window: float = 0.005, max_batch: int = 500
+    ):
+        """构造函数
+
+        Args:
+            fetcher: 上游fetcher
+            window: 收集请求的时间窗口，单位为秒
+            max_batch: 每批最多包含的证券数，达到后立即发出请求
+        """
+        super().__init__(fetcher)
+        self.window = window
+        self.max_batch = max_batch
+
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._pending: Dict[tuple, Dict[str, asyncio.Future]] = {}
+        self._timers: Dict[tuple, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    async def get_bars(
+        self,
+        sec: str,
+        end: Frame,
+        n_bars: int,
+        frame_type: FrameType,
+        allow_unclosed=True,
+    ) -> BarsArray:
+        key = (sec, end, n_bars, frame_type, allow_unclosed)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+            if allow_unclosed:
+                self._enqueue((end, n_bars, frame_type), sec, future)
+            else:
+                self._spawn(self._fetch_one(key, future))
+
+        # 某个调用者被取消时，不影响共享同一请求的其它调用者
+        return await asyncio.shield(future)
+
+    async def close(self):
+        """取消所有尚未完成的请求，等待中的调用者将收到`CancelledError`"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+        for batch in self._pending.values():
+            for future in batch.values():
+                future.cancel()
+        self._pending.clear()
+
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _enqueue(self, batch_key: tuple, sec: str, future: asyncio.Future):
+        batch = self._pending.setdefault(batch_key, {})
+        batch[sec] = future
+
+        if len(batch) >= self.max_batch:
+            self._flush(batch_key)
+        elif batch_key not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[batch_key] = loop.call_later(
+                self.window, self._flush, batch_key
+            )
+
+    def _flush(self, batch_key: tuple):
+        timer = self._timers.pop(batch_key, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(batch_key, None)
+        if batch:
+            self._spawn(self._dispatch(batch_key, batch))
+
+    async def _dispatch(self, batch_key: tuple, batch: Dict[str, asyncio.Future]):
+        end, n_bars, frame_type = batch_key
+        try:
+            result = await self.fetcher.get_price(
+                list(batch.keys()), end, n_bars, frame_type.value
+            )
+        except BaseException as e:
+            # 包括任务被取消(CancelledError不是Exception的子类)，否则调用者将永远等待
+            _fail(batch.values(), e)
+            if not isinstance(e, Exception):
+                raise
+            return
+
+        result = result or {}
+        for sec, future in batch.items():
+            if future.done():
+                continue
+
+            bars = result.get(sec)
+            if bars is None:
+                bars = np.empty(0, dtype=bars_dtype)
+            future.set_result(bars)
+
+    async def _fetch_one(self, key: Tuple, future: asyncio.Future):
+        sec, end, n_bars, frame_type, allow_unclosed = key
+        try:
+            bars = await self.fetcher.get_bars(
+                sec, end, n_bars, frame_type, allow_unclosed=allow_unclosed
+            )
+        except BaseException as e:
+            _fail([future], e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            if not future.done():
+                future.set_result(bars)
+
+
+__all__ = ["BatchingFetcher"]
@@ -0,0 +1,389 @@
+"""行情数据的读穿透缓存
+
+已经结束的历史行情不会再变化，但不同的服务会反复向上游请求相同的数据。`CachingFetcher`为每个
+(sec, frame_type)缓存一段连续的、已结束的k线。请求的区间与缓存部分重叠时，只向上游获取缺失的部分，
+再与缓存拼接。
+
+当天的k线可能尚未结束，这样的请求不进入历史缓存，只在`unclosed_ttl`秒内复用完全相同的请求结果。
+
+内存中的缓存按字节数限制大小，以LRU方式淘汰。如果指定了`disk_path`，被淘汰的数据会写入磁盘，需要时
+再以内存映射的方式加载。内存映射的数据由操作系统的页缓存管理，单独计数，不占用`max_bytes`。
+
+同一个键上并发的未命中只向上游请求一次，其它请求等待其完成后再读取缓存。
+"""
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from coretypes.fetchers.base import FetcherWrapper
+from coretypes.quote_fetcher import QuotesFetcher
+from coretypes.trade_calendar import TradingCalendar
+from coretypes.types import BarsArray, Frame, FrameType
+
+
+class _Segment:
+    """一段连续的缓存数据，[start, end]区间内的k线都已包含在`bars`中"""
+
+    __slots__ = ("bars", "start", "end", "head")
+
+    def __init__(self, bars: BarsArray, start: np.datetime64, end: np.datetime64):
+        self.bars = bars
+        self.start = start
+        self.end = end
+        # 为真时，表示上游在start之前已没有数据(比如上市首日)
+        self.head = False
+
+    @property
+    def nbytes(self) -> int:
+        return self.bars.nbytes
+
+    @property
+    def mapped(self) -> bool:
+        """数据是否为从磁盘加载的内存映射"""
+        return isinstance(self.bars, np.memmap)
+
+
+def _now() -> np.datetime64:
+    return np.datetime64(datetime.datetime.now(), "s")
+
+
+class CachingFetcher(FetcherWrapper):
+    """带缓存的fetcher
+
+    Examples:
+        >>> fetcher = CachingFetcher(upstream, max_bytes=1 << 30, disk_path="/tmp/bars")  # doctest: +SKIP
+    """
+
+    def __init__(
+        self,
+        fetcher: QuotesFetcher,
+        max_bytes: int = 256 * 1024 * 1024,
+        disk_path: Optional[str] = None,
+        calendar: Optional[TradingCalendar] = None,
+        unclosed_ttl: float = 1.0,
+        clock: Callable[[], np.datetime64] = _now,
+    ):
+        """构造函数
+
+        Args:
+            fetcher: 上游fetcher
+            max_bytes: 内存缓存的最大字节数
+            disk_path: 磁盘缓存的目录，为None时不使用磁盘缓存
+            calendar: 交易日历。提供时，向后扩展缓存只需获取缺失的帧数，否则需要获取完整的请求
+            unclosed_ttl: 包含当天k线的请求结果的缓存时间，单位为秒，为0时不缓存
+            clock: 返回当前时间的函数，用以判断k线是否已结束
+        """
+        super().__init__(fetcher)
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.calendar = calendar
+        self.unclosed_ttl = unclosed_ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+
+        self._segments: "OrderedDict[Tuple[str, FrameType], _Segment]" = OrderedDict()
+        self._nbytes = 0
+        self._mapped_bytes = 0
+        self._recent: Dict[tuple, Tuple[float, BarsArray]] = {}
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+        if disk_path is not None:
+            os.makedirs(disk_path, exist_ok=True)
+
+    @property
+    def nbytes(self) -> int:
+        """内存缓存占用的字节数，不含内存映射的数据"""
+        return self._nbytes
+
+    @property
+    def mapped_bytes(self) -> int:
+        """从磁盘以内存映射方式加载的缓存数据的字节数"""
+        return self._mapped_bytes
+
+    # ---------------------------------------------------------------------
+    # 内存和磁盘缓存
+    # ---------------------------------------------------------------------
+    def _disk_file(self, key: Tuple[str, FrameType]) -> str:
+        sec, frame_type = key
+        folder = os.path.join(self.disk_path, str(frame_type.to_int()))
+        return os.path.join(folder, f"{sec}.npy")
+
+    def _get(self, key: Tuple[str, FrameType]) -> Optional[_Segment]:
+        segment = self._segments.get(key)
+        if segment is not None:
+            self._segments.move_to_end(key)
+            return segment
+
+        if self.disk_path is None:
+            return None
+
+        path = self._disk_file(key)
+        if not os.path.exists(path):
+            return None
+
+        bars = np.load(path, mmap_mode="r")
+        if len(bars) == 0:
+            return None
+
+        segment = _Segment(bars, bars["frame"][0], bars["frame"][-1])
+        self._put(key, segment)
+        return segment
+
+    def _account(self, segment: _Segment, sign: int):
+        if segment.mapped:
+            self._mapped_bytes += sign * segment.nbytes
+        else:
+            self._nbytes += sign * segment.nbytes
+
+    def _put(self, key: Tuple[str, FrameType], segment: _Segment):
+        old = self._segments.pop(key, None)
+        if old is not None:
+            self._account(old, -1)
+
+        self._segments[key] = segment
+        self._account(segment, 1)
+
+        while self._nbytes > self.max_bytes and len(self._segments) > 1:
+            evicted_key, evicted = self._segments.popitem(last=False)
+            self._account(evicted, -1)
+            self._spill(evicted_key, evicted)
+
+    def _spill(self, key: Tuple[str, FrameType], segment: _Segment):
+        if self.disk_path is None or segment.mapped:
+            return
+
+        path = self._disk_file(key)
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.asarray(segment.bars))
+        os.replace(tmp, path)
+
+    # ---------------------------------------------------------------------
+    # 读穿透
+    # ---------------------------------------------------------------------
+    def _today(self) -> np.datetime64:
+        return self.clock().astype("datetime64[D]").astype("datetime64[s]")
+
+    def _count(self, start: np.datetime64, end: np.datetime64, frame_type) -> int:
+        """[start, end]之间的帧数，两端都先向前取整到帧，因为请求的时间不一定落在帧上"""
+        start, end = self.calendar.floor([start, end], frame_type)
+        return int(self.calendar.count(start, end, frame_type))
+
+    def _missing_after(self, segment: _Segment, end: np.datetime64, frame_type) -> int:
+        """缓存之后、直到end(含)还需要获取的帧数。无法确定时返回-1"""
+        if self.calendar is None:
+            return -1
+
+        return self._count(segment.end, end, frame_type) - 1
+
+    async def _fetch(
+        self, sec: str, end: np.datetime64, n_bars: int, frame_type: FrameType
+    ) -> BarsArray:
+        self.misses += 1
+        bars = await self.fetcher.get_bars(
+            sec, end.astype(datetime.datetime), n_bars, frame_type, allow_unclosed=False
+        )
+        return np.asarray(bars)
+
+    async def _extend(
+        self,
+        key: Tuple[str, FrameType],
+        segment: Optional[_Segment],
+        end: np.datetime64,
+        n_bars: int,
+    ) -> _Segment:
+        """扩展缓存，使之包含以end结束的n_bars根k线"""
+        sec, frame_type = key
+
+        if segment is not None and end > segment.end:
+            missing = self._missing_after(segment, end, frame_type)
+            count = n_bars if missing < 0 else missing + 1
+            newer = np.empty(0) if missing == 0 else None
+            if newer is None:
+                newer = await self._fetch(sec, end, count, frame_type)
+
+            if len(newer) == 0 or newer["frame"][0] <= segment.end:
+                # 与缓存重叠(或者缓存之后没有新的k线)，拼接
+                if len(newer) > 0:
+                    newer = newer[newer["frame"] > segment.end]
+                    bars = np.concatenate([segment.bars, newer])
+                else:
+                    bars = segment.bars
+                head = segment.head
+                segment = _Segment(bars, segment.start, end)
+                segment.head = head
+            elif count >= n_bars:
+                # 无法与缓存拼接，但已经取得了所需的全部k线
+                return self._new_segment(key, newer, end, n_bars)
+            else:
+                segment = None
+
+        if segment is None:
+            bars = await self._fetch(sec, end, n_bars, frame_type)
+            return self._new_segment(key, bars, end, n_bars)
+
+        if end < segment.start:
+            if self.calendar is None:
+                # 无法确定与缓存之间相隔的帧数，直接获取，不缓存
+                bars = await self._fetch(sec, end, n_bars, frame_type)
+                return _Segment(bars, end, end)
+
+            # 从缓存的起点向前获取，覆盖(end, start)之间的帧和以end结束的n_bars帧
+            gap = self._count(end, segment.start, frame_type) - 1
+            count = gap + n_bars
+        else:
+            have = int(np.searchsorted(segment.bars["frame"], end, side="right"))
+            count = n_bars - have + 1
+
+        if count > 1 and not segment.head:
+            older = await self._fetch(sec, segment.start, count, frame_type)
+            head = len(older) < count
+            older = older[older["frame"] < segment.start]
+            bars = np.concatenate([older, segment.bars])
+            start = bars["frame"][0] if len(bars) else segment.start
+            segment = _Segment(bars, start, segment.end)
+            segment.head = head
+
+        self._put(key, segment)
+        return segment
+
+    def _new_segment(
+        self, key: Tuple[str, FrameType], bars: BarsArray, end: np.datetime64, n_bars
+    ) -> _Segment:
+        start = bars["frame"][0] if len(bars) else end
+        segment = _Segment(bars, start, end)
+        segment.head = len(bars) < n_bars
+        self._put(key, segment)
+        return segment
+
+    async def get_bars(
+        self,
+        sec: str,
+        end: Frame,
+        n_bars: int,
+        frame_type: FrameType,
+        allow_unclosed=True,
+    ) -> BarsArray:
+        end_ = np.datetime64(end, "s")
+        if end_ >= self._today():
+            return await self._get_recent(sec, end, n_bars, frame_type, allow_unclosed)
+
+        key = (sec, frame_type)
+        while True:
+            segment = self._get(key)
+            if segment is not None and segment.start <= end_ <= segment.end:
+                have = int(np.searchsorted(segment.bars["frame"], end_, side="right"))
+                if have >= n_bars or segment.head:
+                    self.hits += 1
+                    return np.array(segment.bars[max(have - n_bars, 0) : have])
+
+            # 已有请求在扩展这个键的缓存，等它完成后重新查找
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            await asyncio.shield(pending)
+
+        done = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            segment = await self._extend(key, segment, end_, n_bars)
+        finally:
+            del self._inflight[key]
+            done.set_result(None)
+
+        have = int(np.searchsorted(segment.bars["frame"], end_, side="right"))
+        return np.array(segment.bars[max(have - n_bars, 0) : have])
+
+    async def _get_recent(
+        self, sec: str, end: Frame, n_bars: int, frame_type: FrameType, allow_unclosed
+    ) -> BarsArray:
+        key = (sec, end, n_bars, frame_type, allow_unclosed)
+        now = time.monotonic()
+
+        cached = self._recent.get(key)
+        if cached is not None and cached[0] > now:
+            self.hits += 1
+            return cached[1].copy()
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return (await asyncio.shield(pending)).copy()
+
+        self.misses += 1
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            bars = await self.fetcher.get_bars(
+                sec, end, n_bars, frame_type, allow_unclosed=allow_unclosed
+            )
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 没有等待者时，避免事件循环报告未读取的异常
+                future.exception()
+            raise
+        else:
+            future.set_result(np.array(bars))
+        finally:
+            del self._inflight[key]
+
+        if self.unclosed_ttl > 0:
+            # 顺便清理过期的项
+            for k in [k for k, (expire, _) in self._recent.items() if expire <= now]:
+                del self._recent[k]
+            self._recent[key] = (now + self.unclosed_ttl, np.array(bars))
+
+        return bars
+
+    async def get_price(
+        self,
+        sec: Union[List, str],
+        end_at: Union[str, datetime.datetime],
+        n_bars: int,
+        frame_type: str,
+    ) -> Dict[str, BarsArray]:
+        end_ = np.datetime64(end_at, "s")
+        if end_ >= self._today():
+            return await self.fetcher.get_price(sec, end_at, n_bars, frame_type)
+
+        secs = [sec] if isinstance(sec, str) else list(sec)
+        ft = FrameType(frame_type)
+
+        result = {}
+        misses = []
+        for code in secs:
+            segment = self._get((code, ft))
+            if segment is not None and segment.start <= end_ <= segment.end:
+                have = int(np.searchsorted(segment.bars["frame"], end_, side="right"))
+                if have >= n_bars or segment.head:
+                    self.hits += 1
+                    result[code] = np.array(segment.bars[max(have - n_bars, 0) : have])
+                    continue
+
+            misses.append(code)
+
+        if misses:
+            self.misses += 1
+            fetched = await self.fetcher.get_price(misses, end_at, n_bars, frame_type)
+            for code, bars in (fetched or {}).items():
+                bars = np.asarray(bars)
+                result[code] = bars
+                if (code, ft) not in self._segments:
+                    self._new_segment((code, ft), bars.copy(), end_, n_bars)
+
+        return result
+
+
+__all__ = ["CachingFetcher"]
@@ -0,0 +1,166 @@
+"""fetcher的压力测试
+
+`run_load`以N个并发客户端驱动一个`QuotesFetcher`，按方法统计吞吐量和延时分位数。配合
+`SyntheticFetcher`，可以离线、可重现地比较缓存、批量合并、连接池等组件的效果。
+"""
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from coretypes.quote_fetcher import QuotesFetcher
+from coretypes.types import Frame, FrameType
+
+Workload = Callable[[random.Random, int], Tuple[str, tuple, dict]]
+"""负载函数，以随机数生成器和客户端编号为参数，返回(方法名, 位置参数, 关键字参数)"""
+
+
+class MethodStats:
+    """单个方法的统计"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies)
+
+    def quantile(self, q: float) -> float:
+        """延时的`q`分位数，单位为秒"""
+        if not self.latencies:
+            return float("nan")
+
+        return float(np.quantile(self.latencies, q))
+
+
+class LoadReport:
+    """压力测试的结果"""
+
+    def __init__(self, stats: Dict[str, MethodStats], duration: float):
+        self.stats = stats
+        self.duration = duration
+
+    def throughput(self, method: Optional[str] = None) -> float:
+        """每秒完成的调用数(含失败的调用)。`method`为None时统计所有方法"""
+        if self.duration <= 0:
+            return 0.0
+
+        methods = self.stats.values() if method is None else [self.stats[method]]
+        return sum(s.count for s in methods) / self.duration
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            method: {
+                "count": s.count,
+                "errors": s.errors,
+                "throughput": self.throughput(method),
+                "p50": s.quantile(0.5),
+                "p99": s.quantile(0.99),
+            }
+            for method, s in self.stats.items()
+        }
+
+    def __str__(self) -> str:
+        lines = [
+            f"{'method':<24}{'count':>10}{'errors':>8}{'req/s':>12}"
+            f"{'p50(ms)':>10}{'p99(ms)':>10}"
+        ]
+        for method, row in self.as_dict().items():
+            lines.append(
+                f"{method:<24}{row['count']:>10}{row['errors']:>8}"
+                f"{row['throughput']:>12.1f}{row['p50'] * 1000:>10.2f}"
+                f"{row['p99'] * 1000:>10.2f}"
+            )
+        return "\n".join(lines)
+
+
+def bars_workload(
+    codes: Sequence[str],
+    end: Frame,
+    n_bars: int,
+    frame_type: FrameType,
+    price_ratio: float = 0.0,
+    batch: int = 50,
+) -> Workload:
+    """随机请求`codes`中证券行情数据的负载
+
+    Args:
+        codes: 证券代码
+        end: 请求的结束帧
+        n_bars: 每次请求的k线数
+        frame_type: 帧类型
+        price_ratio: 以`get_price`一次请求`batch`支证券的调用所占的比例，其余为`get_bars`
+        batch: 每次`get_price`请求的证券数
+    """
+
+    def workload(rng: random.Random, client: int) -> Tuple[str, tuple, dict]:
+        if rng.random() < price_ratio:
+            secs = rng.sample(list(codes), min(batch, len(codes)))
+            return "get_price", (secs, end, n_bars, frame_type.value), {}
+
+        return "get_bars", (rng.choice(codes), end, n_bars, frame_type), {}
+
+    return workload
+
+
+async def run_load(
+    fetcher: QuotesFetcher,
+    workload: Workload,
+    clients: int = 10,
+    requests: Optional[int] = 1000,
+    duration: Optional[float] = None,
+    seed: int = 0,
+) -> LoadReport:
+    """以`clients`个并发客户端执行`workload`
+
+    `requests`和`duration`至少要指定一个，任一条件满足时停止。每个客户端有自己的随机数生成器，种子由
+    `seed`和客户端编号决定，因此请求序列是可重现的。
+
+    Args:
+        fetcher: 被测试的fetcher
+        workload: 负载函数
+        clients: 并发的客户端数
+        requests: 所有客户端合计发出的请求数
+        duration: 测试的时长，单位为秒
+        seed: 随机数种子
+
+    Returns:
+        测试结果
+    """
+    if requests is None and duration is None:
+        raise ValueError("either requests or duration should be specified")
+
+    stats: Dict[str, MethodStats] = {}
+    issued = 0
+    start = time.perf_counter()
+
+    def more() -> bool:
+        if requests is not None and issued >= requests:
+            return False
+        if duration is not None and time.perf_counter() - start >= duration:
+            return False
+        return True
+
+    async def client(i: int):
+        nonlocal issued
+        rng = random.Random(seed * 1_000_003 + i)
+        while more():
+            issued += 1
+            method, args, kwargs = workload(rng, i)
+            s = stats.setdefault(method, MethodStats())
+
+            t0 = time.perf_counter()
+            try:
+                await getattr(fetcher, method)(*args, **kwargs)
+            except Exception:
+                s.errors += 1
+            s.latencies.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*[client(i) for i in range(clients)])
+    return LoadReport(stats, time.perf_counter() - start)
+
+
+__all__ = ["LoadReport", "MethodStats", "Workload", "bars_workload", "run_load"]
@@ -0,0 +1,249 @@
+"""多个上游实例组成的fetcher池
+
+通过`QuotesFetcher.create_instance`可以创建多个上游会话(或者使用多个账号)，`FetcherPool`把它们组合为
+一个`QuotesFetcher`：
+
+- 负载均衡：每次请求都发给在途请求最少的实例
+- 健康检查：实例连续失败`failure_threshold`次后熔断，`cooldown`秒后只放行一个试探请求，成功则恢复
+- quota：按`default_costs`估算每次请求的消耗，分别扣减各实例的quota，quota不足的实例不再接收请求
+- 故障转移：请求失败时，换一个实例重试
+- 对冲请求：请求耗时超过该实例延时的`hedge_quantile`分位数后，向另一个实例再发一次，取先返回的结果
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from coretypes.fetchers.base import FetcherWrapper
+from coretypes.quota import default_costs, estimate_cost, unscheduled_methods
+from coretypes.quote_fetcher import QuotesFetcher
+
+
+class _Instance:
+    __slots__ = (
+        "fetcher",
+        "outstanding",
+        "served",
+        "failures",
+        "open_until",
+        "quota",
+        "latencies",
+    )
+
+    def __init__(self, fetcher: QuotesFetcher, window: int):
+        self.fetcher = fetcher
+        self.outstanding = 0
+        self.served = 0
+        self.failures = 0
+        self.open_until = 0.0
+        # 未知时为None，视为充足
+        self.quota: Optional[int] = None
+        self.latencies = deque(maxlen=window)
+
+
+class FetcherPool(FetcherWrapper):
+    """由多个上游实例组成的fetcher
+
+    Examples:
+        >>> pool = FetcherPool([fetcher1, fetcher2, fetcher3], hedge_quantile=0.95)  # doctest: +SKIP
+        >>> await pool.get_quota()  # 同步各实例的quota  # doctest: +SKIP
+        >>> await pool.get_bars("000001.XSHE", end, 10, FrameType.DAY)  # doctest: +SKIP
+    """
+
+    def __init__(
+        self,
+        instances: Sequence[QuotesFetcher],
+        failure_threshold: int = 5,
+        cooldown: float = 30,
+        retries: int = 1,
+        hedge_quantile: Optional[float] = None,
+        min_samples: int = 20,
+        latency_window: int = 200,
+        costs: Optional[Dict[str, Callable[[Dict[str, Any]], int]]] = None,
+    ):
+        """构造函数
+
+        Args:
+            instances: 上游实例
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 熔断的时长，单位为秒
+            retries: 请求失败后，最多在其它实例上重试的次数
+            hedge_quantile: 发出对冲请求的延时分位数，比如0.95。为None时不发出对冲请求
+            min_samples: 实例的延时样本数达到此值后，才会发出对冲请求
+            latency_window: 每个实例保留的最近的延时样本数
+            costs: 各方法消耗quota的估算函数，会覆盖`default_costs`中的同名项
+        """
+        if len(instances) == 0:
+            raise ValueError("at least one instance is required")
+
+        super().__init__(instances[0])
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.retries = retries
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.costs = {**default_costs, **(costs or {})}
+
+        # 发出的对冲请求数
+        self.hedged = 0
+
+        self._instances = [_Instance(fetcher, latency_window) for fetcher in instances]
+
+    def status(self) -> List[Dict[str, Any]]:
+        """各实例的状态：在途请求数、已处理的请求数、连续失败次数、quota以及是否熔断"""
+        now = time.monotonic()
+        return [
+            {
+                "outstanding": instance.outstanding,
+                "served": instance.served,
+                "failures": instance.failures,
+                "quota": instance.quota,
+                "open": instance.open_until > now,
+            }
+            for instance in self._instances
+        ]
+
+    async def get_quota(self) -> int:
+        """查询各实例的quota，更新记录并返回总和。查询失败的实例不计入"""
+        quotas = await asyncio.gather(
+            *(instance.fetcher.get_quota() for instance in self._instances),
+            return_exceptions=True,
+        )
+
+        total = 0
+        for instance, quota in zip(self._instances, quotas):
+            if isinstance(quota, Exception):
+                continue
+            instance.quota = quota
+            total += quota
+
+        return total
+
+    def _pick(self, cost: int, exclude: Set[_Instance]) -> Optional[_Instance]:
+        now = time.monotonic()
+        candidates = []
+        for instance in self._instances:
+            if instance in exclude or instance.open_until > now:
+                continue
+
+            if instance.failures >= self.failure_threshold and instance.outstanding:
+                # 半开状态，已有一个试探请求在途
+                continue
+
+            if instance.quota is not None and instance.quota < cost:
+                continue
+
+            candidates.append(instance)
+
+        if not candidates:
+            return None
+
+        return min(candidates, key=lambda i: (i.outstanding, i.served))
+
+    def _hedge_delay(self, instance: _Instance) -> Optional[float]:
+        if self.hedge_quantile is None or len(instance.latencies) < self.min_samples:
+            return None
+
+        return float(np.quantile(instance.latencies, self.hedge_quantile))
+
+    async def _run(
+        self, instance: _Instance, cost: int, method: str, args: tuple, kwargs: dict
+    ) -> Any:
+        instance.outstanding += 1
+        instance.served += 1
+        if instance.quota is not None:
+            instance.quota -= cost
+
+        start = time.monotonic()
+        try:
+            result = await getattr(instance.fetcher, method)(*args, **kwargs)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            instance.failures += 1
+            if instance.failures >= self.failure_threshold:
+                instance.open_until = time.monotonic() + self.cooldown
+            raise
+        else:
+            instance.failures = 0
+            instance.latencies.append(time.monotonic() - start)
+            return result
+        finally:
+            instance.outstanding -= 1
+
+    async def _hedged(
+        self,
+        instance: _Instance,
+        cost: int,
+        tried: Set[_Instance],
+        method: str,
+        args: tuple,
+        kwargs: dict,
+    ) -> Any:
+        delay = self._hedge_delay(instance)
+        if delay is None:
+            return await self._run(instance, cost, method, args, kwargs)
+
+        running = {
+            asyncio.ensure_future(self._run(instance, cost, method, args, kwargs))
+        }
+        try:
+            done, running = await asyncio.wait(running, timeout=delay)
+            if not done:
+                backup = self._pick(cost, tried)
+                if backup is not None:
+                    tried.add(backup)
+                    self.hedged += 1
+                    running.add(
+                        asyncio.ensure_future(
+                            self._run(backup, cost, method, args, kwargs)
+                        )
+                    )
+
+            error = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+
+                if not running:
+                    raise error
+
+                done, running = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        if method in unscheduled_methods:
+            cost = 0
+        else:
+            cost = estimate_cost(
+                self.costs, getattr(QuotesFetcher, method), *args, **kwargs
+            )
+
+        tried = set()
+        error = None
+        for _ in range(self.retries + 1):
+            instance = self._pick(cost, tried)
+            if instance is None:
+                break
+
+            tried.add(instance)
+            try:
+                return await self._hedged(instance, cost, tried, method, args, kwargs)
+            except Exception as e:
+                error = e
+
+        if error is not None:
+            raise error
+
+        raise RuntimeError("no upstream instance is available")
+
+
+__all__ = ["FetcherPool"]
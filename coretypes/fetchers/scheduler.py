@@ -0,0 +1,247 @@
+"""基于quota的请求调度
+
+夜间同步与盘中实时请求同时运行时，同步任务会耗尽上游的quota，导致实时请求失败。`QuotaScheduler`
+包装一个`QuotesFetcher`，按方法估算每次调用消耗的quota，并：
+
+- 以令牌桶的方式扣减quota，定期通过`get_quota`与上游重新同步
+- 限制并发的请求数
+- 按优先级调度，并为高优先级的请求保留一部分quota
+- 同一优先级内，在不同的客户端之间轮转，避免某个客户端独占
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, Optional
+
+from coretypes.fetchers.base import FetcherWrapper
+from coretypes.quota import default_costs, estimate_cost, unscheduled_methods
+from coretypes.quote_fetcher import QuotesFetcher
+
+
+class Priority(IntEnum):
+    """请求的优先级，值越小越优先"""
+
+    REALTIME = 0
+    NORMAL = 1
+    BACKFILL = 2
+
+
+class _Request:
+    __slots__ = ("future", "cost", "priority")
+
+    def __init__(self, future: asyncio.Future, cost: int, priority: Priority):
+        self.future = future
+        self.cost = cost
+        self.priority = priority
+
+
+class QuotaScheduler:
+    """quota感知的请求调度器
+
+    通过`client`方法得到带有客户端名称和优先级的`QuotesFetcher`，各个服务使用它们代替原始的fetcher。
+
+    Examples:
+        >>> scheduler = QuotaScheduler(upstream, reserve={Priority.BACKFILL: 100_000})  # doctest: +SKIP
+        >>> realtime = scheduler.client("trader", Priority.REALTIME)  # doctest: +SKIP
+        >>> backfill = scheduler.client("sync", Priority.BACKFILL)  # doctest: +SKIP
+    """
+
+    def __init__(
+        self,
+        fetcher: QuotesFetcher,
+        max_concurrency: int = 10,
+        sync_interval: float = 60,
+        reserve: Optional[Dict[Priority, int]] = None,
+        costs: Optional[Dict[str, Callable[[Dict[str, Any]], int]]] = None,
+    ):
+        """构造函数
+
+        Args:
+            fetcher: 上游fetcher
+            max_concurrency: 最大并发请求数
+            sync_interval: 与上游同步quota的间隔，单位为秒。quota不足时，也按此间隔重试
+            reserve: 各优先级的请求需要保留的quota。比如`{Priority.BACKFILL: 10000}`表示只有剩余
+                quota在扣除本次消耗后仍不少于10000时，才会执行回填请求
+            costs: 各方法消耗quota的估算函数，会覆盖`default_costs`中的同名项
+        """
+        self.fetcher = fetcher
+        self.max_concurrency = max_concurrency
+        self.sync_interval = sync_interval
+        self.reserve = {priority: 0 for priority in Priority}
+        self.reserve.update(reserve or {})
+        self.costs = {**default_costs, **(costs or {})}
+
+        self.tokens: Optional[int] = None
+        self.running = 0
+
+        self._queues: Dict[Priority, "OrderedDict[str, Deque[_Request]]"] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self._last_sync = 0.0
+        self._syncing: Optional[asyncio.Task] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def client(
+        self, name: str = "default", priority: Priority = Priority.NORMAL
+    ) -> "ScheduledFetcher":
+        """返回以`name`为客户端名称、以`priority`为优先级的fetcher"""
+        return ScheduledFetcher(self, name, priority)
+
+    @property
+    def waiting(self) -> int:
+        """等待调度的请求数"""
+        return sum(
+            len(requests)
+            for clients in self._queues.values()
+            for requests in clients.values()
+        )
+
+    def cost_of(self, method: str, *args, **kwargs) -> int:
+        """估算调用`method`消耗的quota"""
+        return estimate_cost(
+            self.costs, getattr(QuotesFetcher, method), *args, **kwargs
+        )
+
+    async def call(
+        self, client: str, priority: Priority, method: str, *args, **kwargs
+    ) -> Any:
+        """以`client`的名义、按`priority`优先级调用上游的`method`方法"""
+        func = getattr(self.fetcher, method)
+        if method in unscheduled_methods:
+            return await func(*args, **kwargs)
+
+        cost = self.cost_of(method, *args, **kwargs)
+        future = asyncio.get_running_loop().create_future()
+        request = _Request(future, cost, priority)
+        self._queues[priority].setdefault(client, deque()).append(request)
+
+        self._maybe_sync()
+        self._schedule()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已获得执行许可，但调用者被取消了
+                self._release()
+            raise
+
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self._release()
+
+    def _release(self):
+        self.running -= 1
+        self._schedule()
+
+    def _maybe_sync(self):
+        if self._syncing is not None:
+            return
+
+        if (
+            self.tokens is None
+            or time.monotonic() - self._last_sync >= self.sync_interval
+        ):
+            self._syncing = asyncio.ensure_future(self._sync())
+
+    async def _sync(self):
+        try:
+            self.tokens = await self.fetcher.get_quota()
+            self._last_sync = time.monotonic()
+        except Exception:
+            # 同步失败时，保持原有的quota，稍后重试
+            self._last_sync = time.monotonic()
+            if self.tokens is None:
+                self._fail_all()
+        finally:
+            self._syncing = None
+
+        self._schedule()
+
+    def _fail_all(self):
+        error = RuntimeError("failed to sync quota from upstream")
+        for clients in self._queues.values():
+            for requests in clients.values():
+                for request in requests:
+                    if not request.future.done():
+                        request.future.set_exception(error)
+            clients.clear()
+
+    def _peek(self) -> Optional[_Request]:
+        """按优先级、并在客户端之间轮转，返回下一个待执行的请求"""
+        for priority in Priority:
+            clients = self._queues[priority]
+            while clients:
+                name, requests = next(iter(clients.items()))
+                while requests and requests[0].future.done():
+                    # 已被取消
+                    requests.popleft()
+
+                if requests:
+                    return requests[0]
+
+                del clients[name]
+
+        return None
+
+    def _pop(self, request: _Request):
+        clients = self._queues[request.priority]
+        name, requests = next(iter(clients.items()))
+        requests.popleft()
+
+        # 轮转到队尾
+        del clients[name]
+        if requests:
+            clients[name] = requests
+
+    def _schedule(self):
+        if self.tokens is None:
+            return
+
+        blocked = False
+        while self.running < self.max_concurrency:
+            request = self._peek()
+            if request is None:
+                break
+
+            if self.tokens - request.cost < self.reserve[request.priority]:
+                blocked = True
+                break
+
+            self._pop(request)
+            self.tokens -= request.cost
+            self.running += 1
+            request.future.set_result(None)
+
+        if blocked and self._timer is None:
+            # quota不足，等到下一次同步
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.sync_interval, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._maybe_sync()
+
+
+class ScheduledFetcher(FetcherWrapper):
+    """通过`QuotaScheduler`调度的fetcher，由`QuotaScheduler.client`创建"""
+
+    def __init__(self, scheduler: QuotaScheduler, name: str, priority: Priority):
+        super().__init__(scheduler.fetcher)
+        self.scheduler = scheduler
+        self.name = name
+        self.priority = priority
+
+    async def _call(self, method: str, *args, **kwargs):
+        return await self.scheduler.call(
+            self.name, self.priority, method, *args, **kwargs
+        )
+
+
+__all__ = [
+    "Priority",
+    "QuotaScheduler",
+    "ScheduledFetcher",
+]
@@ -0,0 +1,311 @@
+"""生成模拟行情数据的fetcher
+
+`SyntheticFetcher`在进程内实现`QuotesFetcher`接口，不访问上游，也不消耗quota，用于离线地、可重现地
+测试缓存、批量合并、连接池等组件的性能。
+
+行情数据由`seed`和证券代码决定：同一根k线无论通过哪个请求获取，结果都相同。日线是以随机游走生成的，
+分钟线在每个交易日内以布朗桥连接当日的开盘价和收盘价，且最高价、最低价和成交量与日线一致；其它周期由
+`resample`合成。
+
+延时、错误和quota可以配置，以模拟上游的行为。每次调用的延时和是否出错由(`seed`, 证券, 该证券上的调用
+序号)决定，与并发的协程被调度的先后无关。
+"""
+import asyncio
+import datetime
+import random
+import sys
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from coretypes.quota import default_costs, estimate_cost, unscheduled_methods
+from coretypes.quote_fetcher import QuotesFetcher
+from coretypes.resample import minutes_of_frame, minutes_per_day, resample
+from coretypes.trade_calendar import TradingCalendar
+from coretypes.types import BarsArray, Frame, FrameType, bars_dtype, security_info_dtype
+
+
+def lognormal_latency(
+    median: float, sigma: float = 0.5
+) -> Callable[[random.Random], float]:
+    """返回服从对数正态分布的延时函数
+
+    Args:
+        median: 延时的中位数，单位为秒
+        sigma: 对数的标准差，越大长尾越明显
+    """
+    mu = np.log(median)
+
+    def latency(rng: random.Random) -> float:
+        return rng.lognormvariate(mu, sigma)
+
+    return latency
+
+
+class SyntheticFetcher(QuotesFetcher):
+    """生成模拟行情数据的fetcher
+
+    Examples:
+        >>> fetcher = SyntheticFetcher(["000001.XSHE", "600000.XSHG"], seed=42, latency=lognormal_latency(0.02))  # doctest: +SKIP
+        >>> bars = await fetcher.get_bars("000001.XSHE", datetime.date(2022, 1, 4), 10, FrameType.DAY)  # doctest: +SKIP
+    """
+
+    def __init__(
+        self,
+        securities: Union[Sequence[str], np.ndarray] = (),
+        trade_days: Optional[np.ndarray] = None,
+        seed: int = 0,
+        latency: Optional[Callable[[random.Random], float]] = None,
+        error_rate: float = 0.0,
+        quota: Optional[int] = None,
+        cache_size: int = 1024,
+    ):
+        """构造函数
+
+        Args:
+            securities: 证券代码列表，或者`security_info_dtype`类型的数组。未列出的证券也可以获取
+                行情数据，视为在日历的第一天上市
+            trade_days: 交易日历，为None时使用2015~2025年的所有工作日
+            seed: 随机数种子
+            latency: 延时函数，以`random.Random`为参数，返回每次调用的延时(秒)。为None时没有延时
+            error_rate: 每次调用失败(抛出`ConnectionError`)的概率
+            quota: 可用的quota，为None时不限制。耗尽后调用将抛出`RuntimeError`
+            cache_size: 缓存的(证券, 交易日)分钟线的个数
+        """
+        if trade_days is None:
+            days = np.arange(
+                np.datetime64("2015-01-01"),
+                np.datetime64("2026-01-01"),
+                dtype="datetime64[D]",
+            )
+            trade_days = days[np.is_busday(days)]
+
+        self.calendar = TradingCalendar(trade_days)
+        self.seed = seed
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota = quota
+        self.cache_size = cache_size
+        self.calls: Dict[str, int] = {}
+
+        if isinstance(securities, np.ndarray) and securities.dtype.names:
+            self.securities = securities
+        else:
+            self.securities = np.empty(len(securities), dtype=security_info_dtype)
+            self.securities["code"] = list(securities)
+            self.securities["alias"] = list(securities)
+            self.securities["name"] = list(securities)
+            self.securities["ipo"] = self.calendar.days[0]
+            self.securities["end"] = np.datetime64("2200-01-01")
+            self.securities["type"] = "stock"
+
+        self._ipo = dict(zip(self.securities["code"], self.securities["ipo"]))
+        self._call_index: Dict[tuple, int] = {}
+        self._daily: Dict[str, BarsArray] = {}
+        self._periods: Dict[tuple, BarsArray] = {}
+        self._minutes: "OrderedDict[tuple, BarsArray]" = OrderedDict()
+
+    # ---------------------------------------------------------------------
+    # 模拟上游的延时、错误和quota
+    # ---------------------------------------------------------------------
+    def _call_rng(self, method: str, sec: Union[List, str, None]) -> random.Random:
+        """返回本次调用专用的随机数发生器，由(seed, 证券, 调用序号)决定"""
+        if sec is None:
+            sec = ""
+        elif not isinstance(sec, str):
+            sec = ",".join(sec)
+
+        key = (method, sec)
+        index = self._call_index.get(key, 0)
+        self._call_index[key] = index + 1
+        return random.Random(f"{self.seed}:{method}:{sec}:{index}")
+
+    async def _simulate(self, method: str, *args, **kwargs):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        rng = self._call_rng(method, args[0] if args else None)
+
+        if self.latency is not None:
+            await asyncio.sleep(self.latency(rng))
+
+        if self.error_rate > 0 and rng.random() < self.error_rate:
+            raise ConnectionError(f"synthetic error in {method}")
+
+        if self.quota is not None and method not in unscheduled_methods:
+            func = getattr(QuotesFetcher, method)
+            cost = estimate_cost(default_costs, func, *args, **kwargs)
+            if cost > self.quota:
+                raise RuntimeError("quota exhausted")
+            self.quota -= cost
+
+    # ---------------------------------------------------------------------
+    # 数据生成
+    # ---------------------------------------------------------------------
+    def _key(self, code: str) -> int:
+        return zlib.crc32(code.encode())
+
+    def _daily_bars(self, code: str) -> BarsArray:
+        bars = self._daily.get(code)
+        if bars is not None:
+            return bars
+
+        rng = np.random.default_rng([self.seed, self._key(code)])
+        n = len(self.calendar.days)
+
+        base = rng.uniform(5, 100)
+        close = base * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        prev = np.r_[base, close[:-1]]
+        open_ = prev * np.exp(rng.normal(0, 0.005, n))
+        high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.01, n)))
+        low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.01, n)))
+
+        bars = np.empty(n, dtype=bars_dtype)
+        bars["frame"] = self.calendar.days
+        bars["open"] = open_.round(2)
+        bars["high"] = high.round(2)
+        bars["low"] = low.round(2)
+        bars["close"] = close.round(2)
+        bars["volume"] = np.round(rng.lognormal(16, 0.5, n), -2)
+        bars["amount"] = bars["volume"] * (open_ + high + low + close) / 4
+        bars["factor"] = 1.0
+
+        self._daily[code] = bars
+        return bars
+
+    def _period_bars(self, code: str, frame_type: FrameType) -> BarsArray:
+        key = (code, frame_type)
+        bars = self._periods.get(key)
+        if bars is None:
+            bars = resample(self._daily_bars(code), frame_type, include_unclosed=True)
+            self._periods[key] = bars
+
+        return bars
+
+    def _minute_bars(self, code: str, day_idx: int) -> BarsArray:
+        """第`day_idx`个交易日的1分钟线"""
+        key = (code, day_idx)
+        bars = self._minutes.get(key)
+        if bars is not None:
+            self._minutes.move_to_end(key)
+            return bars
+
+        day = self._daily_bars(code)[day_idx]
+        open_, high, low, close = (
+            float(day[name]) for name in ("open", "high", "low", "close")
+        )
+
+        n = minutes_per_day
+        rng = np.random.default_rng([self.seed, self._key(code), day_idx])
+
+        # 布朗桥：从开盘价出发，收于收盘价
+        steps = rng.normal(0, 1, n)
+        walk = np.cumsum(steps)
+        t = np.arange(1, n + 1) / n
+        bridge = walk - t * walk[-1]
+        scale = (high - low) / 4 / max(np.abs(bridge).max(), 1e-9)
+        closes = np.clip(open_ + t * (close - open_) + bridge * scale, low, high)
+        opens = np.r_[open_, closes[:-1]]
+
+        wick = np.abs(rng.normal(0, (high - low) / 20 + 1e-9, (2, n)))
+        highs = np.minimum(np.maximum(opens, closes) + wick[0], high)
+        lows = np.maximum(np.minimum(opens, closes) - wick[1], low)
+        # 日线的最高价和最低价必定在某一分钟出现
+        hi_at, lo_at = rng.integers(0, n, 2)
+        highs[hi_at] = high
+        lows[lo_at] = low
+
+        # 成交量呈U型分布，总量与日线一致
+        weights = rng.uniform(0.5, 1.5, n) * (1 + 4 * (t - 0.5) ** 2)
+        volumes = np.floor(float(day["volume"]) * weights / weights.sum() / 100) * 100
+        volumes[-1] += float(day["volume"]) - volumes.sum()
+
+        bars = np.empty(n, dtype=bars_dtype)
+        bars["frame"] = self.calendar.get_frames(
+            day["frame"], day["frame"] + np.timedelta64(1, "D"), FrameType.MIN1
+        )
+        bars["open"] = opens.round(2)
+        bars["high"] = highs.round(2)
+        bars["low"] = lows.round(2)
+        bars["close"] = closes.round(2)
+        bars["volume"] = volumes
+        bars["amount"] = volumes * (opens + closes) / 2
+        bars["factor"] = 1.0
+
+        self._minutes[key] = bars
+        while len(self._minutes) > self.cache_size:
+            self._minutes.popitem(last=False)
+
+        return bars
+
+    def bars(
+        self, sec: str, end: Frame, n_bars: int, frame_type: FrameType
+    ) -> BarsArray:
+        """同步地生成以`end`结束的`n_bars`根k线，不模拟延时、错误和quota"""
+        end_ = np.datetime64(end, "s")
+        ipo = np.datetime64(self._ipo.get(sec, self.calendar.days[0]), "s")
+
+        if frame_type in minutes_of_frame:
+            hi = int(self.calendar.floor_index(end_, frame_type))
+            lo = max(hi - n_bars + 1, int(self.calendar.ceil_index(ipo, frame_type)), 0)
+            if hi < lo:
+                return np.empty(0, dtype=bars_dtype)
+
+            first, last = self.calendar.frame_of([lo, hi], frame_type)
+            lo_day = int(self.calendar.floor_index(first, FrameType.DAY))
+            hi_day = int(self.calendar.floor_index(last, FrameType.DAY))
+            bars = np.concatenate(
+                [self._minute_bars(sec, i) for i in range(lo_day, hi_day + 1)]
+            )
+            if frame_type != FrameType.MIN1:
+                bars = resample(bars, frame_type)
+        elif frame_type == FrameType.DAY:
+            bars = self._daily_bars(sec)
+        else:
+            bars = self._period_bars(sec, frame_type)
+
+        frames = bars["frame"]
+        i = np.searchsorted(frames, end_, side="right")
+        j = max(i - n_bars, np.searchsorted(frames, ipo), 0)
+        return bars[j:i].copy()
+
+    # ---------------------------------------------------------------------
+    # QuotesFetcher接口
+    # ---------------------------------------------------------------------
+    async def get_quota(self) -> int:
+        await self._simulate("get_quota")
+        return sys.maxsize if self.quota is None else self.quota
+
+    async def get_security_list(self) -> np.ndarray:
+        await self._simulate("get_security_list")
+        return self.securities.copy()
+
+    async def get_all_trade_days(self):
+        await self._simulate("get_all_trade_days")
+        return self.calendar.days.astype(datetime.date)
+
+    async def get_bars(
+        self,
+        sec: str,
+        end: Frame,
+        n_bars: int,
+        frame_type: FrameType,
+        allow_unclosed=True,
+    ) -> BarsArray:
+        await self._simulate("get_bars", sec, end, n_bars, frame_type, allow_unclosed)
+        return self.bars(sec, end, n_bars, frame_type)
+
+    async def get_price(
+        self,
+        sec: Union[List, str],
+        end_at: Union[str, datetime.datetime],
+        n_bars: int,
+        frame_type: str,
+    ) -> Dict[str, BarsArray]:
+        await self._simulate("get_price", sec, end_at, n_bars, frame_type)
+        secs = [sec] if isinstance(sec, str) else sec
+        ft = FrameType(frame_type)
+        return {code: self.bars(code, end_at, n_bars, ft) for code in secs}
+
+
+__all__ = ["SyntheticFetcher", "lognormal_latency"]
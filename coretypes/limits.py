@@ -0,0 +1,96 @@
+"""涨跌停价与行情数据的合并
+
+涨跌停价通常以`LimitPriceOnlyBarsArray`的形式单独获取。`join_limits`通过对(code, 交易日)进行
+排序-归并连接，一次向量化地将其合并到行情数据中，得到`BarsWithLimitArray`或者`BarsWithLimitPanel`。
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+from coretypes.types import (
+    BarsArray,
+    BarsPanel,
+    BarsWithLimitArray,
+    BarsWithLimitPanel,
+    LimitPriceOnlyBarsArray,
+    bars_with_limit_dtype,
+)
+
+join_key_dtype = np.dtype([("code", "O"), ("frame", "datetime64[s]")])
+"""`join_limits`返回的未匹配键的类型"""
+
+
+def join_limits(
+    bars: BarsPanel,
+    limits: LimitPriceOnlyBarsArray,
+    code: Optional[str] = None,
+) -> Tuple[BarsWithLimitPanel, np.ndarray]:
+    """将涨跌停价合并到行情数据中
+
+    连接的键为(code, 交易日)，因此分钟线也会得到当天的涨跌停价。如果同一个键在`limits`中出现多次，
+    以最后一次为准。结果保持`bars`原有的顺序。
+
+    Args:
+        bars: `BarsPanel`，或者单支证券的`BarsArray`(此时需要指定`code`)。也可以是
+            `compact_bars_dtype_with_code`类型，此时`limits`也应该使用整数编号的code。
+        limits: 涨跌停价数据
+        code: 当`bars`不包含code字段时，其证券代码
+
+    Returns:
+        二元组(合并后的行情数据，未匹配的键)。`bars`为`BarsPanel`时，结果为`BarsWithLimitPanel`，
+        否则为`BarsWithLimitArray`。没有匹配到涨跌停价的行，high_limit和low_limit为NaN，其
+        (code, frame)将出现在未匹配的键中，类型为`join_key_dtype`。
+    """
+    has_code = "code" in bars.dtype.names
+    if not has_code and code is None:
+        raise ValueError("code is required when bars has no code field")
+
+    if has_code:
+        # 对bars_dtype_with_code，即为bars_with_limit_dtype_with_code
+        dtype = np.dtype(bars.dtype.descr + [("high_limit", "f4"), ("low_limit", "f4")])
+        bar_codes = bars["code"]
+    else:
+        dtype = bars_with_limit_dtype
+        bar_codes = np.full(len(bars), code, dtype=object)
+
+    result = np.empty(len(bars), dtype=dtype)
+    for name in bars.dtype.names:
+        result[name] = bars[name]
+
+    bar_days = bars["frame"].astype("datetime64[D]").astype(np.int64)
+    limit_days = np.asarray(limits["frame"]).astype("datetime64[D]").astype(np.int64)
+
+    # 将code映射为连续的整数，与日期组合成一个可比较的整数键
+    codes, inverse = np.unique(
+        np.concatenate([bar_codes, limits["code"]]), return_inverse=True
+    )
+    inverse = inverse.reshape(-1)
+    days = np.concatenate([bar_days, limit_days])
+    base = days.min() if len(days) else 0
+    span = (days.max() - base + 1) if len(days) else 1
+    keys = inverse * span + (days - base)
+    bar_keys, limit_keys = keys[: len(bars)], keys[len(bars) :]
+
+    # 稳定排序后，重复键中最后一个位于最右侧
+    order = np.argsort(limit_keys, kind="stable")
+    sorted_keys = limit_keys[order]
+    pos = np.searchsorted(sorted_keys, bar_keys, side="right") - 1
+    pos = np.maximum(pos, 0)
+    if len(sorted_keys):
+        matched = sorted_keys[pos] == bar_keys
+    else:
+        matched = np.zeros(len(bars), dtype=bool)
+
+    for name in ("high_limit", "low_limit"):
+        values = limits[name][order]
+        result[name] = np.where(matched, values[pos] if len(values) else 0, np.nan)
+
+    missing = ~matched
+    unmatched = np.empty(missing.sum(), dtype=join_key_dtype)
+    unmatched["code"] = bar_codes[missing]
+    unmatched["frame"] = bars["frame"][missing]
+
+    return result, unmatched
+
+
+__all__ = ["join_limits", "join_key_dtype"]
@@ -0,0 +1,231 @@
+"""向量化的委托撮合
+
+`match_orders`一次性地撮合一批委托：每个委托与同一证券在委托时间之后、当天收盘之前的k线进行匹配，
+所有判断都以数组运算完成，不逐个委托地执行Python代码。撮合规则如下：
+
+- 没有可匹配的k线时，委托失败，错误为`NoDataForMatch`
+- 买入时，整根k线都在涨停价上(最低价不低于涨停价)的k线不能成交；卖出时，整根k线都在跌停价上的
+  k线不能成交。所有k线都不能成交时，错误为`BuylimitError`/`SellLimitError`。行情数据不包含涨跌停价
+  时，不做此项检查
+- 限价买入要求k线的最低价不高于委托价，限价卖出要求最高价不低于委托价，委托价为NaN时为市价委托。
+  都不满足时，错误为`PriceNotMeet`
+- 满足价格条件的k线成交量都为零时，错误为`VolumeNotMeet`
+
+委托在第一根满足全部条件的k线上成交，成交价为开盘价(开盘价优于委托价时)或者委托价，成交量不超过该
+k线的成交量(可能部分成交)。
+
+行情数据的frame均为零点时(日线)，委托与当天的日线匹配，不比较时间。
+"""
+from typing import Optional, Union
+
+import numpy as np
+
+from coretypes.errors.trade import ErrorCodes, TradeErrorBatch
+from coretypes.types import BarsPanel, BarsWithLimitPanel
+
+order_dtype = np.dtype(
+    [
+        ("code", "O"),
+        ("time", "datetime64[s]"),
+        ("side", "i1"),
+        ("price", "f8"),
+        ("volume", "f8"),
+    ]
+)
+"""委托的类型。side为1表示买入，-1表示卖出；price为NaN表示市价委托"""
+
+fill_dtype = np.dtype(
+    [
+        ("frame", "datetime64[s]"),
+        ("price", "f8"),
+        ("volume", "f8"),
+        ("error_code", "i4"),
+    ]
+)
+"""撮合结果的类型，与委托一一对应。error_code为0表示成交，此时frame为成交的k线"""
+
+BUY = 1
+SELL = -1
+
+# 证券编号在合并键中的位移，低位为相对于最早时间的秒数
+_shift = 34
+
+
+class MatchResult:
+    """`match_orders`的结果"""
+
+    def __init__(self, orders: np.ndarray, fills: np.ndarray):
+        self.orders = orders
+        self.fills = fills
+        self._errors: Optional[TradeErrorBatch] = None
+
+    def __len__(self) -> int:
+        return len(self.fills)
+
+    @property
+    def filled(self) -> np.ndarray:
+        """成交的委托的布尔掩码"""
+        return self.fills["error_code"] == 0
+
+    @property
+    def error_codes(self) -> np.ndarray:
+        """各委托的错误代码，成交的委托为0"""
+        return self.fills["error_code"]
+
+    @property
+    def errors(self) -> TradeErrorBatch:
+        """失败的委托对应的错误，在第一次访问时按错误代码分组生成
+
+        其顺序与`np.flatnonzero(~self.filled)`不同，而是按错误代码分组的。
+        """
+        if self._errors is not None:
+            return self._errors
+
+        batch = TradeErrorBatch()
+        codes = self.fills["error_code"]
+        orders = self.orders
+        for code in np.unique(codes[codes != 0]):
+            failed = orders[codes == code]
+            if code in (ErrorCodes.TradeReachBuyLimit, ErrorCodes.TradeReachSellLimit):
+                batch.record(code, failed["code"], failed["time"])
+            elif code == ErrorCodes.TradePirceNotMeet:
+                batch.record(code, failed["code"], failed["time"], failed["price"])
+            elif code == ErrorCodes.TradeVolNotEnough:
+                batch.record(code, failed["code"], values=failed["price"])
+            else:
+                batch.record(code, failed["code"], failed["time"])
+
+        self._errors = batch
+        return batch
+
+
+def match_orders(
+    orders: np.ndarray,
+    bars: Union[BarsWithLimitPanel, BarsPanel],
+    code: Optional[str] = None,
+) -> MatchResult:
+    """撮合一批委托
+
+    Args:
+        orders: `order_dtype`类型的委托
+        bars: 行情数据，为`BarsWithLimitPanel`时检查涨跌停，为`BarsPanel`时不检查。也可以是单支证券的
+            `BarsWithLimitArray`或者`BarsArray`，此时需要指定`code`。顺序不限
+        code: 当`bars`不包含code字段时，其证券代码
+
+    Returns:
+        撮合结果，其中`fills`与`orders`一一对应
+    """
+    orders = np.asarray(orders)
+    n = len(orders)
+    fills = np.zeros(n, dtype=fill_dtype)
+    fills["frame"] = np.datetime64("NaT")
+    fills["price"] = np.nan
+    if n == 0:
+        return MatchResult(orders, fills)
+
+    names = bars.dtype.names
+    if "code" in names:
+        bar_codes = bars["code"]
+    elif code is not None:
+        bar_codes = np.full(len(bars), code, dtype=object)
+    else:
+        raise ValueError("code is required when bars has no code field")
+
+    # 合并键：证券编号与时间(秒)，按合并键排序后，每个委托的匹配窗口是一段连续的区间
+    _, inverse = np.unique(
+        np.concatenate([bar_codes, orders["code"]]).astype(object),
+        return_inverse=True,
+    )
+    inverse = inverse.reshape(-1).astype(np.int64)
+    bar_ids, order_ids = inverse[: len(bars)], inverse[len(bars) :]
+
+    frames = bars["frame"].astype("datetime64[s]").astype(np.int64)
+    times = orders["time"].astype("datetime64[s]").astype(np.int64)
+    days = times // 86400 * 86400
+    daily = len(frames) > 0 and bool((frames % 86400 == 0).all())
+    starts_at = days if daily else times
+    origin = min(frames.min() if len(frames) else 0, days.min())
+
+    bar_keys = (bar_ids << _shift) + (frames - origin)
+    order_by = np.argsort(bar_keys, kind="stable")
+    bar_keys = bar_keys[order_by]
+
+    lo = np.searchsorted(bar_keys, (order_ids << _shift) + (starts_at - origin))
+    hi = np.searchsorted(
+        bar_keys, (order_ids << _shift) + (days + 86399 - origin), side="right"
+    )
+    lens = hi - lo
+    nonempty = lens > 0
+
+    # 按轮次撮合：第k轮检查每个尚未成交的委托窗口中的第k根k线。大部分委托在前几根k线就能成交，
+    # 需要检查的k线数远小于窗口的总长度
+    has_limit = "high_limit" in names
+    side = orders["side"]
+    price = orders["price"]
+    first = np.full(n, -1, dtype=np.int64)
+    any_unlocked = np.zeros(n, dtype=bool)
+    any_tradable = np.zeros(n, dtype=bool)
+
+    active = np.flatnonzero(nonempty)
+    k = 0
+    while len(active):
+        pos = order_by[lo[active] + k]
+        buy = side[active] == BUY
+        low = bars["low"][pos]
+        high = bars["high"][pos]
+
+        if has_limit:
+            locked = np.where(
+                buy, low >= bars["high_limit"][pos], high <= bars["low_limit"][pos]
+            )
+        else:
+            locked = np.zeros(len(active), dtype=bool)
+
+        limit = price[active]
+        price_ok = np.isnan(limit) | np.where(buy, low <= limit, high >= limit)
+        tradable = ~locked & price_ok
+        eligible = tradable & (bars["volume"][pos] > 0)
+
+        any_unlocked[active] |= ~locked
+        any_tradable[active] |= tradable
+        first[active[eligible]] = pos[eligible]
+
+        k += 1
+        active = active[~eligible & (lens[active] > k)]
+
+    matched = first >= 0
+    bar = bars[first[matched]]
+    o = orders[matched]
+    better = np.where(
+        o["side"] == BUY, bar["open"] <= o["price"], bar["open"] >= o["price"]
+    )
+    fills["frame"][matched] = bar["frame"]
+    fills["price"][matched] = np.where(
+        np.isnan(o["price"]) | better, bar["open"], o["price"]
+    )
+    fills["volume"][matched] = np.minimum(o["volume"], bar["volume"])
+
+    # 失败原因按检查的先后顺序确定
+    limit_code = np.where(
+        orders["side"] == BUY,
+        ErrorCodes.TradeReachBuyLimit,
+        ErrorCodes.TradeReachSellLimit,
+    )
+
+    codes = fills["error_code"]
+    codes[~matched] = ErrorCodes.TradeVolNotEnough
+    codes[~matched & ~any_tradable] = ErrorCodes.TradePirceNotMeet
+    codes[~matched & ~any_unlocked] = limit_code[~matched & ~any_unlocked]
+    codes[~nonempty] = ErrorCodes.ServerNoDataForMatch
+
+    return MatchResult(orders, fills)
+
+
+__all__ = [
+    "BUY",
+    "SELL",
+    "MatchResult",
+    "fill_dtype",
+    "match_orders",
+    "order_dtype",
+]
@@ -0,0 +1,280 @@
+"""`QuotesFetcher`各方法的运行指标
+
+`QuotesFetcher`的每个子类在定义时，其重写的接口方法都会被自动包装，调用时记录：
+
+- 调用次数和失败次数
+- 延时的直方图
+- 返回的行数和字节数
+- 估算消耗的quota(与`QuotaScheduler`使用相同的估算，并非上游实际扣减的值)，以及`get_quota`返回的
+  剩余quota
+
+`FetcherWrapper`等只是转发调用的包装器不记录指标，否则同一次上游调用会在每一层包装上各计一次。
+自定义的包装器可以将类属性`record_metrics`设为False以同样地跳过。
+
+指标默认是关闭的，关闭时包装的开销只是一次属性判断。通过`fetcher_metrics.enable()`打开，通过
+`snapshot()`获取快照，或者通过`to_prometheus()`导出为Prometheus的文本格式。
+
+Examples:
+    >>> from coretypes.metrics import fetcher_metrics
+    >>> fetcher_metrics.enable()  # doctest: +SKIP
+    >>> print(fetcher_metrics.to_prometheus())  # doctest: +SKIP
+"""
+import functools
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from coretypes.quota import default_costs, estimate_cost, unscheduled_methods
+
+latency_buckets: Tuple[float, ...] = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+"""延时直方图的桶上界，单位为秒"""
+
+
+class MethodMetrics:
+    """某个fetcher类的某个方法的指标"""
+
+    __slots__ = (
+        "calls",
+        "errors",
+        "rows",
+        "bytes",
+        "estimated_quota",
+        "latency_sum",
+        "buckets",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        # 按`default_costs`估算的quota，不是上游实际扣减的值
+        self.estimated_quota = 0
+        self.latency_sum = 0.0
+        # 最后一个桶对应+Inf
+        self.buckets = [0] * (len(latency_buckets) + 1)
+
+    def observe(self, latency: float):
+        self.latency_sum += latency
+        self.buckets[bisect_left(latency_buckets, latency)] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "estimated_quota": self.estimated_quota,
+            "latency_sum": self.latency_sum,
+            "latency_buckets": dict(
+                zip([*latency_buckets, float("inf")], np.cumsum(self.buckets).tolist())
+            ),
+        }
+
+
+def _measure(result: Any) -> Tuple[int, int]:
+    """返回结果的行数和字节数"""
+    if isinstance(result, np.ndarray):
+        return (len(result) if result.ndim else 1), result.nbytes
+
+    if isinstance(result, dict):
+        rows = nbytes = 0
+        for value in result.values():
+            r, n = _measure(value)
+            rows += r
+            nbytes += n
+        return rows, nbytes
+
+    if isinstance(result, (list, tuple)):
+        return len(result), 0
+
+    return 0, 0
+
+
+class FetcherMetrics:
+    """所有fetcher的指标，以(fetcher类名, 方法名)为键"""
+
+    def __init__(self):
+        self.enabled = False
+        self._methods: Dict[Tuple[str, str], MethodMetrics] = {}
+        self._quota: Dict[str, int] = {}
+
+    def enable(self):
+        """打开指标的记录"""
+        self.enabled = True
+
+    def disable(self):
+        """关闭指标的记录，已有的指标保留"""
+        self.enabled = False
+
+    def reset(self):
+        """清除已有的指标"""
+        self._methods.clear()
+        self._quota.clear()
+
+    def get(self, fetcher: str, method: str) -> MethodMetrics:
+        key = (fetcher, method)
+        metrics = self._methods.get(key)
+        if metrics is None:
+            metrics = self._methods[key] = MethodMetrics()
+        return metrics
+
+    def record(
+        self,
+        fetcher: str,
+        method: str,
+        latency: float,
+        result: Any = None,
+        error: bool = False,
+        estimated_quota: int = 0,
+    ):
+        """记录一次调用"""
+        metrics = self.get(fetcher, method)
+        metrics.calls += 1
+        metrics.estimated_quota += estimated_quota
+        metrics.observe(latency)
+
+        if error:
+            metrics.errors += 1
+            return
+
+        rows, nbytes = _measure(result)
+        metrics.rows += rows
+        metrics.bytes += nbytes
+
+        if method == "get_quota" and isinstance(result, (int, np.integer)):
+            self._quota[fetcher] = int(result)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前指标的快照"""
+        return {
+            "methods": {
+                f"{fetcher}.{method}": metrics.as_dict()
+                for (fetcher, method), metrics in self._methods.items()
+            },
+            "quota_remaining": dict(self._quota),
+        }
+
+    def to_prometheus(self, prefix: str = "quotes_fetcher") -> str:
+        """以Prometheus的文本格式导出指标"""
+        lines: List[str] = []
+
+        def labels(fetcher: str, method: str, **extra) -> str:
+            pairs = {"fetcher": fetcher, "method": method, **extra}
+            return ",".join(f'{k}="{v}"' for k, v in pairs.items())
+
+        counters = (
+            ("calls_total", "calls", "Number of calls"),
+            ("errors_total", "errors", "Number of failed calls"),
+            ("rows_total", "rows", "Number of rows returned"),
+            ("bytes_total", "bytes", "Number of bytes returned"),
+            (
+                "estimated_quota_total",
+                "estimated_quota",
+                "Quota consumed, estimated from the call arguments",
+            ),
+        )
+        for name, attr, help_ in counters:
+            lines.append(f"# HELP {prefix}_{name} {help_}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for (fetcher, method), metrics in self._methods.items():
+                value = getattr(metrics, attr)
+                lines.append(f"{prefix}_{name}{{{labels(fetcher, method)}}} {value}")
+
+        name = f"{prefix}_latency_seconds"
+        lines.append(f"# HELP {name} Latency of calls")
+        lines.append(f"# TYPE {name} histogram")
+        for (fetcher, method), metrics in self._methods.items():
+            total = 0
+            for bound, count in zip([*latency_buckets, "+Inf"], metrics.buckets):
+                total += count
+                le = labels(fetcher, method, le=bound)
+                lines.append(f"{name}_bucket{{{le}}} {total}")
+            lines.append(
+                f"{name}_sum{{{labels(fetcher, method)}}} {metrics.latency_sum}"
+            )
+            lines.append(f"{name}_count{{{labels(fetcher, method)}}} {metrics.calls}")
+
+        name = f"{prefix}_quota_remaining"
+        lines.append(f"# HELP {name} Quota reported by get_quota")
+        lines.append(f"# TYPE {name} gauge")
+        for fetcher, quota in self._quota.items():
+            lines.append(f'{name}{{fetcher="{fetcher}"}} {quota}')
+
+        return "\n".join(lines) + "\n"
+
+
+fetcher_metrics = FetcherMetrics()
+"""全局的fetcher指标"""
+
+
+def _estimate(method: str, func: Callable, args: tuple, kwargs: dict) -> int:
+    if method in unscheduled_methods:
+        return 0
+
+    try:
+        return estimate_cost(default_costs, func, *args, **kwargs)
+    except (TypeError, KeyError):
+        return 0
+
+
+def instrument(owner: str, method: str, func: Callable) -> Callable:
+    """包装异步方法`func`，在`fetcher_metrics`打开时记录其指标"""
+    if getattr(func, "__instrumented__", False):
+        return func
+
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        if not fetcher_metrics.enabled:
+            return await func(self, *args, **kwargs)
+
+        estimated = _estimate(method, func, args, kwargs)
+        start = time.perf_counter()
+        try:
+            result = await func(self, *args, **kwargs)
+        except Exception:
+            fetcher_metrics.record(
+                owner,
+                method,
+                time.perf_counter() - start,
+                error=True,
+                estimated_quota=estimated,
+            )
+            raise
+
+        fetcher_metrics.record(
+            owner,
+            method,
+            time.perf_counter() - start,
+            result,
+            estimated_quota=estimated,
+        )
+        return result
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+__all__ = [
+    "FetcherMetrics",
+    "MethodMetrics",
+    "fetcher_metrics",
+    "instrument",
+    "latency_buckets",
+]
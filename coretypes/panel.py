@@ -0,0 +1,200 @@
+"""带索引的行情数据面板
+
+`BarsPanel`只是一个`bars_dtype_with_code`数组，从中取出某个证券或者某个时间段的数据都需要全表扫描。
+`IndexedBarsPanel`在构建时按(code, frame)排序一次，并保存每个证券的起止偏移，此后按证券取数为O(1)，
+按时间段取数为每个证券一次二分查找(向量化完成)。
+"""
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from coretypes.types import BarsPanel, Frame
+
+
+class IndexedBarsPanel:
+    """按(code, frame)排序并建立索引的行情数据面板
+
+    可以由`bars_dtype_with_code`数组构建，也可以由`compact_bars_dtype_with_code`数组构建。
+
+    Examples:
+        >>> panel = IndexedBarsPanel(bars)  # doctest: +SKIP
+        >>> panel["000001.XSHE"]  # doctest: +SKIP
+        >>> panel.between(datetime.date(2022, 1, 4), datetime.date(2022, 1, 10))  # doctest: +SKIP
+        >>> panel.reduce(np.maximum, "high")  # doctest: +SKIP
+    """
+
+    def __init__(self, bars: BarsPanel):
+        """构造函数
+
+        Args:
+            bars: 带有code和frame字段的行情数据，无须排序
+        """
+        codes, inverse = np.unique(bars["code"], return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.lexsort((bars["frame"], inverse))
+
+        counts = np.bincount(inverse, minlength=len(codes))
+        self._init(bars[order], codes, counts)
+
+    def _init(self, data: np.ndarray, codes: np.ndarray, counts: np.ndarray):
+        self._data = data
+        self._codes = codes
+        self._stops = np.cumsum(counts)
+        self._starts = self._stops - counts
+        self._index = {code: i for i, code in enumerate(codes.tolist())}
+        self._keys: Optional[Tuple[np.ndarray, int, int]] = None
+
+    def _search_keys(self) -> Tuple[np.ndarray, int, int]:
+        """返回(keys, base, span)，在第一次查询时计算并缓存
+
+        将(code序号, frame)组合成一个全局递增的键keys = code序号 * span + (frame - base)，从而可以
+        一次searchsorted完成所有证券的查找。
+        """
+        if self._keys is None:
+            frames = self._data["frame"].astype("datetime64[s]").astype(np.int64)
+            base = int(frames.min())
+            span = int(frames.max()) - base + 2
+            group = np.repeat(np.arange(len(self._codes)), self._stops - self._starts)
+            self._keys = (group * span + (frames - base), base, span)
+
+        return self._keys
+
+    @classmethod
+    def _from_sorted(
+        cls, data: np.ndarray, codes: np.ndarray, counts: np.ndarray
+    ) -> "IndexedBarsPanel":
+        panel = cls.__new__(cls)
+        panel._init(data, codes, counts)
+        return panel
+
+    @property
+    def data(self) -> BarsPanel:
+        """按(code, frame)排序后的行情数据"""
+        return self._data
+
+    @property
+    def codes(self) -> np.ndarray:
+        """面板中的证券代码，已排序"""
+        return self._codes
+
+    @property
+    def offsets(self) -> Tuple[np.ndarray, np.ndarray]:
+        """每个证券在`data`中的起始(包含)和结束(不包含)位置，与`codes`一一对应"""
+        return self._starts, self._stops
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, code: Any) -> bool:
+        return code in self._index
+
+    def __getitem__(self, code: Any) -> BarsPanel:
+        """返回`code`对应的行情数据，为`data`的视图"""
+        i = self._index[code]
+        return self._data[self._starts[i] : self._stops[i]]
+
+    def get(
+        self, code: Any, default: Optional[BarsPanel] = None
+    ) -> Optional[BarsPanel]:
+        """与`__getitem__`相同，但`code`不存在时返回`default`"""
+        if code not in self._index:
+            return default
+
+        return self[code]
+
+    def between(
+        self, start: Optional[Frame] = None, end: Optional[Frame] = None
+    ) -> "IndexedBarsPanel":
+        """返回所有证券在[start, end]区间的行情数据
+
+        每个证券的区间边界通过二分查找确定，所有证券的查找一次向量化完成。查找用的键在第一次调用时
+        计算并缓存，此后每次查询的代价为O(k log n)，k为证券数。
+
+        Args:
+            start: 起始帧，为None时不限制
+            end: 结束帧，为None时不限制
+
+        Returns:
+            新的`IndexedBarsPanel`，保留原有的证券列表(包括区间内没有数据的证券)
+        """
+        if len(self._data) == 0:
+            return self
+
+        keys, base, span = self._search_keys()
+        offsets = np.arange(len(self._codes)) * span
+        lo_rel = (
+            0 if start is None else np.datetime64(start, "s").astype(np.int64) - base
+        )
+        hi_rel = (
+            span - 1 if end is None else np.datetime64(end, "s").astype(np.int64) - base
+        )
+        lo_rel = np.clip(lo_rel, 0, span - 1)
+        hi_rel = np.clip(hi_rel, -1, span - 1)
+
+        lo = np.searchsorted(keys, offsets + lo_rel, side="left")
+        hi = np.searchsorted(keys, offsets + hi_rel, side="right")
+        counts = np.maximum(hi - lo, 0)
+
+        # 向量化地拼接各个区间的下标
+        total = counts.sum()
+        stops = np.cumsum(counts)
+        idx = np.arange(total) + np.repeat(lo - (stops - counts), counts)
+
+        return IndexedBarsPanel._from_sorted(self._data[idx], self._codes, counts)
+
+    def groups(self) -> Iterator[Tuple[Any, BarsPanel]]:
+        """依次返回每个证券的代码及其行情数据(视图)"""
+        for code, start, stop in zip(self._codes, self._starts, self._stops):
+            yield code, self._data[start:stop]
+
+    def apply(self, func: Callable[[BarsPanel], Any]) -> Dict[Any, Any]:
+        """对每个证券的行情数据调用`func`
+
+        `func`接收的是连续内存上的切片，适合传入向量化的计算函数。
+
+        Returns:
+            证券代码到`func`返回值的字典
+        """
+        return {code: func(bars) for code, bars in self.groups()}
+
+    def reduce(self, ufunc: np.ufunc, column: str) -> np.ndarray:
+        """对每个证券的`column`列进行归约，不需要Python循环
+
+        Args:
+            ufunc: 二元ufunc，比如`np.add`, `np.maximum`
+            column: 列名
+
+        Returns:
+            与`codes`一一对应的数组。没有数据的证券，其值为对应类型的零值(浮点数为NaN)
+        """
+        values = self._data[column]
+        counts = self._stops - self._starts
+        nonempty = counts > 0
+
+        result = np.zeros(len(self._codes), dtype=values.dtype)
+        if result.dtype.kind == "f":
+            result[:] = np.nan
+
+        if nonempty.any():
+            result[nonempty] = ufunc.reduceat(values, self._starts[nonempty])
+
+        return result
+
+    def last(self, column: str) -> np.ndarray:
+        """返回每个证券`column`列的最后一个值，语义同`reduce`"""
+        counts = self._stops - self._starts
+        nonempty = counts > 0
+
+        values = self._data[column]
+        result = np.zeros(len(self._codes), dtype=values.dtype)
+        if result.dtype.kind == "f":
+            result[:] = np.nan
+
+        result[nonempty] = values[self._stops[nonempty] - 1]
+        return result
+
+    def __repr__(self) -> str:
+        return f"IndexedBarsPanel(codes={len(self._codes)}, rows={len(self._data)})"
+
+
+__all__ = ["IndexedBarsPanel"]
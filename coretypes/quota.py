@@ -0,0 +1,56 @@
+"""上游quota消耗的估算
+
+上游按请求的数据量扣减quota，但只能通过`get_quota`查询剩余量。`QuotaScheduler`、`FetcherPool`、
+`SyntheticFetcher`以及`fetcher_metrics`都按本模块的规则，从调用参数估算每次调用消耗的quota。
+
+本模块不依赖`coretypes.quote_fetcher`和`coretypes.fetchers`，因此可以被二者在模块级导入。
+"""
+import inspect
+from typing import Any, Callable, Dict
+
+
+def _count(sec: Any) -> int:
+    return 1 if isinstance(sec, str) else len(sec)
+
+
+default_costs: Dict[str, Callable[[Dict[str, Any]], int]] = {
+    "get_bars": lambda args: args["n_bars"],
+    "get_price": lambda args: args["n_bars"] * _count(args["sec"]),
+}
+"""各方法消耗quota的估算函数，参数为调用时绑定的参数字典。未列出的方法消耗为1"""
+
+unscheduled_methods = frozenset({"get_quota", "create_instance"})
+"""不消耗quota、也不参与调度的方法"""
+
+
+def estimate_cost(
+    costs: Dict[str, Callable[[Dict[str, Any]], int]], func: Callable, *args, **kwargs
+) -> int:
+    """按`costs`估算以给定参数调用`func`消耗的quota
+
+    Examples:
+        >>> estimate_cost(default_costs, QuotesFetcher.get_price, ["A", "B"], end, 10, "1d")  # doctest: +SKIP
+        20
+
+    Args:
+        costs: 各方法的估算函数，比如`default_costs`
+        func: 被调用的方法(未绑定的函数)，按其名字查找估算函数，按其签名绑定参数
+        args: 调用`func`的位置参数，不含self
+        kwargs: 调用`func`的关键字参数
+
+    Returns:
+        估算的quota消耗，`costs`中未列出的方法为1
+
+    Raises:
+        TypeError: 参数与`func`的签名不匹配
+    """
+    estimator = costs.get(func.__name__)
+    if estimator is None:
+        return 1
+
+    bound = inspect.signature(func).bind(None, *args, **kwargs)
+    bound.apply_defaults()
+    return int(estimator(bound.arguments))
+
+
+__all__ = ["default_costs", "estimate_cost", "unscheduled_methods"]
@@ -4,18 +4,39 @@
 """
 Interface for quotes worker
 """
+import asyncio
 import datetime
+import inspect
 from abc import ABC
-from typing import Dict, List, Union
+from collections import deque
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Union
 
 import deprecation
 import numpy
 
 from coretypes.__version__ import __version__
-from coretypes.types import Frame, FrameType
+from coretypes.metrics import instrument
+from coretypes.types import BarsArray, Frame, FrameType
+
+if TYPE_CHECKING:  # pragma: no cover
+    from coretypes.trade_calendar import TradingCalendar
 
 
 class QuotesFetcher(ABC):
+    record_metrics = True
+    """为False时，子类的接口方法不记录指标。只转发调用的包装器应设为False，以免重复计数"""
+
+    def __init_subclass__(cls, **kwargs):
+        """子类重写的接口方法都会被包装，以便在`fetcher_metrics`打开时记录其指标"""
+        super().__init_subclass__(**kwargs)
+        if not cls.record_metrics:
+            return
+
+        for name in _instrumented:
+            func = cls.__dict__.get(name)
+            if func is not None and inspect.iscoroutinefunction(func):
+                setattr(cls, name, instrument(cls.__name__, name, func))
+
     async def get_quota(self) -> int:
         """获取接口当前可用的quota
 
@@ -70,6 +91,109 @@ class QuotesFetcher(ABC):
         """
         raise NotImplementedError
 
+    async def iter_bars(
+        self,
+        sec: str,
+        start: Frame,
+        end: Frame,
+        frame_type: FrameType,
+        chunk_size: int = 1000,
+        concurrency: int = 2,
+        calendar: Optional["TradingCalendar"] = None,
+        allow_unclosed=True,
+    ) -> AsyncIterator[BarsArray]:
+        """分页获取[start, end]区间内的k线，以异步迭代器的方式逐页返回
+
+        每页最多`chunk_size`根k线，通过`get_bars`获取。在调用者处理当前页时，后续的页已经在获取中，
+        因此网络I/O与计算可以重叠，而内存占用只与`chunk_size`和`concurrency`有关。
+
+        提供`calendar`时，各页的结束帧可以预先算出，最多`concurrency`页并发获取，并按时间先后的顺序
+        返回；否则只能从`end`向前逐页获取(预取一页)，各页按时间从后向前的顺序返回，页内仍为升序。因此，
+        要求数据按时间递增到达的消费者(比如`BarsStore.append`)必须提供`calendar`。
+
+        Examples:
+            >>> pages = fetcher.iter_bars(sec, start, end, FrameType.MIN1, calendar=calendar)  # doctest: +SKIP
+            >>> async for bars in pages:  # doctest: +SKIP
+            ...     store.append(sec, FrameType.MIN1, bars)
+
+            没有交易日历时，各页从后向前返回，需要反转后再拼接：
+
+            >>> pages = [bars async for bars in fetcher.iter_bars(sec, start, end, FrameType.DAY)]  # doctest: +SKIP
+            >>> store.append(sec, FrameType.DAY, numpy.concatenate(pages[::-1]))  # doctest: +SKIP
+
+        Args:
+            sec: 证券代码
+            start: 起始帧(含)
+            end: 结束帧(含)
+            frame_type: k线周期
+            chunk_size: 每页的k线数
+            concurrency: 最多同时获取的页数，只在提供`calendar`时有效
+            calendar: 交易日历
+            allow_unclosed: 为真时，当前未结束的帧数据也获取
+
+        Returns:
+            `bars_dtype`类型的数组的异步迭代器
+        """
+        start_ = numpy.datetime64(start, "s")
+        end_ = numpy.datetime64(end, "s")
+
+        def fetch(page_end: numpy.datetime64, n_bars: int) -> asyncio.Future:
+            return asyncio.ensure_future(
+                self.get_bars(
+                    sec,
+                    numpy.datetime64(page_end, "s").item(),
+                    n_bars,
+                    frame_type,
+                    allow_unclosed=allow_unclosed,
+                )
+            )
+
+        pending = deque()
+        try:
+            if calendar is not None:
+                lo = int(calendar.ceil_index(start_, frame_type))
+                hi = int(calendar.floor_index(end_, frame_type))
+                pages = (
+                    (i, min(i + chunk_size, hi + 1))
+                    for i in range(lo, hi + 1, chunk_size)
+                )
+
+                for first, last in pages:
+                    pending.append(
+                        fetch(calendar.frame_of(last - 1, frame_type), last - first)
+                    )
+                    if len(pending) < max(concurrency, 1):
+                        continue
+
+                    bars = await pending.popleft()
+                    if len(bars):
+                        yield bars[bars["frame"] >= start_]
+
+                while pending:
+                    bars = await pending.popleft()
+                    if len(bars):
+                        yield bars[bars["frame"] >= start_]
+            else:
+                pending.append(fetch(end_, chunk_size))
+                while pending:
+                    bars = await pending.popleft()
+                    if len(bars) == 0:
+                        break
+
+                    first = numpy.datetime64(bars["frame"][0], "s")
+                    if len(bars) >= chunk_size and first > start_:
+                        # 预取前一页
+                        pending.append(
+                            fetch(first - numpy.timedelta64(1, "s"), chunk_size)
+                        )
+
+                    bars = bars[bars["frame"] >= start_]
+                    if len(bars):
+                        yield bars
+        finally:
+            for future in pending:
+                future.cancel()
+
     async def get_price(
         self,
         sec: Union[List, str],
@@ -77,7 +201,6 @@ class QuotesFetcher(ABC):
         n_bars: int,
         frame_type: str,
     ) -> Dict[str, numpy.recarray]:
-
         raise NotImplementedError
 
     async def create_instance(self, **kwargs):
@@ -154,3 +277,11 @@ class QuotesFetcher(ABC):
     async def get_query_count(self):
         """查询当日剩余可调用数据条数"""
         raise NotImplementedError
+
+
+# 需要记录指标的接口方法
+_instrumented = [
+    name
+    for name, func in vars(QuotesFetcher).items()
+    if not name.startswith("_") and inspect.iscoroutinefunction(func)
+]
@@ -0,0 +1,197 @@
+"""行情数据的重采样(周期转换)
+
+将细粒度的行情数据(比如1分钟线)向量化地合成为粗粒度的行情数据(比如30分钟线、日线、周线等)。
+
+分钟线遵循A股的交易时间约定：每根k线以结束时间标记，上午为09:31~11:30，下午为13:01~15:00。因此，
+5分钟线的第一根为09:35，60分钟线为10:30, 11:30, 14:00, 15:00。日线及以上周期以日期标记，周线、
+月线等以该周期内最后一个交易日标记。
+"""
+from typing import Tuple
+
+import numpy as np
+
+from coretypes.types import BarsArray, BarsPanel, FrameType
+
+minutes_of_frame = {
+    FrameType.MIN1: 1,
+    FrameType.MIN5: 5,
+    FrameType.MIN15: 15,
+    FrameType.MIN30: 30,
+    FrameType.MIN60: 60,
+}
+"""各分钟线周期的分钟数。`TradingCalendar`、`resample`和`SyntheticFetcher`共用"""
+
+trading_sessions = ((9 * 60 + 30, 11 * 60 + 30), (13 * 60, 15 * 60))
+"""每个交易日的上午和下午交易时段，以(开始, 结束)距离零点的分钟数表示"""
+
+minutes_per_day = sum(close - open_ for open_, close in trading_sessions)
+"""每个交易日的交易分钟数，即1分钟线的根数"""
+
+(_am_open, _am_close), (_pm_open, _day_close) = trading_sessions
+_am_minutes = _am_close - _am_open
+
+
+def _minute_buckets(frames: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """计算每根分钟线所属的`n`分钟k线的键值和结束时间
+
+    Returns:
+        键值数组和该键值对应k线的结束时间(datetime64[s])
+    """
+    days = frames.astype("datetime64[D]")
+    minutes = (frames - days).astype("timedelta64[m]").astype(np.int64)
+
+    # 转换为当日的交易分钟序号，09:31为1, 11:30为120，13:01为121，15:00为240
+    idx = np.where(minutes <= _am_open + _am_minutes, minutes - _am_open, 0)
+    idx = np.where(minutes >= _pm_open, minutes - _pm_open + _am_minutes, idx)
+    # 集合竞价产生的09:30等数据，并入第一根k线
+    idx = np.maximum(idx, 1)
+
+    end_idx = -(-idx // n) * n
+    end_minutes = np.where(
+        end_idx <= _am_minutes,
+        end_idx + _am_open,
+        end_idx - _am_minutes + _pm_open,
+    )
+
+    days = days.astype(np.int64)
+    keys = days * 10_000 + end_idx
+    labels = (days * 86400 + end_minutes * 60).astype("datetime64[s]")
+    return keys, labels
+
+
+def _period_start(days: np.ndarray, frame_type: FrameType) -> np.ndarray:
+    """计算`days`(datetime64[D])所在周期的起始日"""
+    if frame_type == FrameType.DAY:
+        return days
+
+    if frame_type == FrameType.WEEK:
+        # 1970-01-01为周四
+        offset = (days.astype(np.int64) + 3) % 7
+        return days - offset.astype("timedelta64[D]")
+
+    if frame_type == FrameType.MONTH:
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+
+    if frame_type == FrameType.QUARTER:
+        months = days.astype("datetime64[M]").astype(np.int64)
+        return (months - months % 3).astype("datetime64[M]").astype("datetime64[D]")
+
+    if frame_type == FrameType.YEAR:
+        return days.astype("datetime64[Y]").astype("datetime64[D]")
+
+    raise ValueError(f"unsupported frame type: {frame_type}")
+
+
+def _period_last_busday(days: np.ndarray, frame_type: FrameType) -> np.ndarray:
+    """计算`days`所在周期的最后一个工作日(不考虑节假日)"""
+    if frame_type == FrameType.DAY:
+        return days
+
+    start = _period_start(days, frame_type)
+    if frame_type == FrameType.WEEK:
+        next_start = start + np.timedelta64(7, "D")
+    else:
+        step = {FrameType.MONTH: 1, FrameType.QUARTER: 3, FrameType.YEAR: 12}
+        months = start.astype("datetime64[M]") + np.timedelta64(step[frame_type], "M")
+        next_start = months.astype("datetime64[D]")
+
+    return np.busday_offset(next_start, -1, roll="forward")
+
+
+def resample(
+    bars: BarsArray, frame_type: FrameType, include_unclosed: bool = False
+) -> BarsArray:
+    """将`bars`重采样为`frame_type`周期的行情数据
+
+    一次向量化遍历完成所有列的合成：open取首个值，high取最大值，low取最小值，volume和amount求和，
+    close、factor及其它列(比如`code`、`high_limit`)取最后一个值。
+
+    `bars`可以是`BarsArray`、`BarsWithLimitArray`或者`BarsPanel`。对`BarsPanel`，将按`code`分组
+    进行合成，结果按(code, frame)排序。输入数据必须是按`frame`升序排列的。
+
+    对周线及以上周期，判断最后一根k线是否已结束时只考虑周末，不考虑节假日。
+
+    Args:
+        bars: 待转换的行情数据，周期必须比`frame_type`小
+        frame_type: 目标周期
+        include_unclosed: 是否包含最后一根尚未结束的k线
+
+    Returns:
+        与`bars`类型相同的行情数据
+    """
+    if len(bars) == 0:
+        return bars[:0].copy()
+
+    names = bars.dtype.names
+    has_code = "code" in names
+
+    if has_code:
+        # 按(code, frame)排序，stable保证同一code内原有顺序不变
+        _, codes = np.unique(bars["code"], return_inverse=True)
+        codes = codes.reshape(-1)
+        order = np.lexsort((bars["frame"], codes))
+        bars = bars[order]
+        codes = codes[order]
+
+    frames = bars["frame"]
+    if frame_type in minutes_of_frame:
+        keys, labels = _minute_buckets(frames, minutes_of_frame[frame_type])
+    else:
+        days = frames.astype("datetime64[D]")
+        keys = _period_start(days, frame_type).astype(np.int64)
+        labels = None
+
+    boundary = np.empty(len(bars), dtype=bool)
+    boundary[0] = True
+    boundary[1:] = keys[1:] != keys[:-1]
+    if has_code:
+        boundary[1:] |= codes[1:] != codes[:-1]
+
+    starts = np.flatnonzero(boundary)
+    ends = np.empty_like(starts)
+    ends[:-1] = starts[1:] - 1
+    ends[-1] = len(bars) - 1
+
+    result = np.empty(len(starts), dtype=bars.dtype)
+    for name in names:
+        if name == "open":
+            result[name] = bars[name][starts]
+        elif name == "high":
+            result[name] = np.maximum.reduceat(bars[name], starts)
+        elif name == "low":
+            result[name] = np.minimum.reduceat(bars[name], starts)
+        elif name in ("volume", "amount"):
+            result[name] = np.add.reduceat(bars[name], starts)
+        elif name != "frame":
+            result[name] = bars[name][ends]
+
+    last = frames[ends]
+    if labels is not None:
+        result["frame"] = labels[ends]
+    else:
+        result["frame"] = last.astype("datetime64[D]")
+
+    if include_unclosed:
+        return result
+
+    # 每个证券的最后一根k线，需要检查是否已结束
+    is_last = np.ones(len(starts), dtype=bool)
+    if has_code:
+        group_codes = codes[starts]
+        is_last[:-1] = group_codes[1:] != group_codes[:-1]
+    else:
+        is_last[:-1] = False
+
+    if labels is not None:
+        closed = last == result["frame"]
+    else:
+        days = last.astype("datetime64[D]")
+        tod = (last - days).astype("timedelta64[m]").astype(np.int64)
+        # 日线数据的时间部分为零；分钟线则需要到收盘
+        closed = (tod == 0) | (tod >= _day_close)
+        closed &= days == _period_last_busday(days, frame_type)
+
+    return result[~is_last | closed]
+
+
+__all__ = ["minutes_of_frame", "minutes_per_day", "resample", "trading_sessions"]
@@ -0,0 +1,193 @@
+"""带索引的证券信息表
+
+`get_security_list`返回的是`security_info_dtype`类型的数组，按代码查找或者筛选某一天的在市证券都需要
+线性扫描。`SecurityTable`在构造时建立索引：
+
+- 代码到行号的哈希表
+- 每个证券类型(以及全部证券)按上市日、退市日排序的索引，"某日在市"的查询通过二分查找完成
+
+表可以保存为不含Python对象的`.npz`快照，加载时不需要pickle。
+"""
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+
+from coretypes.types import Frame, SecurityType, security_info_dtype
+
+TypeLike = Union[SecurityType, str]
+
+_all = "__all__"
+
+
+class _Index:
+    """一组证券按上市日、退市日排序的索引"""
+
+    __slots__ = ("rows", "ipo_order", "ipo_sorted", "end_sorted")
+
+    def __init__(self, rows: np.ndarray, ipo: np.ndarray, end: np.ndarray):
+        self.rows = rows
+        self.ipo_order = rows[np.argsort(ipo[rows], kind="stable")]
+        self.ipo_sorted = ipo[self.ipo_order]
+        self.end_sorted = np.sort(end[rows])
+
+
+def _to_days(dates) -> np.ndarray:
+    return np.asarray(dates, dtype="datetime64[s]").astype("datetime64[D]")
+
+
+class SecurityTable:
+    """带索引的证券信息表
+
+    Examples:
+        >>> table = SecurityTable(await fetcher.get_security_list())  # doctest: +SKIP
+        >>> table["000001.XSHE"]["name"]  # doctest: +SKIP
+        >>> table.alive(datetime.date(2022, 1, 4), SecurityType.STOCK)  # doctest: +SKIP
+    """
+
+    def __init__(self, securities: np.ndarray):
+        """构造函数
+
+        Args:
+            securities: `security_info_dtype`类型的数组
+        """
+        data = np.asarray(securities)
+        if data.dtype != np.dtype(security_info_dtype):
+            data = data.astype(security_info_dtype)
+
+        self._data = data
+        self._ids: Dict[str, int] = {code: i for i, code in enumerate(data["code"])}
+
+        self._ipo = data["ipo"].astype("datetime64[D]")
+        self._end = data["end"].astype("datetime64[D]")
+
+        types = data["type"]
+        self._indices: Dict[str, _Index] = {
+            _all: _Index(np.arange(len(data)), self._ipo, self._end)
+        }
+        for kind in set(types):
+            rows = np.flatnonzero(types == kind)
+            self._indices[kind] = _Index(rows, self._ipo, self._end)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._ids
+
+    def __getitem__(self, code: str) -> np.void:
+        return self._data[self._ids[code]]
+
+    def get(self, code: str, default=None) -> Optional[np.void]:
+        """返回`code`的证券信息，不存在时返回`default`"""
+        i = self._ids.get(code)
+        return default if i is None else self._data[i]
+
+    @property
+    def data(self) -> np.ndarray:
+        """全部证券信息，为`security_info_dtype`类型的数组"""
+        return self._data
+
+    @property
+    def codes(self) -> np.ndarray:
+        """全部证券代码，按原表中的顺序排列"""
+        return self._data["code"]
+
+    def index_of(self, codes: Iterable[str]) -> np.ndarray:
+        """返回`codes`的行号，不存在的证券为-1"""
+        codes = np.asarray(codes, dtype=object)
+        uniques, inverse = np.unique(codes, return_inverse=True)
+        rows = np.array([self._ids.get(code, -1) for code in uniques], dtype=np.int64)
+        return rows[inverse].reshape(codes.shape)
+
+    def _index(self, kind: Optional[TypeLike]) -> Optional[_Index]:
+        if kind is None:
+            return self._indices[_all]
+
+        if isinstance(kind, SecurityType):
+            kind = kind.value
+
+        return self._indices.get(kind)
+
+    def of_type(self, kind: TypeLike) -> np.ndarray:
+        """返回`kind`类型的全部证券信息"""
+        index = self._index(kind)
+        if index is None:
+            return self._data[:0]
+
+        return self._data[index.rows]
+
+    def alive(self, date: Frame, kind: Optional[TypeLike] = None) -> np.ndarray:
+        """返回在`date`当天处于上市状态的证券代码
+
+        上市日和退市日当天都视为在市。结果按原表中的顺序排列。
+
+        Args:
+            date: 日期
+            kind: 证券类型，为None时不限类型
+        """
+        index = self._index(kind)
+        if index is None:
+            return self.codes[:0]
+
+        day = _to_days(date)
+        # 上市日不晚于date的证券是ipo_order的一个前缀，只需在其中检查退市日
+        n = np.searchsorted(index.ipo_sorted, day, side="right")
+        candidates = index.ipo_order[:n]
+        rows = np.sort(candidates[self._end[candidates] >= day])
+        return self._data["code"][rows]
+
+    def alive_mask(
+        self, dates: Iterable[Frame], kind: Optional[TypeLike] = None
+    ) -> np.ndarray:
+        """返回形状为(len(dates), len(self))的布尔矩阵，表示各证券在各日期是否在市
+
+        `kind`不为None时，其它类型的证券对应的列均为False。
+        """
+        days = _to_days(list(dates))[:, None]
+        mask = (self._ipo <= days) & (self._end >= days)
+
+        if kind is not None:
+            selected = np.zeros(len(self), dtype=bool)
+            index = self._index(kind)
+            if index is not None:
+                selected[index.rows] = True
+            mask &= selected
+
+        return mask
+
+    def count_alive(
+        self, dates: Iterable[Frame], kind: Optional[TypeLike] = None
+    ) -> np.ndarray:
+        """返回各日期在市的证券数，完全通过二分查找计算"""
+        days = _to_days(list(dates))
+        index = self._index(kind)
+        if index is None:
+            return np.zeros(len(days), dtype=np.int64)
+
+        listed = np.searchsorted(index.ipo_sorted, days, side="right")
+        delisted = np.searchsorted(index.end_sorted, days, side="left")
+        return listed - delisted
+
+    def save(self, path: str):
+        """保存为`.npz`快照，其中不含Python对象"""
+        arrays = {}
+        for name in self._data.dtype.names:
+            column = self._data[name]
+            if column.dtype == object:
+                column = column.astype(str)
+            arrays[name] = column
+
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "SecurityTable":
+        """从`save`保存的快照加载"""
+        with np.load(path, allow_pickle=False) as f:
+            data = np.empty(len(f["code"]), dtype=security_info_dtype)
+            for name in data.dtype.names:
+                data[name] = f[name]
+
+        return cls(data)
+
+
+__all__ = ["SecurityTable"]
@@ -0,0 +1,235 @@
+"""基于内存映射(mmap)的行情数据本地存储
+
+每个(code, frame_type)对应一个文件，文件由固定长度的文件头和紧随其后的原始记录组成。读取时通过
+`np.memmap`直接映射为`BarsArray`，不需要反序列化，多个进程可以共享操作系统的页缓存。
+
+文件只允许追加，并且追加的数据必须按`frame`递增，因此可以对`frame`列进行二分查找。
+
+文件头中保存已提交的记录数。追加时先将数据写到已提交的记录之后并`fsync`，最后再更新文件头中的记录数，
+读取时只认已提交的记录，因此无需加锁，也不会读到写入了一部分的批次；即使操作系统崩溃或者断电，文件头
+也不会指向尚未落盘的数据。
+"""
+import os
+import struct
+import tempfile
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from coretypes.types import (
+    BarsArray,
+    Frame,
+    FrameType,
+    bars_dtype,
+    bars_dtype_ids,
+    bars_dtypes_by_id,
+)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+_magic = b"ZBARS\x00\x00\x00"
+_header = struct.Struct("<8sHHI")
+_committed = struct.Struct("<Q")
+_header_size = 32
+_version = 1
+
+
+class BarsStore:
+    """内存映射的行情数据存储
+
+    Examples:
+        >>> store = BarsStore("/data/bars")  # doctest: +SKIP
+        >>> store.append("000001.XSHE", FrameType.DAY, bars)  # doctest: +SKIP
+        >>> store.get("000001.XSHE", FrameType.DAY, start=datetime.date(2022, 1, 1))  # doctest: +SKIP
+    """
+
+    suffix = ".bars"
+
+    def __init__(self, root: str, fsync: bool = True):
+        """构造函数
+
+        Args:
+            root: 存储的根目录，不存在时将自动创建
+            fsync: 为False时追加不调用`fsync`。此时进程崩溃仍是安全的，但操作系统崩溃或者断电后，文件头
+                可能指向未落盘的数据
+        """
+        self.root = root
+        self.fsync = fsync
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, code: str, frame_type: FrameType) -> str:
+        """返回`code`和`frame_type`对应的文件路径"""
+        # 使用整数表示，避免'1m'与'1M'在大小写不敏感的文件系统上冲突
+        return os.path.join(self.root, str(frame_type.to_int()), code + self.suffix)
+
+    def codes(self, frame_type: FrameType) -> List[str]:
+        """返回`frame_type`下已存储的所有证券代码"""
+        folder = os.path.join(self.root, str(frame_type.to_int()))
+        if not os.path.isdir(folder):
+            return []
+
+        return sorted(
+            name[: -len(self.suffix)]
+            for name in os.listdir(folder)
+            if name.endswith(self.suffix)
+        )
+
+    def _read_header(self, f) -> Tuple[np.dtype, int]:
+        """返回文件的数据类型和已提交的记录数"""
+        f.seek(0)
+        buffer = f.read(_header.size + _committed.size)
+        magic, version, dtype_id, itemsize = _header.unpack_from(buffer)
+        if magic != _magic or version != _version or dtype_id not in bars_dtypes_by_id:
+            raise ValueError(f"{f.name} is not a valid bars file")
+
+        dtype = bars_dtypes_by_id[dtype_id]
+        if dtype.itemsize != itemsize:
+            raise ValueError(f"{f.name} has mismatched itemsize {itemsize}")
+
+        # 文件长度可能包含未提交的数据，以文件头为准
+        size = os.fstat(f.fileno()).st_size
+        committed = _committed.unpack_from(buffer, _header.size)[0]
+        return dtype, min((size - _header_size) // itemsize, committed)
+
+    def _create(self, path: str, dtype: np.dtype):
+        """原子地创建只包含文件头的数据文件"""
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+
+        header = _header.pack(_magic, _version, bars_dtype_ids[dtype], dtype.itemsize)
+        fd, tmp = tempfile.mkstemp(dir=folder)
+        try:
+            os.write(fd, header.ljust(_header_size, b"\x00"))
+            os.close(fd)
+            # link在目标已存在时失败，保证不会覆盖其它进程已创建的文件
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(tmp)
+
+    def append(self, code: str, frame_type: FrameType, bars: BarsArray) -> int:
+        """追加行情数据
+
+        追加的数据必须按`frame`递增，且第一条记录的`frame`必须大于已存储的最后一条记录。数据写在已提交
+        的记录之后，全部写入并落盘后才更新文件头中的记录数。在此之前崩溃时，已写入的部分对读取者不可见，
+        并会在下一次追加时被截断。
+
+        Args:
+            code: 证券代码
+            frame_type: 帧类型
+            bars: 类型为`bars_dtype`或者`bars_with_limit_dtype`的行情数据
+
+        Returns:
+            追加后文件中的记录数
+        """
+        if bars.dtype not in bars_dtype_ids:
+            raise TypeError(f"unsupported dtype: {bars.dtype}")
+
+        frames = bars["frame"]
+        if len(frames) > 1 and np.any(frames[1:] <= frames[:-1]):
+            raise ValueError("frames of bars must be strictly increasing")
+
+        path = self.path(code, frame_type)
+        if not os.path.exists(path):
+            self._create(path, bars.dtype)
+
+        with open(path, "r+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+            dtype, count = self._read_header(f)
+            if dtype != bars.dtype:
+                raise TypeError(f"{path} stores {dtype}, but got {bars.dtype}")
+
+            valid = _header_size + count * dtype.itemsize
+            if os.fstat(f.fileno()).st_size != valid:
+                f.truncate(valid)
+
+            if count > 0 and len(bars) > 0:
+                f.seek(valid - dtype.itemsize)
+                last = np.frombuffer(f.read(dtype.itemsize), dtype=dtype)["frame"][0]
+                if frames[0] <= last:
+                    raise ValueError(
+                        f"frame {frames[0]} is not after last stored frame {last}"
+                    )
+
+            buffer = memoryview(np.ascontiguousarray(bars).tobytes())
+            f.seek(valid)
+            while len(buffer):
+                written = os.write(f.fileno(), buffer)
+                buffer = buffer[written:]
+
+            # 数据落盘之后，才以一次写入发布新的记录数
+            if self.fsync:
+                os.fsync(f.fileno())
+            os.pwrite(f.fileno(), _committed.pack(count + len(bars)), _header.size)
+            if self.fsync:
+                os.fsync(f.fileno())
+
+            return count + len(bars)
+
+    def get(
+        self,
+        code: str,
+        frame_type: FrameType,
+        start: Optional[Frame] = None,
+        end: Optional[Frame] = None,
+    ) -> BarsArray:
+        """读取行情数据
+
+        返回的数组由`np.memmap`支持，是只读的，且不发生拷贝。`start`和`end`通过对`frame`列二分
+        查找确定范围，两端均包含。
+
+        Args:
+            code: 证券代码
+            frame_type: 帧类型
+            start: 起始帧，为None时从第一条记录开始
+            end: 结束帧，为None时到最后一条记录
+
+        Returns:
+            行情数据。如果文件不存在，返回长度为零的`bars_dtype`数组
+        """
+        path = self.path(code, frame_type)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=bars_dtype)
+
+        with open(path, "rb") as f:
+            dtype, count = self._read_header(f)
+
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+
+        bars = np.memmap(
+            path, dtype=dtype, mode="r", offset=_header_size, shape=(count,)
+        )
+
+        if start is None and end is None:
+            return bars
+
+        frames = bars["frame"]
+        lo = 0 if start is None else np.searchsorted(frames, _to_datetime64(start))
+        hi = (
+            count
+            if end is None
+            else np.searchsorted(frames, _to_datetime64(end), side="right")
+        )
+        return bars[lo:hi]
+
+    def last_frame(self, code: str, frame_type: FrameType) -> Optional[np.datetime64]:
+        """返回已存储的最后一条记录的`frame`，如果没有数据则返回None"""
+        bars = self.get(code, frame_type)
+        if len(bars) == 0:
+            return None
+
+        return bars["frame"][-1]
+
+
+def _to_datetime64(frame: Frame) -> np.datetime64:
+    return np.datetime64(frame, "s")
+
+
+__all__ = ["BarsStore"]
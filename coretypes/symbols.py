@@ -0,0 +1,158 @@
+"""证券代码的整数编码
+
+`bars_dtype_with_code`等类型中的code字段为Python对象，每行都需要一个对象指针，既无法进行向量化
+比较，也无法不经pickle就进行传输。`SymbolTable`将证券代码映射为紧凑的int32编号，配合
+`compact_bars_dtype_with_code`等类型使用。
+"""
+from typing import Dict, Iterable, Union
+
+import numpy as np
+
+from coretypes.types import (
+    bars_dtype_with_code,
+    code_id_dtype,
+    compact_bars_dtype_with_code,
+    compact_limit_price_only_dtype,
+    compact_security_info_dtype,
+    compact_xrxd_info_dtype,
+    limit_price_only_dtype,
+    security_info_dtype,
+    xrxd_info_dtype,
+)
+
+_compact_dtypes = {
+    np.dtype(bars_dtype_with_code): compact_bars_dtype_with_code,
+    np.dtype(limit_price_only_dtype): compact_limit_price_only_dtype,
+    np.dtype(security_info_dtype): compact_security_info_dtype,
+    np.dtype(xrxd_info_dtype): compact_xrxd_info_dtype,
+}
+_object_dtypes = {compact: dtype for dtype, compact in _compact_dtypes.items()}
+
+
+class SymbolTable:
+    """证券代码到整数编号的映射表
+
+    编号从0开始连续分配，且一经分配不再改变，因此可以安全地在进程间、在持久化数据中使用，只要同时保存
+    `codes`即可重建映射表。
+
+    Examples:
+        >>> table = SymbolTable(["000001.XSHE", "600000.XSHG"])
+        >>> table.intern(["600000.XSHG", "000001.XSHE", "000002.XSHE"]).tolist()
+        [1, 0, 2]
+        >>> table.decode([2]).tolist()
+        ['000002.XSHE']
+    """
+
+    def __init__(self, codes: Iterable[str] = ()):
+        """构造函数
+
+        Args:
+            codes: 初始的证券代码，按顺序分配编号
+        """
+        self._ids: Dict[str, int] = {}
+        self._codes = np.empty(0, dtype=object)
+        self.intern(np.asarray(list(codes), dtype=object))
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._ids
+
+    @property
+    def codes(self) -> np.ndarray:
+        """按编号顺序排列的证券代码数组(dtype为object)"""
+        return self._codes[: len(self._ids)]
+
+    def _map(self, codes: Iterable[str], add: bool) -> np.ndarray:
+        codes = np.asarray(codes, dtype=object)
+        if codes.size == 0:
+            return np.empty(codes.shape, dtype=code_id_dtype)
+
+        # 只对去重后的代码进行字典查找，然后通过inverse向量化地展开
+        uniques, first, inverse = np.unique(
+            codes, return_index=True, return_inverse=True
+        )
+        ids = np.empty(len(uniques), dtype=code_id_dtype)
+        added = []
+        # 按首次出现的顺序分配新编号
+        for i in np.argsort(first):
+            code = uniques[i]
+            code_id = self._ids.get(code)
+            if code_id is None:
+                if add:
+                    code_id = len(self._ids)
+                    self._ids[code] = code_id
+                    added.append(code)
+                else:
+                    code_id = -1
+            ids[i] = code_id
+
+        if added:
+            self._grow(added)
+
+        return ids[inverse].reshape(codes.shape)
+
+    def _grow(self, added: list):
+        size = len(self._ids)
+        if size > len(self._codes):
+            codes = np.empty(max(size, len(self._codes) * 2), dtype=object)
+            codes[: len(self._codes)] = self._codes
+            self._codes = codes
+
+        self._codes[size - len(added) : size] = added
+
+    def intern(self, codes: Union[str, Iterable[str]]) -> np.ndarray:
+        """返回`codes`对应的编号，未登记的代码将被分配新的编号"""
+        return self._map(codes, add=True)
+
+    def lookup(self, codes: Union[str, Iterable[str]]) -> np.ndarray:
+        """返回`codes`对应的编号，未登记的代码返回-1"""
+        return self._map(codes, add=False)
+
+    def decode(self, ids: Union[int, Iterable[int]]) -> np.ndarray:
+        """返回编号对应的证券代码数组"""
+        ids = np.asarray(ids, dtype=code_id_dtype)
+        if ids.size and (ids.min() < 0 or ids.max() >= len(self._ids)):
+            raise KeyError("some ids are not in the symbol table")
+
+        return self.codes[ids]
+
+    def encode_array(self, arr: np.ndarray) -> np.ndarray:
+        """将`bars_dtype_with_code`等以对象存储code的数组，转换为对应的compact类型
+
+        支持的类型有`bars_dtype_with_code`, `limit_price_only_dtype`, `security_info_dtype`和
+        `xrxd_info_dtype`。未登记的代码将被分配新的编号。
+        """
+        dtype = _compact_dtypes.get(arr.dtype)
+        if dtype is None:
+            raise TypeError(f"unsupported dtype: {arr.dtype}")
+
+        result = np.empty(arr.shape, dtype=dtype)
+        for name in dtype.names:
+            if name == "code":
+                result[name] = self.intern(arr[name])
+            else:
+                result[name] = arr[name]
+
+        return result
+
+    def decode_array(self, arr: np.ndarray) -> np.ndarray:
+        """`encode_array`的逆操作"""
+        dtype = _object_dtypes.get(arr.dtype)
+        if dtype is None:
+            raise TypeError(f"unsupported dtype: {arr.dtype}")
+
+        result = np.empty(arr.shape, dtype=dtype)
+        for name in dtype.names:
+            if name == "code":
+                result[name] = self.decode(arr[name])
+            elif dtype[name] == np.dtype("O") and arr.dtype[name] != dtype[name]:
+                result[name] = arr[name].astype(object)
+            else:
+                result[name] = arr[name]
+
+        return result
+
+
+__all__ = ["SymbolTable"]
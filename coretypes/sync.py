@@ -0,0 +1,300 @@
+"""增量同步行情数据
+
+根据证券列表、交易日历以及本地存储中每个(code, frame_type)的最后一帧，向量化地计算出每支证券缺失的
+帧区间，只向上游获取这些缺口：
+
+- 尚未上市、或者在缺口开始之前已退市的证券会被跳过
+- 各证券的同步以有限的并发进行，每个缺口分页获取，每页获取后立即写入本地存储
+- 本地存储的最后一帧本身就是检查点，中断后重新运行只会获取尚未写入的部分；对上游没有数据的证券(比如
+  长期停牌)，另以检查点文件记录已完成的证券，避免重复请求
+"""
+import asyncio
+import datetime
+import json
+import os
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional, Protocol
+
+import numpy as np
+
+from coretypes.quote_fetcher import QuotesFetcher
+from coretypes.trade_calendar import TradingCalendar
+from coretypes.types import BarsArray, Frame, FrameType
+
+sync_task_dtype = np.dtype(
+    [
+        ("code", "O"),
+        ("start", "datetime64[s]"),
+        ("end", "datetime64[s]"),
+        ("n_bars", "i8"),
+    ]
+)
+"""同步任务类型，表示`code`需要获取[start, end]区间内的`n_bars`根k线"""
+
+
+class SyncStore(Protocol):
+    """同步的目标存储，`BarsStore`即满足此协议"""
+
+    def last_frame(self, code: str, frame_type: FrameType) -> Optional[np.datetime64]:
+        ...
+
+    def append(self, code: str, frame_type: FrameType, bars: BarsArray):
+        ...
+
+
+def _listing(securities: np.ndarray) -> tuple:
+    """返回证券的上市日和退市日。兼容`security_info_dtype`和`get_security_list`返回的格式"""
+    names = securities.dtype.names
+    ipo = securities["ipo" if "ipo" in names else "start_date"]
+    end = securities["end" if "end" in names else "end_date"]
+    return ipo.astype("datetime64[D]"), end.astype("datetime64[D]")
+
+
+def plan_sync(
+    securities: np.ndarray,
+    last_frames: np.ndarray,
+    calendar: TradingCalendar,
+    frame_type: FrameType,
+    end: Frame,
+    start: Optional[Frame] = None,
+) -> np.ndarray:
+    """计算各证券缺失的帧区间
+
+    Args:
+        securities: 证券列表，需包含code、ipo(或start_date)和end(或end_date)字段
+        last_frames: 与`securities`对应的本地最后一帧，没有本地数据的为NaT
+        calendar: 交易日历
+        frame_type: 帧类型
+        end: 同步的截止帧(含)
+        start: 没有本地数据时，从这一帧开始同步。为None时从上市日开始
+
+    Returns:
+        `sync_task_dtype`类型的数组，只包含确有缺口的证券
+    """
+    ipo, delist = _listing(securities)
+    last_frames = np.asarray(last_frames, dtype="datetime64[s]")
+    valid = ~(np.isnat(ipo) | np.isnat(delist))
+
+    first = ipo.astype("datetime64[s]")
+    if start is not None:
+        first = np.maximum(first, np.datetime64(start, "s"))
+
+    # 退市日当天的k线仍然有效
+    stop = (delist + np.timedelta64(1, "D")).astype("datetime64[s]") - np.timedelta64(
+        1, "s"
+    )
+    stop = np.minimum(stop, np.datetime64(end, "s"))
+
+    local = ~np.isnat(last_frames)
+    first = np.where(valid, first, calendar.days[0])
+    stop = np.where(valid, stop, calendar.days[0])
+
+    lo = np.where(
+        local,
+        calendar.floor_index(np.where(local, last_frames, first), frame_type) + 1,
+        calendar.ceil_index(first, frame_type),
+    )
+    hi = calendar.floor_index(stop, frame_type)
+    n_bars = np.where(valid, hi - lo + 1, 0)
+
+    mask = n_bars > 0
+    tasks = np.empty(np.count_nonzero(mask), dtype=sync_task_dtype)
+    tasks["code"] = securities["code"][mask]
+    tasks["start"] = calendar.frame_of(lo[mask], frame_type)
+    tasks["end"] = calendar.frame_of(hi[mask], frame_type)
+    tasks["n_bars"] = n_bars[mask]
+    return tasks
+
+
+class SyncProgress:
+    """同步的进度"""
+
+    def __init__(self):
+        self.tasks = 0
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bars_planned = 0
+        self.bars_fetched = 0
+        self.errors: Dict[tuple, Exception] = {}
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        """已用时间，单位为秒"""
+        return time.monotonic() - self.started
+
+    @property
+    def bars_per_second(self) -> float:
+        """每秒获取的k线数"""
+        elapsed = self.elapsed
+        return self.bars_fetched / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "tasks": self.tasks,
+            "done": self.done,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "bars_planned": self.bars_planned,
+            "bars_fetched": self.bars_fetched,
+            "elapsed": self.elapsed,
+            "bars_per_second": self.bars_per_second,
+        }
+
+
+class SyncEngine:
+    """增量同步引擎
+
+    Examples:
+        >>> engine = SyncEngine(fetcher, BarsStore("/data/bars"), checkpoint="/data/sync.json")  # doctest: +SKIP
+        >>> progress = await engine.run([FrameType.DAY, FrameType.MIN30])  # doctest: +SKIP
+        >>> progress.as_dict()  # doctest: +SKIP
+    """
+
+    def __init__(
+        self,
+        fetcher: QuotesFetcher,
+        store: SyncStore,
+        concurrency: int = 10,
+        chunk_size: int = 1000,
+        checkpoint: Optional[str] = None,
+        checkpoint_every: int = 100,
+    ):
+        """构造函数
+
+        Args:
+            fetcher: 上游fetcher
+            store: 本地存储
+            concurrency: 同时同步的证券数
+            chunk_size: 每次请求的最大k线数
+            checkpoint: 检查点文件的路径，为None时不使用检查点文件
+            checkpoint_every: 每完成多少支证券保存一次检查点
+        """
+        self.fetcher = fetcher
+        self.store = store
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+
+        self.progress = SyncProgress()
+        self._checkpoints: Dict[str, dict] = {}
+
+    def _load_checkpoint(self):
+        self._checkpoints = {}
+        if self.checkpoint is not None and os.path.exists(self.checkpoint):
+            with open(self.checkpoint, "r") as f:
+                self._checkpoints = json.load(f)
+
+    def _save_checkpoint(self):
+        if self.checkpoint is None:
+            return
+
+        folder = os.path.dirname(os.path.abspath(self.checkpoint))
+        fd, tmp = tempfile.mkstemp(dir=folder, suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._checkpoints, f)
+        os.replace(tmp, self.checkpoint)
+
+    def _done_codes(self, frame_type: FrameType, end: np.datetime64) -> List[str]:
+        state = self._checkpoints.get(frame_type.value)
+        if state is None or state.get("end") != str(end):
+            state = {"end": str(end), "done": []}
+            self._checkpoints[frame_type.value] = state
+
+        return state["done"]
+
+    async def run(
+        self,
+        frame_types: Iterable[FrameType],
+        end: Optional[Frame] = None,
+        start: Optional[Frame] = None,
+        types: Optional[Iterable[str]] = None,
+    ) -> SyncProgress:
+        """同步`frame_types`指定周期的行情数据
+
+        Args:
+            frame_types: 需要同步的帧类型
+            end: 同步的截止帧(含)，为None时截止到昨天
+            start: 没有本地数据的证券从这一帧开始同步，为None时从上市日开始
+            types: 只同步这些类型的证券，比如`["stock", "index"]`。为None时同步全部证券
+
+        Returns:
+            同步的进度
+        """
+        securities = await self.fetcher.get_security_list()
+        calendar = TradingCalendar(await self.fetcher.get_all_trade_days())
+
+        if types is not None:
+            securities = securities[np.isin(securities["type"], list(types))]
+
+        if end is None:
+            end = np.datetime64(datetime.date.today(), "s") - np.timedelta64(1, "s")
+        end = np.datetime64(end, "s")
+
+        self.progress = SyncProgress()
+        self._load_checkpoint()
+
+        for frame_type in frame_types:
+            done = self._done_codes(frame_type, end)
+            todo = securities[~np.isin(securities["code"], done)]
+            self.progress.skipped += len(securities) - len(todo)
+
+            last_frames = np.array(
+                [self.store.last_frame(code, frame_type) for code in todo["code"]],
+                dtype="datetime64[s]",
+            )
+            tasks = plan_sync(todo, last_frames, calendar, frame_type, end, start)
+            self.progress.tasks += len(tasks)
+            self.progress.bars_planned += int(tasks["n_bars"].sum())
+
+            queue = iter(tasks)
+
+            async def worker():
+                for task in queue:
+                    await self._sync_one(task, frame_type, calendar, done)
+
+            await asyncio.gather(*[worker() for _ in range(max(self.concurrency, 1))])
+
+            # 没有缺口的证券同样已完成
+            planned = set(tasks["code"])
+            done.extend(code for code in todo["code"] if code not in planned)
+            self._save_checkpoint()
+
+        return self.progress
+
+    async def _sync_one(
+        self,
+        task: np.void,
+        frame_type: FrameType,
+        calendar: TradingCalendar,
+        done: List[str],
+    ):
+        code = task["code"]
+        try:
+            async for bars in self.fetcher.iter_bars(
+                code,
+                task["start"],
+                task["end"],
+                frame_type,
+                chunk_size=self.chunk_size,
+                concurrency=1,
+                calendar=calendar,
+                allow_unclosed=False,
+            ):
+                self.store.append(code, frame_type, bars)
+                self.progress.bars_fetched += len(bars)
+        except Exception as e:
+            self.progress.failed += 1
+            self.progress.errors[(code, frame_type)] = e
+            return
+
+        self.progress.done += 1
+        done.append(code)
+        if self.progress.done % self.checkpoint_every == 0:
+            self._save_checkpoint()
+
+
+__all__ = ["SyncEngine", "SyncProgress", "SyncStore", "plan_sync", "sync_task_dtype"]
@@ -0,0 +1,206 @@
+"""交易日历及向量化的帧运算
+
+`TradingCalendar`由`QuotesFetcher.get_all_trade_days`返回的交易日构建，为每一种`FrameType`预先计算好
+帧表。所有帧运算(取整、平移、计数、枚举)都接受`datetime64[s]`数组，一次调用即可完成对成千上万个
+时间点的计算。
+
+帧的标记方式与行情数据一致：分钟线以结束时间标记(上午09:31~11:30，下午13:01~15:00)，日线以日期标记，
+周线、月线、季线和年线以该周期内最后一个交易日标记。
+
+为了统一运算，每一帧都对应一个整数序号。对日线及以上周期，序号就是帧在帧表中的位置；对分钟线，序号为
+`交易日序号 * 每日帧数 + 日内序号`。
+"""
+from typing import Dict, Iterable, Union
+
+import numpy as np
+
+from coretypes.resample import minutes_of_frame, trading_sessions
+from coretypes.types import Frame, FrameType
+
+FrameLike = Union[Frame, np.datetime64, np.ndarray, Iterable]
+
+
+def _intraday_offsets(minutes: int) -> np.ndarray:
+    """返回`minutes`分钟线在一个交易日内各帧相对零点的偏移(秒)"""
+    sessions = [
+        np.arange(open_ + minutes, close + 1, minutes)
+        for open_, close in trading_sessions
+    ]
+    return np.concatenate(sessions).astype(np.int64) * 60
+
+
+def _period_keys(days: np.ndarray, frame_type: FrameType) -> np.ndarray:
+    """返回`days`(datetime64[D])所属周期的键值"""
+    if frame_type == FrameType.WEEK:
+        # 1970-01-01为周四，+3之后以周一为一周的开始
+        return (days.astype(np.int64) + 3) // 7
+
+    months = days.astype("datetime64[M]").astype(np.int64)
+    if frame_type == FrameType.MONTH:
+        return months
+    if frame_type == FrameType.QUARTER:
+        return months // 3
+    if frame_type == FrameType.YEAR:
+        return months // 12
+
+    raise ValueError(f"unsupported frame type: {frame_type}")
+
+
+def _to_seconds(frames: FrameLike) -> np.ndarray:
+    return np.asarray(frames, dtype="datetime64[s]").astype(np.int64)
+
+
+class TradingCalendar:
+    """交易日历
+
+    Examples:
+        >>> days = await fetcher.get_all_trade_days()  # doctest: +SKIP
+        >>> cal = TradingCalendar(days)  # doctest: +SKIP
+        >>> cal.shift(ends, -(n_bars - 1), FrameType.MIN30)  # doctest: +SKIP
+    """
+
+    def __init__(self, trade_days: Iterable):
+        """构造函数
+
+        Args:
+            trade_days: 交易日序列，可以是`datetime.date`对象、字符串或者`datetime64`数组，无须排序
+        """
+        days = np.unique(np.asarray(trade_days).astype("datetime64[D]"))
+        if len(days) == 0:
+            raise ValueError("trade_days should not be empty")
+
+        self._days = days
+        self._day_seconds = days.astype("datetime64[s]").astype(np.int64)
+
+        # 日线及以上周期的帧表，以秒表示
+        self._tables: Dict[FrameType, np.ndarray] = {FrameType.DAY: self._day_seconds}
+        for frame_type in (
+            FrameType.WEEK,
+            FrameType.MONTH,
+            FrameType.QUARTER,
+            FrameType.YEAR,
+        ):
+            keys = _period_keys(days, frame_type)
+            last = np.r_[keys[1:] != keys[:-1], True]
+            self._tables[frame_type] = self._day_seconds[last]
+
+        self._offsets = {
+            frame_type: _intraday_offsets(minutes)
+            for frame_type, minutes in minutes_of_frame.items()
+        }
+
+    @property
+    def days(self) -> np.ndarray:
+        """所有交易日，为`datetime64[D]`数组"""
+        return self._days
+
+    def frames(self, frame_type: FrameType) -> np.ndarray:
+        """返回日线及以上周期的完整帧表(`datetime64[s]`)，对分钟线返回日内各帧的时间偏移"""
+        if frame_type in self._offsets:
+            return self._offsets[frame_type].astype("timedelta64[s]")
+
+        return self._tables[frame_type].astype("datetime64[s]")
+
+    def is_trade_day(self, frames: FrameLike) -> np.ndarray:
+        """判断`frames`是否为交易日"""
+        days = np.asarray(frames, dtype="datetime64[D]")
+        pos = np.searchsorted(self._days, days)
+        pos = np.minimum(pos, len(self._days) - 1)
+        return self._days[pos] == days
+
+    def floor_index(self, frames: FrameLike, frame_type: FrameType) -> np.ndarray:
+        """返回不晚于`frames`的最后一帧的序号"""
+        seconds = _to_seconds(frames)
+        days = seconds - seconds % 86400
+
+        if frame_type not in self._offsets:
+            return np.searchsorted(self._tables[frame_type], days, side="right") - 1
+
+        offsets = self._offsets[frame_type]
+        per_day = len(offsets)
+        day_idx = np.searchsorted(self._day_seconds, days, side="right") - 1
+        k = np.searchsorted(offsets, seconds - days, side="right") - 1
+
+        # 非交易日，取前一交易日的最后一帧
+        is_trade_day = self._day_seconds[np.maximum(day_idx, 0)] == days
+        k = np.where(is_trade_day, k, per_day - 1)
+        return day_idx * per_day + k
+
+    def ceil_index(self, frames: FrameLike, frame_type: FrameType) -> np.ndarray:
+        """返回不早于`frames`的第一帧的序号"""
+        seconds = _to_seconds(frames)
+        days = seconds - seconds % 86400
+
+        if frame_type not in self._offsets:
+            return np.searchsorted(self._tables[frame_type], days, side="left")
+
+        offsets = self._offsets[frame_type]
+        per_day = len(offsets)
+        day_idx = np.searchsorted(self._day_seconds, days, side="left")
+        k = np.searchsorted(offsets, seconds - days, side="left")
+
+        # 非交易日，取下一交易日的第一帧
+        is_trade_day = (
+            self._day_seconds[np.minimum(day_idx, len(self._day_seconds) - 1)] == days
+        )
+        k = np.where(is_trade_day, k, 0)
+        return day_idx * per_day + k
+
+    def frame_of(
+        self, index: Union[int, np.ndarray], frame_type: FrameType
+    ) -> np.ndarray:
+        """将帧序号转换为`datetime64[s]`，超出日历范围的序号转换为NaT"""
+        index = np.asarray(index, dtype=np.int64)
+
+        if frame_type in self._offsets:
+            offsets = self._offsets[frame_type]
+            day_idx, k = np.divmod(index, len(offsets))
+            table = self._day_seconds
+            valid = (day_idx >= 0) & (day_idx < len(table))
+            seconds = table[np.clip(day_idx, 0, len(table) - 1)] + offsets[k]
+        else:
+            table = self._tables[frame_type]
+            valid = (index >= 0) & (index < len(table))
+            seconds = table[np.clip(index, 0, len(table) - 1)]
+
+        result = seconds.astype("datetime64[s]")
+        return np.where(valid, result, np.datetime64("NaT"))
+
+    def floor(self, frames: FrameLike, frame_type: FrameType) -> np.ndarray:
+        """将`frames`向下取整到`frame_type`的帧边界"""
+        return self.frame_of(self.floor_index(frames, frame_type), frame_type)
+
+    def ceil(self, frames: FrameLike, frame_type: FrameType) -> np.ndarray:
+        """将`frames`向上取整到`frame_type`的帧边界"""
+        return self.frame_of(self.ceil_index(frames, frame_type), frame_type)
+
+    def shift(
+        self, frames: FrameLike, n: Union[int, np.ndarray], frame_type: FrameType
+    ) -> np.ndarray:
+        """将`frames`平移`n`帧
+
+        `frames`如果不在帧边界上，将先向下取整。比如，要计算以`end`结束的`n_bars`根k线的起始帧，
+        可以使用`shift(end, -(n_bars - 1), frame_type)`。
+
+        Args:
+            frames: 起始帧
+            n: 平移的帧数，可以为负数，也可以是与`frames`形状一致的数组
+            frame_type: 帧类型
+        """
+        return self.frame_of(self.floor_index(frames, frame_type) + n, frame_type)
+
+    def count(
+        self, start: FrameLike, end: FrameLike, frame_type: FrameType
+    ) -> np.ndarray:
+        """计算[start, end]区间内的帧数，两端都包含"""
+        n = self.floor_index(end, frame_type) - self.ceil_index(start, frame_type) + 1
+        return np.maximum(n, 0)
+
+    def get_frames(self, start: Frame, end: Frame, frame_type: FrameType) -> np.ndarray:
+        """返回[start, end]区间内的所有帧"""
+        lo = self.ceil_index(start, frame_type)
+        hi = self.floor_index(end, frame_type)
+        return self.frame_of(np.arange(lo, hi + 1), frame_type)
+
+
+__all__ = ["TradingCalendar"]
@@ -196,6 +196,14 @@ LimitPriceOnlyBarsArray = NDArray[limit_price_only_dtype]
 BarsPanel = NDArray[bars_dtype_with_code]
 """带证券代码的行情数据数组"""
 
+bars_with_limit_dtype_with_code = np.dtype(
+    [("code", "O")] + bars_with_limit_dtype.descr
+)
+"""带证券代码和涨跌停价格的行情数据元类型，在bars_with_limit_dtype基础上增加了code字段"""
+
+BarsWithLimitPanel = NDArray[bars_with_limit_dtype_with_code]
+"""带证券代码和涨跌停价的行情数据数组"""
+
 security_db_dtype = [("frame", "O"), ("code", "U16"), ("info", "O")]
 
 security_info_dtype = [
@@ -222,6 +230,60 @@ xrxd_info_dtype = [
     ("bonus_cancel_pub_date", "datetime64[s]"),
 ]
 
+valuation_dtype = np.dtype(
+    [
+        ("code", "O"),
+        ("day", "datetime64[s]"),
+        ("capitalization", "f8"),
+        ("circulating_cap", "f8"),
+        ("market_cap", "f8"),
+        ("circulating_market_cap", "f8"),
+        ("turnover_ratio", "f4"),
+        ("pe_ratio", "f4"),
+        ("pe_ratio_lyr", "f4"),
+        ("pb_ratio", "f4"),
+        ("ps_ratio", "f4"),
+        ("pcf_ratio", "f4"),
+    ]
+)
+"""市值数据类型，即`QuotesFetcher.get_valuation`返回的数据中各字段的类型"""
+
+code_id_dtype = np.dtype("i4")
+"""证券代码在`SymbolTable`中的整数编号的类型"""
+
+
+def _with_code_id(dtype, **replaces) -> np.dtype:
+    """将`dtype`中的code字段替换为整数编号，其它需要替换的字段由`replaces`给出"""
+    replaces["code"] = code_id_dtype
+    return np.dtype(
+        [(name, replaces.get(name, kind)) for name, kind in np.dtype(dtype).descr]
+    )
+
+
+compact_bars_dtype_with_code = _with_code_id(bars_dtype_with_code)
+"""与`bars_dtype_with_code`相同，但code字段为`SymbolTable`中的整数编号"""
+
+compact_limit_price_only_dtype = _with_code_id(
+    limit_price_only_dtype, frame="datetime64[s]"
+)
+"""与`limit_price_only_dtype`相同，但code字段为整数编号，frame字段为datetime64[s]"""
+
+compact_security_info_dtype = _with_code_id(security_info_dtype)
+"""与`security_info_dtype`相同，但code字段为整数编号"""
+
+compact_xrxd_info_dtype = _with_code_id(xrxd_info_dtype)
+"""与`xrxd_info_dtype`相同，但code字段为整数编号"""
+
+CompactBarsPanel = NDArray[compact_bars_dtype_with_code]
+"""以整数编号表示证券代码的行情数据数组"""
+
+bars_dtypes_by_id = {1: bars_dtype, 2: bars_with_limit_dtype}
+"""行情数据类型在二进制格式中的编号，`BarsStore`的文件、`coretypes.wire`和`coretypes.codec`共用。编号会
+写入数据中，已分配的编号不能修改"""
+
+bars_dtype_ids = {dtype: dtype_id for dtype_id, dtype in bars_dtypes_by_id.items()}
+"""行情数据类型到其编号的映射，即`bars_dtypes_by_id`的反向映射"""
+
 __all__ = [
     "Frame",
     "FrameType",
@@ -238,7 +300,18 @@ __all__ = [
     "BarsArray",
     "BarsWithLimitArray",
     "BarsPanel",
+    "bars_with_limit_dtype_with_code",
+    "BarsWithLimitPanel",
     "security_db_dtype",
     "security_info_dtype",
     "xrxd_info_dtype",
+    "valuation_dtype",
+    "code_id_dtype",
+    "compact_bars_dtype_with_code",
+    "compact_limit_price_only_dtype",
+    "compact_security_info_dtype",
+    "compact_xrxd_info_dtype",
+    "CompactBarsPanel",
+    "bars_dtypes_by_id",
+    "bars_dtype_ids",
 ]
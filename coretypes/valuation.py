@@ -0,0 +1,320 @@
+"""按列存储的市值数据立方体
+
+`QuotesFetcher.get_valuation`每次返回一天的市值数据，而因子模型需要的是(日期 x 证券)的矩阵。
+`ValuationCube`为每个字段维护一个稠密的二维数组，行为交易日、列为证券，按日追加：
+
+- 截面查询(某日全部证券)是一行，时间序列查询(某证券的全部日期)是一列，都不需要重新组装
+- 可以按日计算排名和分位数
+- 每个字段保存为一个`.npy`文件，加载时可以内存映射
+
+缺失的值为NaN。
+"""
+import asyncio
+import itertools
+import os
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from coretypes.quote_fetcher import QuotesFetcher
+from coretypes.symbols import SymbolTable
+from coretypes.types import Frame, valuation_dtype
+
+valuation_fields = [
+    name for name in valuation_dtype.names if name not in ("code", "day")
+]
+"""`valuation_dtype`中的数值字段"""
+
+
+def _to_day(day) -> np.ndarray:
+    return np.asarray(day, dtype="datetime64[s]").astype("datetime64[D]")
+
+
+class ValuationCube:
+    """市值数据立方体
+
+    Examples:
+        >>> cube = ValuationCube(["market_cap", "pe_ratio"])  # doctest: +SKIP
+        >>> await cube.update(fetcher, trade_days, codes)  # doctest: +SKIP
+        >>> cube.cross_section(datetime.date(2022, 1, 4), "pe_ratio")  # doctest: +SKIP
+        >>> cube.rank("market_cap", pct=True)  # doctest: +SKIP
+    """
+
+    def __init__(
+        self, fields: Optional[Sequence[str]] = None, codes: Iterable[str] = ()
+    ):
+        """构造函数
+
+        Args:
+            fields: 需要保存的字段，为None时保存`valuation_fields`中的全部字段
+            codes: 预先分配列的证券代码。追加数据时遇到的新证券会自动增加列
+        """
+        fields = list(valuation_fields if fields is None else fields)
+        unknown = set(fields) - set(valuation_fields)
+        if not fields:
+            raise ValueError("at least one field is required")
+        if unknown:
+            raise ValueError(f"unknown valuation fields: {sorted(unknown)}")
+
+        self.fields = fields
+        self.symbols = SymbolTable(codes)
+        self._days = np.empty(0, dtype="datetime64[D]")
+        self._n_days = 0
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.full((0, len(self.symbols)), np.nan, dtype=valuation_dtype[name])
+            for name in fields
+        }
+
+    # ---------------------------------------------------------------------
+    # 存储
+    # ---------------------------------------------------------------------
+    def __len__(self) -> int:
+        return self._n_days
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """(交易日数, 证券数)"""
+        return self._n_days, len(self.symbols)
+
+    @property
+    def days(self) -> np.ndarray:
+        """所有交易日，为`datetime64[D]`数组"""
+        return self._days[: self._n_days]
+
+    @property
+    def codes(self) -> np.ndarray:
+        """各列对应的证券代码"""
+        return self.symbols.codes
+
+    def _reserve(self, n_days: int, n_codes: int):
+        """保证存储至少能容纳`n_days`行、`n_codes`列，容量按倍数增长"""
+        first = next(iter(self._columns.values()))
+        rows, cols = first.shape
+        # 内存映射加载的数据是只读的，追加时需要复制到内存
+        writable = first.flags.writeable and not isinstance(first, np.memmap)
+        if n_days <= rows and n_codes <= cols and writable:
+            return
+
+        new_rows = max(n_days, rows * 2 if n_days > rows else rows, 16)
+        new_cols = max(n_codes, cols * 2 if n_codes > cols else cols)
+        for name, column in self._columns.items():
+            grown = np.full((new_rows, new_cols), np.nan, dtype=column.dtype)
+            grown[: self._n_days, :cols] = column[: self._n_days]
+            self._columns[name] = grown
+
+        days = np.empty(new_rows, dtype="datetime64[D]")
+        days[: self._n_days] = self._days[: self._n_days]
+        self._days = days
+
+    def append(self, valuations: np.ndarray):
+        """追加市值数据
+
+        `valuations`需包含code、day以及`fields`中的字段，可以包含多天的数据，顺序不限。但其中的日期
+        不能早于已有的最后一天；与最后一天相同的数据会更新该日(便于按证券分批追加)。
+
+        Args:
+            valuations: `valuation_dtype`类型(或者包含所需字段)的数组
+        """
+        if len(valuations) == 0:
+            return
+
+        days = _to_day(valuations["day"])
+        last = self.days[-1] if self._n_days else None
+        if last is not None and days.min() < last:
+            raise ValueError(f"cannot append {days.min()} before the last day {last}")
+
+        uniques, day_idx = np.unique(days, return_inverse=True)
+        start = self._n_days
+        if last is not None and uniques[0] == last:
+            start -= 1
+
+        cols = self.symbols.intern(valuations["code"])
+        n_days = start + len(uniques)
+        self._reserve(n_days, len(self.symbols))
+
+        rows = start + day_idx.reshape(-1)
+        for name in self.fields:
+            self._columns[name][rows, cols] = valuations[name]
+
+        self._days[start:n_days] = uniques
+        self._n_days = n_days
+
+    async def update(
+        self,
+        fetcher: QuotesFetcher,
+        days: Iterable[Frame],
+        codes: Sequence[str],
+        batch_size: int = 500,
+        concurrency: int = 4,
+    ):
+        """通过`fetcher.get_valuation`获取并追加`days`中各日的市值数据
+
+        每天的证券按`batch_size`分批请求，请求按(日期, 批次)的顺序发出，结果按同样的顺序追加。任一时刻
+        最多有`concurrency`个请求在进行或者等待追加，因此内存占用与日期数无关。已有的日期(除最后一天
+        外)会被跳过。
+
+        Args:
+            fetcher: 上游fetcher
+            days: 交易日
+            codes: 证券代码
+            batch_size: 每次请求的证券数
+            concurrency: 最多同时进行的请求数
+        """
+        days = np.unique(_to_day(list(days)))
+        if self._n_days:
+            days = days[days >= self.days[-1]]
+
+        batches = [
+            list(codes[i : i + batch_size]) for i in range(0, len(codes), batch_size)
+        ]
+        requests = ((day, batch) for day in days for batch in batches)
+        window: Deque[asyncio.Future] = deque()
+
+        def fill():
+            for day, batch in itertools.islice(
+                requests, max(concurrency, 1) - len(window)
+            ):
+                future = asyncio.ensure_future(fetcher.get_valuation(batch, day.item()))
+                window.append(future)
+
+        # 请求并发进行，但按顺序追加。队首的请求完成后才发出新的请求
+        try:
+            fill()
+            while window:
+                valuations = await window.popleft()
+                fill()
+                if valuations is not None and len(valuations):
+                    self.append(valuations)
+        finally:
+            for future in window:
+                future.cancel()
+
+    # ---------------------------------------------------------------------
+    # 查询
+    # ---------------------------------------------------------------------
+    def field(self, name: str) -> np.ndarray:
+        """字段`name`的(交易日 x 证券)矩阵，为存储的视图"""
+        return self._columns[name][: self._n_days, : len(self.symbols)]
+
+    def _day_index(self, day: Frame) -> int:
+        day = _to_day(day)
+        i = int(np.searchsorted(self.days, day))
+        if i >= self._n_days or self.days[i] != day:
+            raise KeyError(f"{day} not in cube")
+        return i
+
+    def _slice(self, start: Optional[Frame], end: Optional[Frame]) -> slice:
+        days = self.days
+        lo = 0 if start is None else int(np.searchsorted(days, _to_day(start)))
+        hi = (
+            self._n_days
+            if end is None
+            else int(np.searchsorted(days, _to_day(end), side="right"))
+        )
+        return slice(lo, hi)
+
+    def cross_section(self, day: Frame, name: str) -> np.ndarray:
+        """返回`day`当天全部证券的`name`字段，顺序与`codes`一致"""
+        return self.field(name)[self._day_index(day)]
+
+    def series(
+        self,
+        code: str,
+        name: str,
+        start: Optional[Frame] = None,
+        end: Optional[Frame] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """返回`code`在[start, end]区间内的`name`字段，以及对应的日期"""
+        col = int(self.symbols.lookup([code])[0])
+        if col < 0:
+            raise KeyError(code)
+
+        rows = self._slice(start, end)
+        return self.days[rows], self.field(name)[rows, col]
+
+    def between(
+        self, name: str, start: Optional[Frame] = None, end: Optional[Frame] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """返回[start, end]区间内`name`字段的矩阵，以及对应的日期"""
+        rows = self._slice(start, end)
+        return self.days[rows], self.field(name)[rows]
+
+    def rank(self, name: str, pct: bool = False) -> np.ndarray:
+        """按日对`name`字段排名(从0开始，升序)，NaN的排名为NaN
+
+        Args:
+            name: 字段名
+            pct: 为真时返回百分比排名，即排名 / (当日有效值个数 - 1)
+        """
+        values = self.field(name)
+        # NaN排在最后
+        order = np.argsort(values, axis=1, kind="stable")
+        ranks = np.empty(values.shape, dtype=np.float64)
+        np.put_along_axis(
+            ranks, order, np.arange(values.shape[1], dtype=np.float64)[None, :], axis=1
+        )
+
+        invalid = np.isnan(values)
+        if pct:
+            valid = (~invalid).sum(axis=1, keepdims=True)
+            ranks = ranks / np.maximum(valid - 1, 1)
+
+        ranks[invalid] = np.nan
+        return ranks
+
+    def quantile(self, name: str, q) -> np.ndarray:
+        """按日计算`name`字段的分位数，忽略NaN
+
+        Returns:
+            `q`为标量时，返回长度为交易日数的数组；否则形状为(len(q), 交易日数)
+        """
+        values = self.field(name).astype(np.float64)
+        out = np.full((np.size(q), self._n_days), np.nan)
+        valid = ~np.isnan(values).all(axis=1)
+        if valid.any():
+            out[:, valid] = np.reshape(
+                np.nanquantile(values[valid], q, axis=1), (np.size(q), -1)
+            )
+
+        return out[0] if np.ndim(q) == 0 else out
+
+    # ---------------------------------------------------------------------
+    # 持久化
+    # ---------------------------------------------------------------------
+    def save(self, root: str):
+        """保存到`root`目录，每个字段一个`.npy`文件"""
+        os.makedirs(root, exist_ok=True)
+        np.save(os.path.join(root, "days.npy"), self.days)
+        np.save(os.path.join(root, "codes.npy"), self.codes.astype(str))
+        for name in self.fields:
+            np.save(os.path.join(root, f"{name}.npy"), self.field(name))
+
+    @classmethod
+    def load(cls, root: str, mmap_mode: Optional[str] = "r") -> "ValuationCube":
+        """从`save`保存的目录加载
+
+        Args:
+            root: 目录
+            mmap_mode: 传递给`np.load`，默认以只读的方式内存映射。继续追加数据时，会将数据复制到内存
+        """
+        codes = np.load(os.path.join(root, "codes.npy"))
+        fields = [
+            name
+            for name in valuation_fields
+            if os.path.exists(os.path.join(root, f"{name}.npy"))
+        ]
+
+        cube = cls(fields, codes.astype(object))
+        days = np.load(os.path.join(root, "days.npy"))
+        cube._days = days
+        cube._n_days = len(days)
+        for name in fields:
+            cube._columns[name] = np.load(
+                os.path.join(root, f"{name}.npy"), mmap_mode=mmap_mode
+            )
+
+        return cube
+
+
+__all__ = ["ValuationCube", "valuation_fields"]
@@ -0,0 +1,188 @@
+"""行情数据的二进制传输格式
+
+用于在行情进程(QuotesFetcher的实现)与消费者之间传递`get_bars`/`get_price`的结果，以替代pickle。
+消息由一个定长的消息头和若干数据块组成，每个数据块对应一支证券，包含证券代码、记录数以及原始的数据
+缓冲区。所有缓冲区都按8字节对齐，解码时直接通过`np.frombuffer`构建数组，不发生拷贝。
+
+数据块有两种布局：
+
+- 行布局：缓冲区即为`bars_dtype`(或者`bars_with_limit_dtype`)数组的原始内存，解码得到`BarsArray`
+- 列布局：每一列一个缓冲区，解码得到`BarsFrame`
+
+消息格式(小端序)：
+
+| 字段       | 类型     | 说明                                       |
+| ---------- | -------- | ------------------------------------------ |
+| magic      | 4s       | b"ZBAR"                                    |
+| version    | u1       | 当前为1                                    |
+| dtype      | u1       | 1: bars_dtype, 2: bars_with_limit_dtype    |
+| frame_type | u1       | `FrameType.to_int()`，0表示未指定          |
+| flags      | u1       | bit 0为1表示列布局                         |
+| blocks     | u4       | 数据块个数                                 |
+
+每个数据块以`code_len(u2), rows(u4), code(utf-8)`开始，随后是数据缓冲区。
+"""
+import struct
+from typing import Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from coretypes.bars_frame import BarsFrame
+from coretypes.types import (
+    BarsArray,
+    FrameType,
+    bars_dtype,
+    bars_dtype_ids,
+    bars_dtypes_by_id,
+)
+
+_magic = b"ZBAR"
+_version = 1
+_header = struct.Struct("<4sBBBBI")
+_block = struct.Struct("<HI")
+_columnar = 0x01
+_align = 8
+
+
+def _pad(buffer: bytearray):
+    buffer.extend(b"\x00" * (-len(buffer) % _align))
+
+
+def _split_panel(panel: np.ndarray) -> Dict[str, np.ndarray]:
+    """将带code字段的面板数据按证券拆分，并去掉code字段"""
+    names = [name for name in panel.dtype.names if name != "code"]
+    dtype = np.dtype([(name, panel.dtype[name]) for name in names])
+
+    codes, inverse = np.unique(panel["code"], return_inverse=True)
+    inverse = inverse.reshape(-1)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(codes)))
+
+    data = np.empty(len(panel), dtype=dtype)
+    for name in names:
+        data[name] = panel[name][order]
+
+    return {
+        code: data[start:stop]
+        for code, start, stop in zip(codes, np.r_[0, bounds[:-1]], bounds)
+    }
+
+
+def dumps(
+    bars: Union[BarsArray, Dict[str, BarsArray]],
+    frame_type: Optional[FrameType] = None,
+    code: str = "",
+    columnar: bool = False,
+) -> bytes:
+    """将行情数据编码为二进制消息
+
+    Args:
+        bars: 可以是单支证券的`BarsArray`/`BarsWithLimitArray`，也可以是证券代码到行情数据的字典。
+            如果是`BarsPanel`(包含code字段)，将按证券拆分为多个数据块。
+        frame_type: 行情数据的周期
+        code: 当`bars`为单支证券的行情数据时，其证券代码
+        columnar: 是否使用列布局
+
+    Returns:
+        编码后的消息
+    """
+    if isinstance(bars, np.ndarray):
+        if "code" in bars.dtype.names:
+            batch = _split_panel(bars)
+        else:
+            batch = {code: bars}
+    else:
+        batch = bars
+
+    dtypes = {arr.dtype for arr in batch.values()}
+    if len(dtypes) > 1:
+        raise TypeError(f"all bars in one message must have same dtype, got {dtypes}")
+
+    dtype = dtypes.pop() if dtypes else bars_dtype
+    if dtype not in bars_dtype_ids:
+        raise TypeError(f"unsupported dtype: {dtype}")
+
+    buffer = bytearray(
+        _header.pack(
+            _magic,
+            _version,
+            bars_dtype_ids[dtype],
+            0 if frame_type is None else frame_type.to_int(),
+            _columnar if columnar else 0,
+            len(batch),
+        )
+    )
+    _pad(buffer)
+
+    for sec, arr in batch.items():
+        encoded = sec.encode("utf-8")
+        buffer.extend(_block.pack(len(encoded), len(arr)))
+        buffer.extend(encoded)
+        _pad(buffer)
+
+        if columnar:
+            for name in dtype.names:
+                buffer.extend(np.ascontiguousarray(arr[name]).tobytes())
+                _pad(buffer)
+        else:
+            buffer.extend(np.ascontiguousarray(arr).tobytes())
+            _pad(buffer)
+
+    return bytes(buffer)
+
+
+def loads(
+    buffer: Union[bytes, bytearray, memoryview]
+) -> Tuple[Optional[FrameType], Dict[str, Union[BarsArray, BarsFrame]]]:
+    """解码由`dumps`生成的消息
+
+    解码出来的数组与`buffer`共享内存。如果`buffer`为`bytes`，数组是只读的。
+
+    Args:
+        buffer: 消息
+
+    Returns:
+        二元组(frame_type, 证券代码到行情数据的字典)。行布局时行情数据为`BarsArray`或者
+        `BarsWithLimitArray`，列布局时为`BarsFrame`。
+    """
+    magic, version, dtype_id, frame_type, flags, blocks = _header.unpack_from(buffer)
+    if magic != _magic:
+        raise ValueError("not a bars message")
+
+    if version != _version:
+        raise ValueError(f"unsupported message version: {version}")
+
+    if dtype_id not in bars_dtypes_by_id:
+        raise ValueError(f"unsupported dtype id: {dtype_id}")
+
+    dtype = bars_dtypes_by_id[dtype_id]
+    columnar = bool(flags & _columnar)
+
+    def aligned(offset: int) -> int:
+        return offset + (-offset % _align)
+
+    offset = aligned(_header.size)
+    result = {}
+    for _ in range(blocks):
+        code_len, rows = _block.unpack_from(buffer, offset)
+        offset += _block.size
+        code = bytes(buffer[offset : offset + code_len]).decode("utf-8")
+        offset = aligned(offset + code_len)
+
+        if columnar:
+            columns = {}
+            for name in dtype.names:
+                field = dtype[name]
+                columns[name] = np.frombuffer(
+                    buffer, dtype=field, count=rows, offset=offset
+                )
+                offset = aligned(offset + rows * field.itemsize)
+            result[code] = BarsFrame(columns)
+        else:
+            result[code] = np.frombuffer(buffer, dtype=dtype, count=rows, offset=offset)
+            offset = aligned(offset + rows * dtype.itemsize)
+
+    return (None if frame_type == 0 else FrameType.from_int(frame_type)), result
+
+
+__all__ = ["dumps", "loads"]
@@ -1,10 +1,21 @@
 import datetime
+import json
+import pickle
 import unittest
 
 from coretypes.errors.trade import *
+from coretypes.errors.trade.base import _registry
 
 
 class TradeErrorTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = dict(_registry)
+
+    def tearDown(self):
+        # 测试中定义的错误类不应留在注册表中
+        _registry.clear()
+        _registry.update(self.registry)
+
     def test_from_json(self):
         d = {
             "error_code": 4000,
@@ -81,7 +92,11 @@ class TradeErrorTest(unittest.TestCase):
         del d["stack"]
         self.assertDictEqual(
             d,
-            {"error_code": 4001, "msg": "账户fdgd资金不足, 需要1000000, 当前3000"},
+            {
+                "error_code": 4001,
+                "msg": "账户fdgd资金不足, 需要1000000, 当前3000",
+                "args": {"account": "fdgd", "required": 1_000_000, "available": 3_000},
+            },
         )
 
     def test_client_error(self):
@@ -121,9 +136,235 @@ class TradeErrorTest(unittest.TestCase):
         e = TradeError.from_json(d)
         self.assertTrue(isinstance(e, NoData))
 
+    def test_structured_args(self):
+        bid_time = datetime.datetime(2022, 3, 1, 9, 31)
+        e = TimeRewindError(bid_time, datetime.date(2022, 3, 2))
+        self.assertEqual(
+            e.error_msg, "委托时间必须递增出现。当前2022-03-01 09:31:00, 前一个委托时间2022-03-02"
+        )
+
+        e = TradeError.from_json(e.as_json())
+        self.assertIsInstance(e, TimeRewindError)
+        self.assertEqual(e.cur, bid_time)
+        self.assertEqual(e.last_trade_time, datetime.date(2022, 3, 2))
+
+        e = TradeError.from_json(PriceNotMeet("300024", 9.26, bid_time).as_json())
+        self.assertEqual(
+            (e.security, e.price, e.order_time), ("300024", 9.26, bid_time)
+        )
+
+        # 不带args的旧格式仍通过解析msg重建
+        d = {"error_code": 4001, "msg": "账户abced001资金不足, 需要3000.13, 当前12.35"}
+        e = TradeError.from_json(d)
+        self.assertEqual(
+            (e.account, e.required, e.available), ("abced001", 3000.13, 12.35)
+        )
+
+        d = {"error_code": 4003, "msg": "不能在涨停板上买入300325.XSHE, 2023-09-31"}
+        self.assertEqual(TradeError.from_json(d).time, "2023-09-31")
+
+    def test_registry(self):
+        class LotSizeError(VolumeNotMeet):
+            error_code = 4999
+
+        class QuietCashError(CashError):
+            pass
+
+        e = TradeError.from_json(LotSizeError("000001.XSHE", 10.0).as_json())
+        self.assertIsInstance(e, LotSizeError)
+        self.assertEqual(e.price, 10.0)
+
+        # 未声明error_code的子类不会覆盖父类的注册
+        e = TradeError.from_json(QuietCashError("a", 1, 0).as_json())
+        self.assertIs(type(e), CashError)
+
+    def test_unstored_args(self):
+        class OddLotError(TradeError):
+            error_code = 4998
+
+            def __init__(self, security: str, volume: float, with_stack=False):
+                super().__init__(f"{security}的委托量{volume}不是整手", with_stack)
+
+            @classmethod
+            def parse_msg(cls, msg: str) -> dict:
+                security, volume = msg[:-4].split("的委托量")
+                return {"security": security, "volume": float(volume)}
+
+        d = OddLotError("000001.XSHE", 150.0).as_json()
+        self.assertNotIn("args", d)
+        e = TradeError.from_json(d)
+        self.assertIsInstance(e, OddLotError)
+        self.assertEqual(e.msg, "000001.XSHE的委托量150.0不是整手")
+
     def test_callstack(self):
         try:
             e = TradeError("this is a test", with_stack=True)
             raise e
         except TradeError as e:
             print(e.error_msg, e.error_code, e.stack)
+
+        e = CashError("a", 1, 0, with_stack=True)
+        # 构造时只记录栈帧，访问时才格式化
+        self.assertIsNone(e._stack)
+        self.assertIn("test_callstack", e.stack)
+        self.assertEqual(e.as_json()["stack"], e.stack)
+
+        e.stack = "remote stack"
+        self.assertEqual(e.stack, "remote stack")
+
+    def test_pickle(self):
+        e = CashError("a", 1, 0, with_stack=True)
+        copy = pickle.loads(pickle.dumps(e))
+        self.assertIs(type(copy), CashError)
+        self.assertEqual((copy.account, copy.required, copy.available), ("a", 1, 0))
+        self.assertEqual(copy.msg, e.msg)
+        self.assertIn("test_pickle", copy.stack)
+        self.assertEqual(copy.stack, e.stack)
+
+        # 以关键字参数构造(比如from_json重建)的对象也可以pickle
+        e = TradeError.from_json(PositionError("000001.XSHE", "2022-01-04").as_json())
+        copy = pickle.loads(pickle.dumps(e))
+        self.assertIs(type(copy), PositionError)
+        self.assertEqual(copy.as_json(), e.as_json())
+        self.assertIsNone(copy.stack)
+
+    def test_stack_sampling(self):
+        self.addCleanup(set_stack_sampling)
+
+        set_stack_sampling(3, {ErrorCodes.TradeNoPosition: 0})
+        errors = [CashError("a", 1, 0, with_stack=True) for _ in range(6)]
+        self.assertEqual([e.stack is not None for e in errors], [1, 0, 0, 1, 0, 0])
+
+        e = PositionError("000001.XSHE", "2022-01-04", with_stack=True)
+        self.assertIsNone(e.stack)
+        self.assertNotIn("stack", e.as_json())
+
+        # 未指定with_stack时不受采样影响
+        self.assertIsNone(CashError("a", 1, 0).stack)
+
+
+class TradeErrorBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.registry = dict(_registry)
+
+    def tearDown(self):
+        _registry.clear()
+        _registry.update(self.registry)
+
+    def test_append_and_decode(self):
+        t0 = datetime.datetime(2022, 1, 4, 10, 1)
+        errors = [
+            CashError("acc001", 1000.5, 10.25),
+            PriceNotMeet("000001.XSHE", 9.26, t0),
+            AccountStoppedError(t0, datetime.datetime(2022, 1, 3)),
+            BadParamsError("bad price"),
+        ]
+        batch = TradeErrorBatch()
+        batch.extend(errors)
+        self.assertEqual(len(batch), 4)
+
+        for expected, e in zip(errors, batch):
+            self.assertIs(type(e), type(expected))
+            self.assertEqual(e.error_msg, expected.error_msg)
+
+        self.assertEqual(batch[-1].error_msg, "bad price")
+        with self.assertRaises(IndexError):
+            batch[4]
+
+    def test_record_and_counts(self):
+        batch = TradeErrorBatch()
+        batch.record(
+            ErrorCodes.TradeReachBuyLimit,
+            ["000001.XSHE", "000002.XSHE", "000001.XSHE"],
+            ["2022-01-04T10:00", "2022-01-04T10:01", "2022-01-05T10:00"],
+        )
+        batch.record(ErrorCodes.TradeVolNotEnough, "000002.XSHE", values=[9.5, 9.6])
+        batch.append(NoDataForMatch("000001.XSHE", datetime.date(2022, 1, 5)))
+
+        self.assertEqual(len(batch), 6)
+        self.assertEqual(
+            batch.count_by_code(),
+            {
+                ErrorCodes.TradeReachBuyLimit: 3,
+                ErrorCodes.TradeVolNotEnough: 2,
+                ErrorCodes.ServerNoDataForMatch: 1,
+            },
+        )
+        self.assertEqual(
+            batch.count_by_security(), {"000001.XSHE": 3, "000002.XSHE": 3}
+        )
+        self.assertEqual(
+            batch.count_by_day(),
+            {datetime.date(2022, 1, 4): 2, datetime.date(2022, 1, 5): 2},
+        )
+
+        counts = batch.counts(("code", "security"))
+        self.assertEqual(
+            counts.tolist(),
+            [
+                (3001, "000001.XSHE", 1),
+                (4002, "000002.XSHE", 2),
+                (4003, "000001.XSHE", 2),
+                (4003, "000002.XSHE", 1),
+            ],
+        )
+
+        e = batch[1]
+        self.assertIsInstance(e, BuylimitError)
+        self.assertEqual(e.time, datetime.datetime(2022, 1, 4, 10, 1))
+        self.assertEqual(batch[4].price, 9.6)
+
+        with self.assertRaises(ValueError):
+            batch.counts("account")
+
+    def test_record_validation(self):
+        batch = TradeErrorBatch()
+        # PriceNotMeet需要security、price和order_time
+        with self.assertRaises(ValueError):
+            batch.record(ErrorCodes.TradePirceNotMeet, "000001.XSHE", "2022-01-04")
+        with self.assertRaises(ValueError):
+            batch.record(
+                ErrorCodes.TradeNoCash, "acc001", values=1.0, times="2022-01-04"
+            )
+        self.assertEqual(len(batch), 0)
+
+        class UntypedError(TradeError):
+            def __init__(self, security, with_stack=False):
+                self.security = security
+                super().__init__(security, with_stack)
+
+        with self.assertRaisesRegex(TypeError, "UntypedError.security has no type"):
+            batch.append(UntypedError("000001.XSHE"))
+
+    def test_custom_codes(self):
+        class OddLotError(VolumeNotMeet):
+            error_code = 4997
+
+        batch = TradeErrorBatch()
+        batch.append(OddLotError("000001.XSHE", 10.0))
+        batch.record(ErrorCodes.TradeVolNotEnough, "000001.XSHE", values=9.5)
+        batch.record(4997, "000002.XSHE", values=9.6)
+
+        counts = batch.count_by_code()
+        self.assertEqual(counts, {4997: 2, ErrorCodes.TradeVolNotEnough: 1})
+        self.assertIsInstance(next(k for k in counts if k == 4002), ErrorCodes)
+        self.assertIsInstance(batch[2], OddLotError)
+
+        self.assertIs(error_class(4997), OddLotError)
+        with self.assertRaises(KeyError):
+            error_class(4996)
+
+    def test_json(self):
+        batch = TradeErrorBatch()
+        batch.append(CashError("acc001", 1000.5, 10.25))
+        batch.record(ErrorCodes.TradeNoPosition, ["a", "b"], ["2022-01-04"] * 2)
+
+        d = json.loads(json.dumps(batch.as_json()))
+        decoded = TradeErrorBatch.from_json(d)
+        self.assertEqual(decoded.data.tobytes(), batch.data.tobytes())
+        self.assertEqual(decoded[2].security, "b")
+
+        merged = TradeErrorBatch()
+        merged.record(ErrorCodes.TradeNoPosition, "b", "2022-01-05")
+        merged.extend(decoded)
+        self.assertEqual(merged.count_by_security(), {"acc001": 1, "a": 1, "b": 2})
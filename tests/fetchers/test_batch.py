@@ -0,0 +1,126 @@
+import asyncio
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import FrameType, QuotesFetcher, bars_dtype
+from coretypes.fetchers import BatchingFetcher
+
+
+class MockFetcher(QuotesFetcher):
+    def __init__(self):
+        self.price_calls = []
+        self.bars_calls = []
+
+    async def get_price(self, sec, end_at, n_bars, frame_type):
+        self.price_calls.append((sorted(sec), end_at, n_bars, frame_type))
+        await asyncio.sleep(0.01)
+        if "bad" in sec:
+            raise ValueError("bad request")
+
+        result = {}
+        for i, code in enumerate(sec):
+            if code == "missing":
+                continue
+            bars = np.zeros(n_bars, dtype=bars_dtype)
+            bars["close"] = int(code)
+            result[code] = bars
+        return result
+
+    async def get_bars(self, sec, end, n_bars, frame_type, allow_unclosed=True):
+        self.bars_calls.append(sec)
+        await asyncio.sleep(0.01)
+        return np.zeros(n_bars, dtype=bars_dtype)
+
+
+class BatchingFetcherTest(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesce(self):
+        upstream = MockFetcher()
+        fetcher = BatchingFetcher(upstream, window=0.01)
+        end = datetime.date(2022, 1, 4)
+
+        secs = ["1", "2", "3", "2", "missing"]
+        results = await asyncio.gather(
+            *[fetcher.get_bars(sec, end, 5, FrameType.DAY) for sec in secs],
+            fetcher.get_bars("4", end, 10, FrameType.DAY),
+        )
+
+        self.assertEqual(len(upstream.price_calls), 2)
+        self.assertIn((["1", "2", "3", "missing"], end, 5, "1d"), upstream.price_calls)
+        self.assertEqual(results[0]["close"][0], 1)
+        self.assertEqual(results[3]["close"][0], 2)
+        self.assertEqual(len(results[4]), 0)
+        self.assertEqual(len(results[5]), 10)
+
+        # in-flight map is cleaned up
+        self.assertDictEqual(fetcher._inflight, {})
+
+    async def test_max_batch_and_errors(self):
+        upstream = MockFetcher()
+        fetcher = BatchingFetcher(upstream, window=10, max_batch=2)
+        end = datetime.date(2022, 1, 4)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                fetcher.get_bars("1", end, 1, FrameType.DAY),
+                fetcher.get_bars("bad", end, 1, FrameType.DAY),
+                return_exceptions=True,
+            ),
+            timeout=1,
+        )
+        self.assertIsInstance(results[1], ValueError)
+        self.assertIsInstance(results[0], ValueError)
+
+    async def test_closed_bars_dedup(self):
+        upstream = MockFetcher()
+        fetcher = BatchingFetcher(upstream)
+        end = datetime.date(2022, 1, 4)
+
+        await asyncio.gather(
+            *[
+                fetcher.get_bars("1", end, 1, FrameType.DAY, allow_unclosed=False)
+                for _ in range(3)
+            ]
+        )
+        self.assertListEqual(upstream.bars_calls, ["1"])
+        self.assertEqual(len(upstream.price_calls), 0)
+
+    async def test_cancel_dispatch(self):
+        upstream = MockFetcher()
+        fetcher = BatchingFetcher(upstream, window=0.001)
+        end = datetime.date(2022, 1, 4)
+
+        callers = [
+            asyncio.ensure_future(fetcher.get_bars(sec, end, 5, FrameType.DAY))
+            for sec in ("1", "2")
+        ]
+        closed = asyncio.ensure_future(
+            fetcher.get_bars("3", end, 5, FrameType.DAY, allow_unclosed=False)
+        )
+        await asyncio.sleep(0.005)
+        self.assertEqual(len(upstream.price_calls), 1)
+
+        # 取消正在进行的合并请求，调用者不应永远等待
+        for task in list(fetcher._tasks):
+            task.cancel()
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*callers, closed, return_exceptions=True), 1
+        )
+        for result in results:
+            self.assertIsInstance(result, asyncio.CancelledError)
+        self.assertDictEqual(fetcher._inflight, {})
+
+    async def test_close(self):
+        upstream = MockFetcher()
+        fetcher = BatchingFetcher(upstream, window=10)
+        end = datetime.date(2022, 1, 4)
+
+        caller = asyncio.ensure_future(fetcher.get_bars("1", end, 5, FrameType.DAY))
+        await asyncio.sleep(0)
+        await fetcher.close()
+
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(caller, 1)
+        self.assertEqual(upstream.price_calls, [])
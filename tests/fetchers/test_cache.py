@@ -0,0 +1,217 @@
+import asyncio
+import datetime
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from coretypes import FrameType, QuotesFetcher, TradingCalendar, bars_dtype
+from coretypes.fetchers import CachingFetcher, SyntheticFetcher
+
+days = np.arange(
+    np.datetime64("2022-01-03"), np.datetime64("2022-03-01"), dtype="datetime64[D]"
+)
+days = days[np.is_busday(days)]
+
+
+def today():
+    return np.datetime64("2022-02-28T10:00:00")
+
+
+class MockFetcher(QuotesFetcher):
+    def __init__(self):
+        self.calls = []
+        frames = days.astype("datetime64[s]")
+        self.bars = np.zeros(len(frames), dtype=bars_dtype)
+        self.bars["frame"] = frames
+        self.bars["close"] = np.arange(len(frames))
+
+    def _slice(self, end, n_bars):
+        i = np.searchsorted(self.bars["frame"], np.datetime64(end, "s"), "right")
+        return self.bars[max(i - n_bars, 0) : i].copy()
+
+    async def get_bars(self, sec, end, n_bars, frame_type, allow_unclosed=True):
+        self.calls.append((sec, end, n_bars))
+        return self._slice(end, n_bars)
+
+    async def get_price(self, sec, end_at, n_bars, frame_type):
+        self.calls.append((tuple(sec), end_at, n_bars))
+        return {code: self._slice(end_at, n_bars) for code in sec}
+
+
+class SlowFetcher(MockFetcher):
+    async def get_bars(self, sec, end, n_bars, frame_type, allow_unclosed=True):
+        await asyncio.sleep(0.01)
+        return await super().get_bars(sec, end, n_bars, frame_type, allow_unclosed)
+
+
+class CachingFetcherTest(unittest.IsolatedAsyncioTestCase):
+    def expected(self, end, n_bars):
+        i = np.searchsorted(days, np.datetime64(end), "right")
+        return np.arange(max(i - n_bars, 0), i)
+
+    async def test_read_through(self):
+        upstream = MockFetcher()
+        fetcher = CachingFetcher(upstream, clock=today)
+        end = datetime.date(2022, 2, 10)
+
+        bars = await fetcher.get_bars("000001.XSHE", end, 5, FrameType.DAY)
+        np.testing.assert_array_equal(bars["close"], self.expected(end, 5))
+
+        # hit: subset of the cached segment
+        bars = await fetcher.get_bars(
+            "000001.XSHE", datetime.date(2022, 2, 9), 3, FrameType.DAY
+        )
+        np.testing.assert_array_equal(
+            bars["close"], self.expected(datetime.date(2022, 2, 9), 3)
+        )
+        self.assertEqual(len(upstream.calls), 1)
+        self.assertEqual(fetcher.hits, 1)
+
+        # extend to older data: only fetch from the segment start backwards
+        bars = await fetcher.get_bars("000001.XSHE", end, 20, FrameType.DAY)
+        np.testing.assert_array_equal(bars["close"], self.expected(end, 20))
+        self.assertEqual(upstream.calls[-1][2], 16)
+
+        # extend beyond the listing day: head is recorded, later requests are hits
+        bars = await fetcher.get_bars("000001.XSHE", end, 100, FrameType.DAY)
+        np.testing.assert_array_equal(bars["close"], self.expected(end, 100))
+        calls = len(upstream.calls)
+        await fetcher.get_bars("000001.XSHE", end, 200, FrameType.DAY)
+        self.assertEqual(len(upstream.calls), calls)
+
+    async def test_extend_newer(self):
+        upstream = MockFetcher()
+        calendar = TradingCalendar(days)
+        fetcher = CachingFetcher(upstream, calendar=calendar, clock=today)
+
+        await fetcher.get_bars(
+            "000001.XSHE", datetime.date(2022, 2, 10), 5, FrameType.DAY
+        )
+        end = datetime.date(2022, 2, 15)
+        bars = await fetcher.get_bars("000001.XSHE", end, 5, FrameType.DAY)
+        np.testing.assert_array_equal(bars["close"], self.expected(end, 5))
+        # 11, 14, 15 are missing, plus one overlapping frame
+        self.assertEqual(upstream.calls[-1][2], 4)
+
+        # older than the segment, with a gap
+        end = datetime.date(2022, 1, 20)
+        bars = await fetcher.get_bars("000001.XSHE", end, 3, FrameType.DAY)
+        np.testing.assert_array_equal(bars["close"], self.expected(end, 3))
+        segment = fetcher._segments[("000001.XSHE", FrameType.DAY)]
+        self.assertEqual(segment.start, np.datetime64("2022-01-18"))
+        self.assertEqual(segment.end, np.datetime64("2022-02-15"))
+
+    async def test_unclosed(self):
+        upstream = MockFetcher()
+        fetcher = CachingFetcher(upstream, clock=today, unclosed_ttl=60)
+        end = datetime.datetime(2022, 2, 28, 10)
+
+        await fetcher.get_bars("000001.XSHE", end, 5, FrameType.DAY)
+        await fetcher.get_bars("000001.XSHE", end, 5, FrameType.DAY)
+        self.assertEqual(len(upstream.calls), 1)
+        self.assertEqual(len(fetcher._segments), 0)
+
+        fetcher = CachingFetcher(upstream, clock=today, unclosed_ttl=0)
+        await fetcher.get_bars("000001.XSHE", end, 5, FrameType.DAY)
+        await fetcher.get_bars("000001.XSHE", end, 5, FrameType.DAY)
+        self.assertEqual(len(upstream.calls), 3)
+
+    async def test_get_price(self):
+        upstream = MockFetcher()
+        fetcher = CachingFetcher(upstream, clock=today)
+        end = datetime.date(2022, 2, 10)
+
+        await fetcher.get_bars("A", end, 5, FrameType.DAY)
+        result = await fetcher.get_price(["A", "B"], end, 5, "1d")
+        self.assertEqual(upstream.calls[-1], (("B",), end, 5))
+        np.testing.assert_array_equal(result["A"]["close"], self.expected(end, 5))
+        np.testing.assert_array_equal(result["B"]["close"], self.expected(end, 5))
+
+        await fetcher.get_price(["A", "B"], end, 5, "1d")
+        self.assertEqual(len(upstream.calls), 2)
+
+    async def test_eviction_and_spill(self):
+        upstream = MockFetcher()
+        end = datetime.date(2022, 2, 10)
+        with tempfile.TemporaryDirectory() as folder:
+            fetcher = CachingFetcher(
+                upstream,
+                max_bytes=bars_dtype.itemsize * 15,
+                disk_path=folder,
+                clock=today,
+            )
+            for code in ("A", "B", "C"):
+                await fetcher.get_bars(code, end, 10, FrameType.DAY)
+
+            self.assertEqual(list(fetcher._segments), [("C", FrameType.DAY)])
+            self.assertLessEqual(fetcher.nbytes, bars_dtype.itemsize * 15)
+
+            # reloaded from disk, no upstream call
+            calls = len(upstream.calls)
+            bars = await fetcher.get_bars("A", end, 10, FrameType.DAY)
+            self.assertEqual(len(upstream.calls), calls)
+            np.testing.assert_array_equal(bars["close"], self.expected(end, 10))
+
+            # memory-mapped segments are accounted separately
+            self.assertEqual(fetcher.mapped_bytes, bars_dtype.itemsize * 10)
+            self.assertLessEqual(fetcher.nbytes, bars_dtype.itemsize * 10)
+
+        fetcher = CachingFetcher(
+            upstream, max_bytes=bars_dtype.itemsize * 15, clock=today
+        )
+        for code in ("A", "B"):
+            await fetcher.get_bars(code, end, 10, FrameType.DAY)
+        calls = len(upstream.calls)
+        await fetcher.get_bars("A", end, 10, FrameType.DAY)
+        self.assertEqual(len(upstream.calls), calls + 1)
+
+    async def test_concurrent_misses(self):
+        upstream = SlowFetcher()
+        fetcher = CachingFetcher(upstream, clock=today)
+        end = datetime.date(2022, 2, 10)
+
+        results = await asyncio.gather(
+            *[fetcher.get_bars("A", end, 5, FrameType.DAY) for _ in range(5)],
+            fetcher.get_bars("A", end, 3, FrameType.DAY),
+        )
+        self.assertEqual(len(upstream.calls), 1)
+        for bars in results[:5]:
+            np.testing.assert_array_equal(bars["close"], self.expected(end, 5))
+        np.testing.assert_array_equal(results[5]["close"], self.expected(end, 3))
+        self.assertEqual(fetcher._inflight, {})
+
+        # unclosed requests share the result of the one in flight
+        end = datetime.datetime(2022, 2, 28, 10)
+        results = await asyncio.gather(
+            *[fetcher.get_bars("A", end, 5, FrameType.DAY) for _ in range(3)]
+        )
+        self.assertEqual(len(upstream.calls), 2)
+        results[0]["close"][:] = -1
+        np.testing.assert_array_equal(results[1]["close"], self.expected(end, 5))
+
+    async def test_unaligned_ends(self):
+        upstream = SyntheticFetcher(["A"], seed=1)
+        rng = random.Random(0)
+
+        def later():
+            return np.datetime64("2026-01-01T00:00:00")
+
+        for ft in (FrameType.MIN1, FrameType.MIN30, FrameType.DAY, FrameType.WEEK):
+            fetcher = CachingFetcher(upstream, calendar=upstream.calendar, clock=later)
+            requests = [
+                (datetime.datetime(2016, 9, 27, 10, 7), 61),
+                (datetime.datetime(2017, 4, 17, 10, 7), 5),
+            ]
+            for _ in range(40):
+                day = datetime.datetime(2016, 9, 1) + datetime.timedelta(
+                    days=rng.randrange(400), seconds=rng.randrange(86400)
+                )
+                requests.append((day, rng.randrange(1, 80)))
+
+            for end, n_bars in requests:
+                bars = await fetcher.get_bars("A", end, n_bars, ft)
+                np.testing.assert_array_equal(
+                    bars, upstream.bars("A", end, n_bars, ft), f"{ft} {end} {n_bars}"
+                )
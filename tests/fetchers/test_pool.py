@@ -0,0 +1,112 @@
+import asyncio
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import FrameType, QuotesFetcher, bars_dtype
+from coretypes.fetchers import FetcherPool
+
+end = datetime.date(2022, 1, 4)
+
+
+class MockFetcher(QuotesFetcher):
+    def __init__(self, name, delay=0.01, fail=False, quota=1000):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.quota = quota
+        self.calls = 0
+
+    async def get_quota(self):
+        return self.quota
+
+    async def get_bars(self, sec, end, n_bars, frame_type, allow_unclosed=True):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(self.name)
+
+        bars = np.zeros(n_bars, dtype=bars_dtype)
+        bars["close"] = self.name
+        return bars
+
+
+class FetcherPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def test_least_outstanding(self):
+        instances = [MockFetcher(i) for i in range(3)]
+        pool = FetcherPool(instances)
+
+        await asyncio.gather(
+            *[pool.get_bars("A", end, 1, FrameType.DAY) for _ in range(9)]
+        )
+        self.assertEqual([i.calls for i in instances], [3, 3, 3])
+
+        # a slow instance receives fewer requests
+        instances[0].delay = 0.05
+        for i in instances:
+            i.calls = 0
+
+        async def worker():
+            for _ in range(5):
+                await pool.get_bars("A", end, 1, FrameType.DAY)
+
+        await asyncio.gather(*[worker() for _ in range(6)])
+        self.assertLess(instances[0].calls, instances[1].calls)
+
+    async def test_failover_and_circuit(self):
+        bad, good = MockFetcher(0, fail=True), MockFetcher(1)
+        pool = FetcherPool([bad, good], failure_threshold=2, cooldown=0.05)
+
+        for _ in range(4):
+            bars = await pool.get_bars("A", end, 1, FrameType.DAY)
+            self.assertEqual(bars["close"][0], 1)
+
+        # opened after two failures, no more requests go to it
+        self.assertEqual(bad.calls, 2)
+        self.assertTrue(pool.status()[0]["open"])
+
+        # after cooldown, a trial request closes the circuit again
+        await asyncio.sleep(0.06)
+        bad.fail = False
+        await pool.get_bars("A", end, 1, FrameType.DAY)
+        await pool.get_bars("A", end, 1, FrameType.DAY)
+        self.assertEqual(bad.calls, 4)
+        self.assertEqual(pool.status()[0]["failures"], 0)
+
+        pool = FetcherPool([MockFetcher(0, fail=True)], retries=3)
+        with self.assertRaises(ConnectionError):
+            await pool.get_bars("A", end, 1, FrameType.DAY)
+
+    async def test_quota(self):
+        instances = [MockFetcher(0, quota=10), MockFetcher(1, quota=1000)]
+        pool = FetcherPool(instances)
+        self.assertEqual(await pool.get_quota(), 1010)
+
+        for _ in range(3):
+            await pool.get_bars("A", end, 8, FrameType.DAY)
+
+        self.assertEqual(instances[0].calls, 1)
+        self.assertEqual([s["quota"] for s in pool.status()], [2, 984])
+
+        pool = FetcherPool([MockFetcher(0, quota=1)])
+        await pool.get_quota()
+        with self.assertRaises(RuntimeError):
+            await pool.get_bars("A", end, 8, FrameType.DAY)
+
+    async def test_hedge(self):
+        instances = [MockFetcher(0, delay=0.01), MockFetcher(1, delay=0.01)]
+        pool = FetcherPool(instances, hedge_quantile=0.95, min_samples=4)
+        for _ in range(8):
+            await pool.get_bars("A", end, 1, FrameType.DAY)
+        self.assertEqual(pool.hedged, 0)
+
+        # one session stalls, the hedged request on the other one wins
+        instances[0].delay = 1
+        instances[0].calls = instances[1].calls = 0
+        bars = await asyncio.wait_for(
+            pool.get_bars("A", end, 1, FrameType.DAY), timeout=0.5
+        )
+        self.assertEqual(bars["close"][0], 1)
+        self.assertEqual(pool.hedged, 1)
+        self.assertEqual(pool.status()[0]["outstanding"], 0)
@@ -0,0 +1,105 @@
+import asyncio
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import FrameType, QuotesFetcher, bars_dtype
+from coretypes.fetchers import Priority, QuotaScheduler
+
+
+class MockFetcher(QuotesFetcher):
+    def __init__(self, quota: int):
+        self.quota = quota
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def get_quota(self):
+        return self.quota
+
+    async def get_bars(self, sec, end, n_bars, frame_type, allow_unclosed=True):
+        self.calls.append(sec)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        self.quota -= n_bars
+        return np.zeros(n_bars, dtype=bars_dtype)
+
+    async def get_security_list(self):
+        self.calls.append("list")
+        return np.array([])
+
+
+class QuotaSchedulerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cost(self):
+        scheduler = QuotaScheduler(MockFetcher(100))
+        end = datetime.date(2022, 1, 4)
+        self.assertEqual(scheduler.cost_of("get_bars", "A", end, 10, FrameType.DAY), 10)
+        self.assertEqual(
+            scheduler.cost_of("get_price", ["A", "B"], end, n_bars=10, frame_type="1d"),
+            20,
+        )
+        self.assertEqual(scheduler.cost_of("get_security_list"), 1)
+
+    async def test_concurrency_and_priority(self):
+        upstream = MockFetcher(1000)
+        scheduler = QuotaScheduler(upstream, max_concurrency=1)
+        backfill = scheduler.client("sync", Priority.BACKFILL)
+        realtime = scheduler.client("live", Priority.REALTIME)
+        end = datetime.date(2022, 1, 4)
+
+        tasks = [
+            asyncio.ensure_future(backfill.get_bars(f"b{i}", end, 1, FrameType.DAY))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        tasks.append(
+            asyncio.ensure_future(realtime.get_bars("r", end, 1, FrameType.DAY))
+        )
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(upstream.max_running, 1)
+        # the realtime request overtakes the queued backfill requests
+        self.assertLess(upstream.calls.index("r"), upstream.calls.index("b2"))
+        self.assertEqual(scheduler.tokens, 996)
+
+    async def test_reserve(self):
+        upstream = MockFetcher(25)
+        scheduler = QuotaScheduler(
+            upstream, sync_interval=0.05, reserve={Priority.BACKFILL: 10}
+        )
+        backfill = scheduler.client("sync", Priority.BACKFILL)
+        realtime = scheduler.client("live", Priority.REALTIME)
+        end = datetime.date(2022, 1, 4)
+
+        await backfill.get_bars("b0", end, 10, FrameType.DAY)
+        task = asyncio.ensure_future(backfill.get_bars("b1", end, 10, FrameType.DAY))
+        await asyncio.sleep(0.02)
+        self.assertFalse(task.done())
+        self.assertEqual(scheduler.waiting, 1)
+
+        # realtime requests can still use the reserved quota
+        await realtime.get_bars("r", end, 10, FrameType.DAY)
+        self.assertEqual(scheduler.tokens, 5)
+
+        # quota is reset upstream, picked up by the next sync
+        upstream.quota = 100
+        await asyncio.wait_for(task, timeout=1)
+        self.assertListEqual(upstream.calls, ["b0", "r", "b1"])
+
+    async def test_fair_share(self):
+        upstream = MockFetcher(1000)
+        scheduler = QuotaScheduler(upstream, max_concurrency=1)
+        a = scheduler.client("a")
+        b = scheduler.client("b")
+
+        tasks = [asyncio.ensure_future(a.get_security_list()) for _ in range(3)]
+        tasks += [asyncio.ensure_future(b.get_security_list()) for _ in range(3)]
+        await asyncio.gather(*tasks)
+        self.assertEqual(scheduler.running, 0)
+        self.assertEqual(scheduler.waiting, 0)
+
+        # get_quota is not scheduled
+        self.assertEqual(await a.get_quota(), 1000)
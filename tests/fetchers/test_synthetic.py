@@ -0,0 +1,127 @@
+import asyncio
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import FrameType
+from coretypes.fetchers import (
+    BatchingFetcher,
+    SyntheticFetcher,
+    bars_workload,
+    lognormal_latency,
+    run_load,
+)
+
+codes = ["000001.XSHE", "600000.XSHG", "000002.XSHE"]
+end = datetime.datetime(2022, 1, 5, 15)
+
+
+class SyntheticFetcherTest(unittest.IsolatedAsyncioTestCase):
+    async def test_deterministic(self):
+        a = SyntheticFetcher(codes, seed=7)
+        b = SyntheticFetcher(codes, seed=7)
+        c = SyntheticFetcher(codes, seed=8)
+
+        for ft in (FrameType.DAY, FrameType.MIN1, FrameType.MIN30, FrameType.WEEK):
+            bars = await a.get_bars(codes[0], end, 10, ft)
+            self.assertEqual(len(bars), 10)
+            np.testing.assert_array_equal(bars, await b.get_bars(codes[0], end, 10, ft))
+
+        self.assertFalse(
+            np.array_equal(
+                await a.get_bars(codes[0], end, 10, FrameType.DAY),
+                await c.get_bars(codes[0], end, 10, FrameType.DAY),
+            )
+        )
+
+        # the same bar is identical whatever the request window is
+        short = await a.get_bars(codes[1], end, 5, FrameType.MIN1)
+        long = await b.get_bars(codes[1], end, 1000, FrameType.MIN1)
+        np.testing.assert_array_equal(short, long[-5:])
+
+        prices = await a.get_price(codes, end, 5, "1d")
+        np.testing.assert_array_equal(
+            prices[codes[2]], await b.get_bars(codes[2], end, 5, FrameType.DAY)
+        )
+
+    async def test_consistent_frame_types(self):
+        fetcher = SyntheticFetcher(codes)
+        day = (await fetcher.get_bars(codes[0], end, 1, FrameType.DAY))[0]
+        minutes = await fetcher.get_bars(codes[0], end, 240, FrameType.MIN1)
+        m30 = await fetcher.get_bars(codes[0], end, 8, FrameType.MIN30)
+
+        self.assertEqual(minutes["frame"][0], np.datetime64("2022-01-05T09:31"))
+        self.assertEqual(m30["frame"][0], np.datetime64("2022-01-05T10:00"))
+        self.assertEqual(minutes["open"][0], day["open"])
+        self.assertEqual(minutes["close"][-1], day["close"])
+        self.assertEqual(minutes["high"].max(), day["high"])
+        self.assertEqual(minutes["low"].min(), day["low"])
+        self.assertAlmostEqual(minutes["volume"].sum(), day["volume"])
+        self.assertEqual(m30["high"].max(), day["high"])
+
+    async def test_listing(self):
+        fetcher = SyntheticFetcher(codes)
+        securities = await fetcher.get_security_list()
+        securities["ipo"][0] = np.datetime64("2022-01-04")
+        fetcher = SyntheticFetcher(securities)
+
+        bars = await fetcher.get_bars(codes[0], end, 10, FrameType.DAY)
+        self.assertEqual(len(bars), 2)
+
+    async def test_quota_and_errors(self):
+        fetcher = SyntheticFetcher(codes, quota=25)
+        await fetcher.get_bars(codes[0], end, 10, FrameType.DAY)
+        await fetcher.get_price(codes[:1], end, 10, "1d")
+        self.assertEqual(await fetcher.get_quota(), 5)
+        with self.assertRaises(RuntimeError):
+            await fetcher.get_bars(codes[0], end, 10, FrameType.DAY)
+
+        fetcher = SyntheticFetcher(codes, error_rate=1)
+        with self.assertRaises(ConnectionError):
+            await fetcher.get_bars(codes[0], end, 10, FrameType.DAY)
+
+    async def test_simulation_independent_of_scheduling(self):
+        async def outcomes(order):
+            fetcher = SyntheticFetcher(
+                codes, seed=3, latency=lognormal_latency(0.001), error_rate=0.5
+            )
+
+            async def call(code):
+                try:
+                    await fetcher.get_bars(code, end, 1, FrameType.DAY)
+                    return code, True
+                except ConnectionError:
+                    return code, False
+
+            results = await asyncio.gather(*[call(code) for code in order])
+            return sorted(results)
+
+        calls = codes * 4
+        self.assertEqual(await outcomes(calls), await outcomes(calls[::-1]))
+
+    async def test_run_load(self):
+        fetcher = SyntheticFetcher(
+            codes, latency=lognormal_latency(0.001), error_rate=0.1, seed=1
+        )
+        workload = bars_workload(codes, end, 10, FrameType.DAY, price_ratio=0.2)
+
+        report = await run_load(fetcher, workload, clients=8, requests=200)
+        stats = report.as_dict()
+        self.assertEqual(sum(row["count"] for row in stats.values()), 200)
+        errors = sum(row["errors"] for row in stats.values())
+        self.assertTrue(0 < errors < 200)
+        self.assertGreater(stats["get_price"]["count"], 0)
+        self.assertGreater(report.throughput(), 0)
+        self.assertLessEqual(stats["get_bars"]["p50"], stats["get_bars"]["p99"])
+        self.assertIn("get_bars", str(report))
+
+        # components under test can be put in front of the synthetic fetcher
+        report = await run_load(
+            BatchingFetcher(SyntheticFetcher(codes)),
+            bars_workload(codes, end, 10, FrameType.DAY),
+            clients=4,
+            duration=0.05,
+            requests=None,
+        )
+        self.assertGreater(report.stats["get_bars"].count, 0)
@@ -0,0 +1,181 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import (
+    bars_dtype,
+    bars_dtype_with_code,
+    bars_with_limit_dtype,
+    xrxd_info_dtype,
+)
+from coretypes.adjust import AdjustFactors, adjust
+
+
+def make_bars(dtype=bars_dtype) -> np.ndarray:
+    bars = np.zeros(4, dtype=dtype)
+    bars["frame"] = np.arange("2022-01-03", "2022-01-07", dtype="datetime64[D]")
+    bars["close"] = [10, 10, 5, 5]
+    bars["open"] = bars["close"]
+    bars["volume"] = 100
+    bars["amount"] = 1000
+    # 2:1 split on 2022-01-05
+    bars["factor"] = [1, 1, 2, 2]
+    return bars
+
+
+class AdjustTest(unittest.TestCase):
+    def test_forward(self):
+        bars = make_bars()
+        actual = adjust(bars)
+        np.testing.assert_array_almost_equal(actual["close"], [5, 5, 5, 5])
+        np.testing.assert_array_almost_equal(actual["volume"], [200, 200, 100, 100])
+        np.testing.assert_array_equal(actual["amount"], bars["amount"])
+        # not modified
+        self.assertEqual(bars["close"][0], 10)
+
+    def test_backward(self):
+        actual = adjust(make_bars(), forward=False)
+        np.testing.assert_array_almost_equal(actual["close"], [10, 10, 10, 10])
+
+    def test_ref(self):
+        bars = make_bars()
+        actual = adjust(bars, ref=datetime.date(2022, 1, 4))
+        np.testing.assert_array_almost_equal(actual["close"], [10, 10, 10, 10])
+
+        actual = adjust(bars, ref=datetime.date(2021, 1, 1))
+        np.testing.assert_array_almost_equal(actual["close"], [10, 10, 10, 10])
+
+    def test_inplace_with_limit(self):
+        bars = make_bars(bars_with_limit_dtype)
+        bars["high_limit"] = bars["close"] * 1.1
+        actual = adjust(bars, inplace=True)
+        self.assertIs(actual, bars)
+        np.testing.assert_array_almost_equal(bars["high_limit"], [5.5] * 4, decimal=5)
+
+    def test_panel(self):
+        a = make_bars()
+        b = make_bars()
+        b["factor"] = [1, 1, 1, 4]
+        b["close"] = [8, 8, 8, 2]
+
+        panel = np.zeros(8, dtype=bars_dtype_with_code)
+        for name in bars_dtype.names:
+            panel[name] = np.concatenate([a[name], b[name]])
+        panel["code"] = ["A"] * 4 + ["B"] * 4
+        panel = panel[::-1]
+
+        actual = adjust(panel)
+        expected = {"A": [5, 5, 5, 5], "B": [2, 2, 2, 2]}
+        for code in ("A", "B"):
+            np.testing.assert_array_almost_equal(
+                actual[actual["code"] == code]["close"], expected[code]
+            )
+
+
+def make_xrxd(rows):
+    """rows为(code, 除权除息日, 每10股送股, 每10股派息, 每10股转增)"""
+    xrxd = np.zeros(len(rows), dtype=xrxd_info_dtype)
+    for i, (code, day, bonus, dividend, transfer) in enumerate(rows):
+        xrxd[i]["code"] = code
+        xrxd[i]["a_xr_date"] = np.datetime64(day) if day else np.datetime64("NaT")
+        xrxd[i]["bonus_ratio"] = bonus
+        xrxd[i]["dividend_ratio"] = dividend
+        xrxd[i]["transfer_ratio"] = transfer
+    return xrxd
+
+
+class AdjustFactorsTest(unittest.TestCase):
+    def setUp(self):
+        closes = []
+        for code in ("A", "B"):
+            bars = make_bars(bars_dtype_with_code)
+            bars["code"] = code
+            closes.append(bars)
+        self.closes = np.concatenate(closes)[::-1]
+
+    def test_update(self):
+        xrxd = make_xrxd(
+            [
+                ("A", "2022-01-05", 5, 0, 5),  # 10送5转5，前收10，参考价5
+                ("B", "2022-01-04", 0, 20, 0),  # 10派20，前收10，参考价8
+                ("B", "2022-01-06", 0, 0, 10),  # 10转10，前收5，参考价2.5
+                ("B", "2022-01-03", 0, 10, 0),  # 没有前收盘价
+                ("C", None, 0, 10, 0),  # 未实施
+            ]
+        )
+        factors = AdjustFactors()
+        unresolved = factors.update(xrxd, self.closes)
+        self.assertListEqual(unresolved["code"].tolist(), ["B"])
+        self.assertEqual(len(factors), 3)
+
+        frames = np.arange("2022-01-03", "2022-01-07", dtype="datetime64[D]")
+        np.testing.assert_allclose(factors.factors("A", frames), [1, 1, 2, 2])
+        np.testing.assert_allclose(factors.factors("B", frames), [1, 1.25, 1.25, 2.5])
+        np.testing.assert_allclose(factors.factors("C", frames), [1, 1, 1, 1])
+
+        # 分钟线使用当天的因子
+        minutes = np.array(["2022-01-04T09:31", "2022-01-05T15:00"], "datetime64[s]")
+        np.testing.assert_allclose(factors.factors(["A", "B"], minutes), [1, 1.25])
+
+        # 单个时间
+        np.testing.assert_allclose(factors.factors("A", datetime.date(2022, 1, 5)), [2])
+        np.testing.assert_allclose(
+            factors.factors("B", np.datetime64("2022-01-06")), [2.5]
+        )
+
+        # 与已有的复权结果一致
+        bars = make_bars()
+        bars["factor"] = 0
+        bars = factors.apply(bars, code="A")
+        np.testing.assert_array_equal(bars["factor"], [1, 1, 2, 2])
+        np.testing.assert_array_equal(adjust(bars)["close"], [5, 5, 5, 5])
+
+    def test_incremental(self):
+        factors = AdjustFactors()
+        factors.update(make_xrxd([("B", "2022-01-04", 0, 20, 0)]), self.closes)
+
+        # 新事件在已有事件之前，且同一天的两条记录合并为一个事件
+        more = make_xrxd(
+            [
+                ("A", "2022-01-05", 5, 0, 0),
+                ("A", "2022-01-05", 0, 0, 5),
+                ("B", "2022-01-06", 0, 0, 10),
+            ]
+        )
+        factors.update(more, self.closes)
+        self.assertEqual(len(factors), 3)
+
+        panel = np.concatenate([make_bars(bars_dtype_with_code)] * 2)
+        panel["code"] = ["A"] * 4 + ["B"] * 4
+        panel = factors.apply(panel)
+        np.testing.assert_allclose(panel["factor"], [1, 1, 2, 2, 1, 1.25, 1.25, 2.5])
+
+        # 替换已有事件
+        factors.update(make_xrxd([("B", "2022-01-04", 0, 0, 0)]), self.closes)
+        np.testing.assert_allclose(factors.factors("B", ["2022-01-06"]), [2])
+
+        with self.assertRaises(ValueError):
+            factors.apply(make_bars())
+
+    def test_empty(self):
+        factors = AdjustFactors()
+        frames = np.arange("2022-01-03", "2022-01-07", dtype="datetime64[D]")
+        np.testing.assert_array_equal(factors.factors("A", frames), [1, 1, 1, 1])
+        np.testing.assert_array_equal(factors.factors("A", "2022-01-05"), [1])
+
+        bars = make_bars()
+        bars["factor"] = 0
+        np.testing.assert_array_equal(
+            factors.apply(bars, code="A")["factor"], [1, 1, 1, 1]
+        )
+
+        # 没有收盘价时全部记录都无法计算
+        xrxd = make_xrxd([("A", "2022-01-05", 5, 0, 5), ("B", "2022-01-04", 0, 20, 0)])
+        unresolved = factors.update(xrxd, self.closes[:0])
+        self.assertListEqual(unresolved["code"].tolist(), ["A", "B"])
+        self.assertEqual(len(factors), 0)
+
+        # 补齐数据后再次加入
+        factors.update(unresolved, self.closes)
+        self.assertEqual(len(factors), 2)
@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from coretypes import BarsFrame, bars_dtype, bars_with_limit_dtype
+
+
+class BarsFrameTest(unittest.TestCase):
+    def setUp(self):
+        self.bars = np.array(
+            [
+                (np.datetime64("2022-01-04"), 1.0, 1.2, 0.9, 1.1, 100, 1000, 1.0),
+                (np.datetime64("2022-01-05"), 1.1, 1.3, 1.0, 1.2, 200, 2000, 1.0),
+                (np.datetime64("2022-01-06"), 1.2, 1.4, 1.1, 1.3, 300, 3000, 1.0),
+            ],
+            dtype=bars_dtype,
+        )
+
+    def test_from_bars(self):
+        bf = BarsFrame.from_bars(self.bars)
+        self.assertEqual(len(bf), 3)
+        self.assertListEqual(bf.columns, list(bars_dtype.names))
+        self.assertTrue(bf["close"].flags["C_CONTIGUOUS"])
+        np.testing.assert_array_equal(bf.close, self.bars["close"])
+
+        # round trip
+        np.testing.assert_array_equal(bf.to_bars(), self.bars)
+
+    def test_zero_copy(self):
+        bf = BarsFrame.from_bars(self.bars, contiguous=False)
+        self.assertTrue(np.shares_memory(bf["close"], self.bars))
+        self.assertIs(bf.to_bars(), self.bars)
+
+        sliced = bf[1:]
+        self.assertTrue(np.shares_memory(sliced.to_bars(), self.bars))
+        self.assertEqual(sliced.to_bars()[0]["volume"], 200)
+
+    def test_slice_and_project(self):
+        bf = BarsFrame.from_bars(self.bars)
+        sub = bf[["frame", "close"]]
+        self.assertListEqual(sub.columns, ["frame", "close"])
+        self.assertTrue(np.shares_memory(sub["close"], bf["close"]))
+
+        row = bf[-1]
+        self.assertEqual(len(row), 1)
+        self.assertAlmostEqual(row.close[0], 1.3, places=5)
+
+        with self.assertRaises(KeyError):
+            sub.to_bars()
+
+    def test_with_limit(self):
+        bars = np.zeros(2, dtype=bars_with_limit_dtype)
+        bars["high_limit"] = [1.1, 1.2]
+        bf = BarsFrame.from_bars(bars)
+        self.assertEqual(bf.to_bars().dtype, bars_with_limit_dtype)
+        self.assertEqual(bf.to_bars(bars_dtype).dtype, bars_dtype)
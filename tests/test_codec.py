@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+
+from coretypes import bars_dtype, bars_dtype_ids, bars_with_limit_dtype
+from coretypes.codec import EncodedBars, decode, encode
+
+
+def random_walk(n: int, dtype=bars_dtype) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    bars = np.zeros(n, dtype=dtype)
+    bars["frame"] = np.datetime64("2022-01-04T09:31") + np.arange(n) * 60
+    # irregular gap
+    bars["frame"][n // 2 :] += 5400
+
+    close = np.round(10 + np.cumsum(rng.normal(0, 0.01, n)), 2).astype("f4")
+    bars["open"] = close
+    bars["high"] = close + 0.01
+    bars["low"] = close - 0.01
+    bars["close"] = close
+    bars["volume"] = rng.integers(0, 10000, n) * 100
+    bars["amount"] = bars["volume"] * close
+    bars["factor"] = 1.0
+    return bars
+
+
+class CodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        bars = random_walk(10_000)
+        bars["close"][3] = np.nan
+
+        data = encode(bars, chunk_size=3000)
+        self.assertLess(len(data), bars.nbytes / 2)
+
+        actual = decode(data)
+        self.assertEqual(actual.dtype, bars_dtype)
+        # bit exact
+        self.assertEqual(actual.tobytes(), bars.tobytes())
+
+    def test_dtype_ids(self):
+        # the codec shares dtype ids with BarsStore and the wire format
+        for dtype, dtype_id in bars_dtype_ids.items():
+            data = encode(random_walk(10, dtype))
+            self.assertEqual(data[5], dtype_id)
+            self.assertEqual(decode(data).dtype, dtype)
+
+    def test_small(self):
+        for n in (0, 1, 2, 3):
+            bars = random_walk(n, bars_with_limit_dtype)
+            self.assertEqual(decode(encode(bars)).tobytes(), bars.tobytes())
+
+    def test_random_access(self):
+        bars = random_walk(1000)
+        encoded = EncodedBars(encode(bars, chunk_size=100))
+        self.assertEqual(len(encoded), 1000)
+        self.assertEqual(encoded.chunks, 10)
+        np.testing.assert_array_equal(encoded.chunk(3), bars[300:400])
+
+        start, end = bars["frame"][250], bars["frame"][420]
+        np.testing.assert_array_equal(encoded.between(start, end), bars[250:421])
+        np.testing.assert_array_equal(encoded.between(end=start), bars[:251])
+        self.assertEqual(len(encoded.between(start=bars["frame"][-1] + 1)), 0)
@@ -0,0 +1,66 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import (
+    bars_dtype,
+    bars_dtype_with_code,
+    bars_with_limit_dtype,
+    bars_with_limit_dtype_with_code,
+    limit_price_only_dtype,
+)
+from coretypes.limits import join_limits
+
+
+class JoinLimitsTest(unittest.TestCase):
+    def setUp(self):
+        self.limits = np.array(
+            [
+                (datetime.date(2022, 1, 4), "000001.XSHE", 11.0, 9.0),
+                (datetime.date(2022, 1, 5), "000001.XSHE", 12.0, 10.0),
+                (datetime.date(2022, 1, 4), "600000.XSHG", 22.0, 18.0),
+                # duplicated, the last wins
+                (datetime.date(2022, 1, 5), "000001.XSHE", 12.1, 10.1),
+            ],
+            dtype=limit_price_only_dtype,
+        )
+
+    def test_panel(self):
+        panel = np.zeros(4, dtype=bars_dtype_with_code)
+        panel["code"] = ["600000.XSHG", "000001.XSHE", "000001.XSHE", "600000.XSHG"]
+        panel["frame"] = np.array(
+            ["2022-01-04", "2022-01-05T10:30", "2022-01-04", "2022-01-05"],
+            dtype="datetime64[s]",
+        )
+        panel["close"] = [1, 2, 3, 4]
+
+        result, unmatched = join_limits(panel, self.limits)
+        self.assertEqual(result.dtype, bars_with_limit_dtype_with_code)
+        np.testing.assert_array_equal(result["close"], panel["close"])
+        np.testing.assert_array_almost_equal(
+            result["high_limit"], [22.0, 12.1, 11.0, np.nan]
+        )
+        np.testing.assert_array_almost_equal(
+            result["low_limit"], [18.0, 10.1, 9.0, np.nan]
+        )
+
+        self.assertEqual(len(unmatched), 1)
+        self.assertEqual(unmatched["code"][0], "600000.XSHG")
+        self.assertEqual(unmatched["frame"][0], np.datetime64("2022-01-05"))
+
+    def test_single(self):
+        bars = np.zeros(3, dtype=bars_dtype)
+        bars["frame"] = np.arange("2022-01-03", "2022-01-06", dtype="datetime64[D]")
+
+        result, unmatched = join_limits(bars, self.limits, code="000001.XSHE")
+        self.assertEqual(result.dtype, bars_with_limit_dtype)
+        np.testing.assert_array_almost_equal(result["high_limit"], [np.nan, 11.0, 12.1])
+        self.assertEqual(len(unmatched), 1)
+
+        result, unmatched = join_limits(bars, self.limits[:0], code="000001.XSHE")
+        self.assertTrue(np.isnan(result["high_limit"]).all())
+        self.assertEqual(len(unmatched), 3)
+
+        with self.assertRaises(ValueError):
+            join_limits(bars, self.limits)
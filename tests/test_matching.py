@@ -0,0 +1,152 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes.errors.trade import (
+    BuylimitError,
+    ErrorCodes,
+    NoDataForMatch,
+    PriceNotMeet,
+    SellLimitError,
+    VolumeNotMeet,
+)
+from coretypes.matching import BUY, SELL, match_orders, order_dtype
+from coretypes.types import bars_dtype, bars_with_limit_dtype_with_code
+
+
+def minute_bars(code, rows, high_limit=11.0, low_limit=9.0):
+    """rows为(时间, open, high, low, close, volume)"""
+    bars = np.empty(len(rows), dtype=bars_with_limit_dtype_with_code)
+    bars["code"] = code
+    for i, (frame, o, h, l, c, v) in enumerate(rows):
+        bars[i]["frame"] = np.datetime64(frame)
+        bars[i]["open"], bars[i]["high"], bars[i]["low"], bars[i]["close"] = o, h, l, c
+        bars[i]["volume"] = v
+        bars[i]["amount"] = v * c
+    bars["factor"] = 1.0
+    bars["high_limit"] = high_limit
+    bars["low_limit"] = low_limit
+    return bars
+
+
+def make_orders(rows):
+    orders = np.empty(len(rows), dtype=order_dtype)
+    for i, (code, time, side, price, volume) in enumerate(rows):
+        orders[i] = (code, np.datetime64(time), side, price, volume)
+    return orders
+
+
+class MatchingTest(unittest.TestCase):
+    def setUp(self):
+        self.bars = np.concatenate(
+            [
+                minute_bars(
+                    "A",
+                    [
+                        ("2022-01-04T09:31", 10.0, 10.2, 9.9, 10.1, 1000),
+                        ("2022-01-04T09:32", 10.1, 10.5, 10.1, 10.4, 500),
+                        ("2022-01-04T09:33", 10.4, 10.4, 10.3, 10.3, 0),
+                        ("2022-01-05T09:31", 11.0, 11.0, 11.0, 11.0, 9000),
+                    ],
+                ),
+                minute_bars(
+                    "B",
+                    [
+                        ("2022-01-04T09:31", 9.0, 9.0, 9.0, 9.0, 100),
+                        ("2022-01-04T09:32", 9.0, 9.0, 9.0, 9.0, 100),
+                    ],
+                ),
+            ]
+        )[::-1]
+
+    def test_match(self):
+        orders = make_orders(
+            [
+                ("A", "2022-01-04T09:30", BUY, np.nan, 300),  # 市价，09:31成交
+                ("A", "2022-01-04T09:31:30", BUY, 10.3, 800),  # 09:32成交，部分
+                ("A", "2022-01-04T09:30", SELL, 10.45, 100),  # 09:32成交，价格为委托价
+                ("A", "2022-01-04T09:30", BUY, 9.0, 100),  # 价格未达到
+                ("A", "2022-01-04T09:33", SELL, 10.35, 100),  # 成交量为零
+                ("A", "2022-01-05T09:30", BUY, np.nan, 100),  # 涨停
+                ("B", "2022-01-04T09:30", SELL, np.nan, 100),  # 跌停
+                ("B", "2022-01-04T09:30", BUY, 9.0, 100),  # 跌停时可以买入
+                ("A", "2022-01-06T09:30", BUY, np.nan, 100),  # 无数据
+                ("C", "2022-01-04T09:30", BUY, np.nan, 100),  # 无数据
+            ]
+        )
+        result = match_orders(orders, self.bars)
+        fills = result.fills
+
+        self.assertListEqual(
+            result.error_codes.tolist(),
+            [
+                0,
+                0,
+                0,
+                ErrorCodes.TradePirceNotMeet,
+                ErrorCodes.TradeVolNotEnough,
+                ErrorCodes.TradeReachBuyLimit,
+                ErrorCodes.TradeReachSellLimit,
+                0,
+                ErrorCodes.ServerNoDataForMatch,
+                ErrorCodes.ServerNoDataForMatch,
+            ],
+        )
+        self.assertEqual(fills["frame"][0], np.datetime64("2022-01-04T09:31"))
+        self.assertEqual(fills["price"][0], 10.0)
+        self.assertEqual(fills["volume"][0], 300)
+
+        self.assertEqual(fills["frame"][1], np.datetime64("2022-01-04T09:32"))
+        self.assertAlmostEqual(fills["price"][1], 10.1, places=5)
+        self.assertEqual(fills["volume"][1], 500)
+
+        self.assertAlmostEqual(fills["price"][2], 10.45, places=5)
+        self.assertTrue(np.isnan(fills["price"][3]))
+
+        errors = result.errors
+        self.assertIs(result.errors, errors)
+        self.assertEqual(len(errors), 6)
+        kinds = {type(e) for e in errors}
+        self.assertSetEqual(
+            kinds,
+            {
+                PriceNotMeet,
+                VolumeNotMeet,
+                BuylimitError,
+                SellLimitError,
+                NoDataForMatch,
+            },
+        )
+        self.assertEqual(errors.count_by_security(), {"A": 4, "B": 1, "C": 1})
+
+        e = next(e for e in errors if isinstance(e, PriceNotMeet))
+        self.assertEqual(e.price, 9.0)
+        self.assertEqual(e.order_time, datetime.datetime(2022, 1, 4, 9, 30))
+
+    def test_daily_bars_without_limits(self):
+        bars = np.zeros(2, dtype=bars_dtype)
+        bars["frame"] = [np.datetime64("2022-01-04"), np.datetime64("2022-01-05")]
+        bars["open"] = bars["high"] = bars["low"] = bars["close"] = [11.0, 11.0]
+        bars["volume"] = 100
+
+        orders = make_orders(
+            [
+                ("A", "2022-01-04T14:00", BUY, np.nan, 100),
+                ("A", "2022-01-05T09:30", BUY, 10.0, 100),
+                ("A", "2022-01-06T09:30", BUY, 10.0, 100),
+            ]
+        )
+        result = match_orders(orders, bars, code="A")
+        self.assertListEqual(
+            result.error_codes.tolist(),
+            [0, ErrorCodes.TradePirceNotMeet, ErrorCodes.ServerNoDataForMatch],
+        )
+        self.assertEqual(result.fills["frame"][0], np.datetime64("2022-01-04"))
+
+        with self.assertRaises(ValueError):
+            match_orders(orders, bars)
+
+        empty = match_orders(orders[:0], bars, code="A")
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(len(empty.errors), 0)
@@ -0,0 +1,125 @@
+import asyncio
+import datetime
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+from coretypes import FrameType, QuotesFetcher, bars_dtype
+from coretypes.fetchers import FetcherWrapper
+from coretypes.metrics import fetcher_metrics
+
+
+class MockFetcher(QuotesFetcher):
+    async def get_quota(self):
+        return 1000
+
+    async def get_bars(self, sec, end, n_bars, frame_type, allow_unclosed=True):
+        await asyncio.sleep(0.002)
+        if sec == "bad":
+            raise ValueError(sec)
+        return np.zeros(n_bars, dtype=bars_dtype)
+
+    async def get_price(self, sec, end_at, n_bars, frame_type):
+        return {code: np.zeros(n_bars, dtype=bars_dtype) for code in sec}
+
+
+class FetcherMetricsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        fetcher_metrics.reset()
+        fetcher_metrics.enable()
+
+    def tearDown(self):
+        fetcher_metrics.disable()
+        fetcher_metrics.reset()
+
+    async def test_record(self):
+        fetcher = MockFetcher()
+        end = datetime.date(2022, 1, 4)
+
+        await fetcher.get_bars("A", end, 10, FrameType.DAY)
+        await fetcher.get_price(["A", "B"], end, 5, "1d")
+        await fetcher.get_quota()
+        with self.assertRaises(ValueError):
+            await fetcher.get_bars("bad", end, 10, FrameType.DAY)
+
+        snapshot = fetcher_metrics.snapshot()
+        bars = snapshot["methods"]["MockFetcher.get_bars"]
+        self.assertEqual(bars["calls"], 2)
+        self.assertEqual(bars["errors"], 1)
+        self.assertEqual(bars["rows"], 10)
+        self.assertEqual(bars["bytes"], 10 * bars_dtype.itemsize)
+        self.assertEqual(bars["estimated_quota"], 20)
+        self.assertEqual(bars["latency_buckets"][float("inf")], 2)
+        self.assertEqual(bars["latency_buckets"][0.001], 0)
+        self.assertGreater(bars["latency_sum"], 0.003)
+
+        price = snapshot["methods"]["MockFetcher.get_price"]
+        self.assertEqual((price["rows"], price["estimated_quota"]), (10, 10))
+        self.assertEqual(snapshot["quota_remaining"], {"MockFetcher": 1000})
+
+        # methods not overridden are not recorded
+        self.assertNotIn("MockFetcher.get_security_list", snapshot["methods"])
+
+    async def test_wrapper_and_disabled(self):
+        fetcher = FetcherWrapper(MockFetcher())
+        await fetcher.get_bars("A", datetime.date(2022, 1, 4), 3, FrameType.DAY)
+        methods = fetcher_metrics.snapshot()["methods"]
+        # wrappers only forward calls, they are not counted twice
+        self.assertNotIn("FetcherWrapper.get_bars", methods)
+        self.assertEqual(methods["MockFetcher.get_bars"]["calls"], 1)
+        self.assertEqual(methods["MockFetcher.get_bars"]["rows"], 3)
+        self.assertEqual(methods["MockFetcher.get_bars"]["estimated_quota"], 3)
+
+        fetcher_metrics.disable()
+        await fetcher.get_bars("A", datetime.date(2022, 1, 4), 3, FrameType.DAY)
+        methods = fetcher_metrics.snapshot()["methods"]
+        self.assertEqual(methods["MockFetcher.get_bars"]["calls"], 1)
+
+    async def test_opt_out(self):
+        class Quiet(MockFetcher):
+            record_metrics = False
+
+            async def get_quota(self):
+                return 1
+
+        class Loud(FetcherWrapper):
+            record_metrics = True
+
+            async def get_quota(self):
+                return 2
+
+        await Quiet().get_quota()
+        await Loud(MockFetcher()).get_quota()
+        methods = fetcher_metrics.snapshot()["methods"]
+        self.assertNotIn("Quiet.get_quota", methods)
+        self.assertEqual(methods["Loud.get_quota"]["calls"], 1)
+
+    def test_no_fetchers_dependency(self):
+        # quota estimation lives in coretypes.quota, metrics needs no fetcher module
+        code = (
+            "import sys, coretypes.metrics; "
+            "assert not any(m.startswith('coretypes.fetchers') for m in sys.modules)"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
+
+    async def test_prometheus(self):
+        fetcher = MockFetcher()
+        await fetcher.get_bars("A", datetime.date(2022, 1, 4), 3, FrameType.DAY)
+        await fetcher.get_quota()
+
+        text = fetcher_metrics.to_prometheus()
+        self.assertIn("# TYPE quotes_fetcher_calls_total counter", text)
+        self.assertIn(
+            'quotes_fetcher_calls_total{fetcher="MockFetcher",method="get_bars"} 1',
+            text,
+        )
+        self.assertIn(
+            'quotes_fetcher_latency_seconds_bucket{fetcher="MockFetcher",'
+            'method="get_bars",le="+Inf"} 1',
+            text,
+        )
+        self.assertIn(
+            'quotes_fetcher_quota_remaining{fetcher="MockFetcher"} 1000', text
+        )
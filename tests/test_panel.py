@@ -0,0 +1,69 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import bars_dtype_with_code
+from coretypes.panel import IndexedBarsPanel
+
+
+class IndexedBarsPanelTest(unittest.TestCase):
+    def setUp(self):
+        codes = ["600000.XSHG", "000001.XSHE", "000002.XSHE"]
+        days = np.arange("2022-01-03", "2022-01-08", dtype="datetime64[D]")
+
+        bars = np.zeros(len(codes) * len(days), dtype=bars_dtype_with_code)
+        bars["code"] = np.repeat(codes, len(days))
+        bars["frame"] = np.tile(days, len(codes))
+        bars["close"] = np.arange(len(bars))
+        bars["high"] = bars["close"] + 1
+
+        # drop one bar of 000002 and shuffle
+        bars = np.delete(bars, 10)
+        rng = np.random.default_rng(1)
+        self.bars = bars[rng.permutation(len(bars))]
+        self.panel = IndexedBarsPanel(self.bars)
+
+    def test_lookup(self):
+        panel = self.panel
+        self.assertEqual(len(panel), 14)
+        self.assertListEqual(
+            panel.codes.tolist(), ["000001.XSHE", "000002.XSHE", "600000.XSHG"]
+        )
+        self.assertIn("000001.XSHE", panel)
+
+        bars = panel["000001.XSHE"]
+        self.assertTrue(np.shares_memory(bars, panel.data))
+        self.assertListEqual(bars["close"].tolist(), [5, 6, 7, 8, 9])
+        self.assertEqual(len(panel["000002.XSHE"]), 4)
+
+        with self.assertRaises(KeyError):
+            panel["nonexist"]
+        self.assertIsNone(panel.get("nonexist"))
+
+    def test_between(self):
+        sub = self.panel.between(datetime.date(2022, 1, 4), datetime.date(2022, 1, 5))
+        self.assertEqual(len(sub), 6)
+        self.assertListEqual(sub["000001.XSHE"]["close"].tolist(), [6, 7])
+        self.assertListEqual(sub["000002.XSHE"]["close"].tolist(), [11, 12])
+        self.assertListEqual(sub["600000.XSHG"]["close"].tolist(), [1, 2])
+
+        sub = self.panel.between(start=datetime.date(2022, 1, 7))
+        self.assertListEqual(sub.last("close").tolist(), [9, 14, 4])
+
+        sub = self.panel.between(end=datetime.date(2021, 1, 1))
+        self.assertEqual(len(sub), 0)
+        self.assertTrue(np.isnan(sub.reduce(np.add, "close")).all())
+
+    def test_groupby(self):
+        np.testing.assert_array_equal(
+            self.panel.reduce(np.maximum, "high"), [10, 15, 5]
+        )
+        np.testing.assert_array_equal(self.panel.reduce(np.add, "close"), [35, 50, 10])
+
+        means = self.panel.apply(lambda bars: bars["close"].mean())
+        self.assertAlmostEqual(means["000002.XSHE"], 12.5)
+
+        sub = self.panel.between(datetime.date(2022, 1, 3), datetime.date(2022, 1, 3))
+        # 000002.XSHE has no bar on 2022-01-03
+        np.testing.assert_array_equal(sub.reduce(np.add, "close"), [5, np.nan, 0])
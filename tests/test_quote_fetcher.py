@@ -0,0 +1,116 @@
+import asyncio
+import datetime
+import tempfile
+import unittest
+
+import numpy as np
+
+from coretypes import BarsStore, FrameType, QuotesFetcher, TradingCalendar, bars_dtype
+
+days = np.arange(
+    np.datetime64("2022-01-03"), np.datetime64("2022-03-01"), dtype="datetime64[D]"
+)
+days = days[np.is_busday(days)]
+
+
+class MockFetcher(QuotesFetcher):
+    def __init__(self):
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.bars = np.zeros(len(days), dtype=bars_dtype)
+        self.bars["frame"] = days
+        self.bars["close"] = np.arange(len(days))
+
+    async def get_bars(self, sec, end, n_bars, frame_type, allow_unclosed=True):
+        self.calls.append((end, n_bars))
+        self.running += 1
+        self.max_running = max(self.running, self.max_running)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.running -= 1
+
+        i = np.searchsorted(self.bars["frame"], np.datetime64(end, "s"), "right")
+        return self.bars[max(i - n_bars, 0) : i].copy()
+
+
+class QuotesFetcherTest(unittest.IsolatedAsyncioTestCase):
+    async def test_iter_bars_with_calendar(self):
+        fetcher = MockFetcher()
+        calendar = TradingCalendar(days)
+        start, end = datetime.date(2022, 1, 5), datetime.date(2022, 2, 18)
+
+        chunks = [
+            bars
+            async for bars in fetcher.iter_bars(
+                "000001.XSHE", start, end, FrameType.DAY, 10, 3, calendar
+            )
+        ]
+
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 10, 3])
+        closes = np.concatenate([chunk["close"] for chunk in chunks])
+        np.testing.assert_array_equal(closes, np.arange(2, 35))
+        self.assertEqual(fetcher.max_running, 3)
+
+    async def test_iter_bars_backward(self):
+        fetcher = MockFetcher()
+        start, end = datetime.date(2022, 1, 5), datetime.date(2022, 2, 18)
+
+        chunks = [
+            bars
+            async for bars in fetcher.iter_bars(
+                "000001.XSHE", start, end, FrameType.DAY, chunk_size=10
+            )
+        ]
+
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 10, 3])
+        closes = np.concatenate([chunk["close"] for chunk in chunks[::-1]])
+        np.testing.assert_array_equal(closes, np.arange(2, 35))
+        self.assertEqual(fetcher.max_running, 1)
+
+    async def test_iter_bars_close_early(self):
+        fetcher = MockFetcher()
+        calendar = TradingCalendar(days)
+        start, end = datetime.date(2022, 1, 3), datetime.date(2022, 2, 28)
+
+        pages = fetcher.iter_bars(
+            "000001.XSHE", start, end, FrameType.DAY, 5, 4, calendar
+        )
+        bars = await pages.__anext__()
+        self.assertEqual(len(bars), 5)
+        await pages.aclose()
+
+        # pending pages are cancelled, nothing is left running
+        await asyncio.sleep(0.02)
+        self.assertEqual(fetcher.running, 0)
+        self.assertEqual(len(fetcher.calls), 4)
+
+    async def test_iter_bars_into_store(self):
+        fetcher = MockFetcher()
+        calendar = TradingCalendar(days)
+        start, end = datetime.date(2022, 1, 5), datetime.date(2022, 2, 18)
+
+        with tempfile.TemporaryDirectory() as folder:
+            store = BarsStore(folder, fsync=False)
+
+            # with a calendar, pages arrive in time order and can be appended
+            pages = fetcher.iter_bars(
+                "A", start, end, FrameType.DAY, chunk_size=10, calendar=calendar
+            )
+            async for bars in pages:
+                store.append("A", FrameType.DAY, bars)
+
+            # without one, pages arrive newest first and are reversed
+            pages = [
+                bars
+                async for bars in fetcher.iter_bars(
+                    "B", start, end, FrameType.DAY, chunk_size=10
+                )
+            ]
+            store.append("B", FrameType.DAY, np.concatenate(pages[::-1]))
+
+            for sec in ("A", "B"):
+                np.testing.assert_array_equal(
+                    store.get(sec, FrameType.DAY)["close"], np.arange(2, 35)
+                )
@@ -0,0 +1,108 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import FrameType, bars_dtype, bars_dtype_with_code
+from coretypes.resample import resample
+
+
+def minute_bars(day: str) -> np.ndarray:
+    """生成一天的1分钟线，open/close为其序号，volume为1"""
+    base = np.datetime64(day, "s")
+    am = base + np.arange(9 * 3600 + 31 * 60, 11 * 3600 + 31 * 60, 60)
+    pm = base + np.arange(13 * 3600 + 60, 15 * 3600 + 60, 60)
+    frames = np.concatenate([am, pm])
+
+    bars = np.zeros(len(frames), dtype=bars_dtype)
+    bars["frame"] = frames
+    seq = np.arange(len(frames), dtype="f4")
+    bars["open"] = seq
+    bars["close"] = seq
+    bars["high"] = seq + 0.5
+    bars["low"] = seq - 0.5
+    bars["volume"] = 1
+    bars["amount"] = 10
+    bars["factor"] = 1
+    return bars
+
+
+class ResampleTest(unittest.TestCase):
+    def test_minutes(self):
+        bars = minute_bars("2022-01-04")
+
+        m30 = resample(bars, FrameType.MIN30)
+        self.assertEqual(len(m30), 8)
+        self.assertEqual(
+            m30["frame"][[0, 3, 4, 7]].tolist(),
+            [
+                datetime.datetime(2022, 1, 4, 10, 0),
+                datetime.datetime(2022, 1, 4, 11, 30),
+                datetime.datetime(2022, 1, 4, 13, 30),
+                datetime.datetime(2022, 1, 4, 15, 0),
+            ],
+        )
+        self.assertEqual(m30["open"][0], 0)
+        self.assertEqual(m30["close"][0], 29)
+        self.assertEqual(m30["high"][0], 29.5)
+        self.assertEqual(m30["low"][0], -0.5)
+        self.assertEqual(m30["volume"][0], 30)
+
+        m60 = resample(bars, FrameType.MIN60)
+        self.assertEqual(
+            [f.strftime("%H:%M") for f in m60["frame"].tolist()],
+            ["10:30", "11:30", "14:00", "15:00"],
+        )
+
+        day = resample(bars, FrameType.DAY)
+        self.assertEqual(len(day), 1)
+        self.assertEqual(day["frame"][0], np.datetime64("2022-01-04"))
+        self.assertEqual(day["volume"][0], 240)
+
+    def test_unclosed(self):
+        bars = minute_bars("2022-01-04")[:33]
+
+        m5 = resample(bars, FrameType.MIN5)
+        self.assertEqual(len(m5), 6)
+
+        m5 = resample(bars, FrameType.MIN5, include_unclosed=True)
+        self.assertEqual(len(m5), 7)
+        self.assertEqual(m5["frame"][-1], np.datetime64("2022-01-04T10:05"))
+        self.assertEqual(m5["close"][-1], 32)
+
+        self.assertEqual(len(resample(bars, FrameType.DAY)), 0)
+
+    def test_week_month(self):
+        days = np.arange("2022-01-03", "2022-02-08", dtype="datetime64[D]")
+        days = days[np.is_busday(days)]
+        bars = np.zeros(len(days), dtype=bars_dtype)
+        bars["frame"] = days
+        bars["close"] = np.arange(len(days))
+        bars["volume"] = 1
+
+        weeks = resample(bars, FrameType.WEEK)
+        self.assertEqual(len(weeks), 5)
+        self.assertEqual(weeks["frame"][0], np.datetime64("2022-01-07"))
+        self.assertEqual(weeks["volume"][0], 5)
+
+        weeks = resample(bars, FrameType.WEEK, include_unclosed=True)
+        self.assertEqual(weeks["frame"][-1], np.datetime64("2022-02-07"))
+
+        months = resample(bars, FrameType.MONTH)
+        self.assertEqual(len(months), 1)
+        self.assertEqual(months["frame"][0], np.datetime64("2022-01-31"))
+
+    def test_panel(self):
+        bars = minute_bars("2022-01-04")
+        panel = np.zeros(len(bars) * 2, dtype=bars_dtype_with_code)
+        for name in bars.dtype.names:
+            panel[name] = np.concatenate([bars[name], bars[name]])
+        panel["code"] = ["000001.XSHE"] * len(bars) + ["600000.XSHG"] * len(bars)
+        # shuffle
+        panel = panel[np.random.default_rng(7).permutation(len(panel))]
+
+        m30 = resample(panel, FrameType.MIN30)
+        self.assertEqual(len(m30), 16)
+        self.assertEqual(list(m30["code"][7:9]), ["000001.XSHE", "600000.XSHG"])
+        self.assertEqual(m30["volume"].sum(), 480)
+        self.assertEqual(m30["open"][8], 0)
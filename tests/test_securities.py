@@ -0,0 +1,88 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from coretypes import SecurityTable, SecurityType, security_info_dtype
+
+
+def securities():
+    return np.array(
+        [
+            ("000001.XSHE", "平安银行", "PAYH", "1991-04-03", "2200-01-01", "stock"),
+            ("000003.XSHE", "PT金田A", "PTJTA", "1991-07-03", "2002-06-14", "stock"),
+            ("688981.XSHG", "中芯国际", "ZXGJ", "2020-07-16", "2200-01-01", "stock"),
+            ("510300.XSHG", "沪深300ETF", "HS300ETF", "2012-05-28", "2200-01-01", "etf"),
+            ("000300.XSHG", "沪深300", "HS300", "2005-04-08", "2200-01-01", "index"),
+        ],
+        dtype=security_info_dtype,
+    )
+
+
+class SecurityTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = SecurityTable(securities())
+
+    def test_lookup(self):
+        table = self.table
+        self.assertEqual(len(table), 5)
+        self.assertIn("000001.XSHE", table)
+        self.assertEqual(table["688981.XSHG"]["alias"], "中芯国际")
+        self.assertIsNone(table.get("600000.XSHG"))
+        with self.assertRaises(KeyError):
+            table["600000.XSHG"]
+
+        np.testing.assert_array_equal(
+            table.index_of(["000300.XSHG", "600000.XSHG", "000001.XSHE"]), [4, -1, 0]
+        )
+        self.assertListEqual(
+            list(table.of_type(SecurityType.STOCK)["code"]),
+            ["000001.XSHE", "000003.XSHE", "688981.XSHG"],
+        )
+        self.assertEqual(len(table.of_type("lof")), 0)
+
+    def test_alive(self):
+        table = self.table
+        self.assertListEqual(
+            list(table.alive(datetime.date(2002, 6, 14))),
+            ["000001.XSHE", "000003.XSHE"],
+        )
+        self.assertListEqual(
+            list(table.alive(datetime.date(2002, 6, 15))), ["000001.XSHE"]
+        )
+        self.assertListEqual(
+            list(table.alive(datetime.date(2022, 1, 4), SecurityType.STOCK)),
+            ["000001.XSHE", "688981.XSHG"],
+        )
+        self.assertEqual(len(table.alive(datetime.date(2022, 1, 4), "lof")), 0)
+
+        dates = [
+            datetime.date(1990, 1, 1),
+            datetime.date(2002, 6, 14),
+            datetime.date(2020, 7, 16),
+        ]
+        mask = table.alive_mask(dates)
+        self.assertEqual(mask.shape, (3, 5))
+        np.testing.assert_array_equal(mask.sum(axis=1), [0, 2, 4])
+        np.testing.assert_array_equal(table.count_alive(dates), [0, 2, 4])
+        np.testing.assert_array_equal(
+            table.count_alive(dates, SecurityType.STOCK), [0, 2, 2]
+        )
+        np.testing.assert_array_equal(
+            table.alive_mask(dates, "etf")[2], [False, False, False, True, False]
+        )
+
+    def test_snapshot(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "securities.npz")
+            self.table.save(path)
+            table = SecurityTable.load(path)
+
+        self.assertEqual(table.data.dtype, np.dtype(security_info_dtype))
+        np.testing.assert_array_equal(table.data, self.table.data)
+        self.assertEqual(table["000003.XSHE"]["name"], "PTJTA")
+        np.testing.assert_array_equal(
+            table.count_alive(["2010-01-01"]), self.table.count_alive(["2010-01-01"])
+        )
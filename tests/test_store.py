@@ -0,0 +1,131 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from coretypes import FrameType, bars_dtype, bars_with_limit_dtype
+from coretypes.store import BarsStore
+
+
+def day_bars(start: str, n: int, dtype=bars_dtype) -> np.ndarray:
+    bars = np.zeros(n, dtype=dtype)
+    bars["frame"] = np.arange(np.datetime64(start), np.datetime64(start) + n)
+    bars["close"] = np.arange(n)
+    return bars
+
+
+class BarsStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = BarsStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_and_get(self):
+        code = "000001.XSHE"
+        self.assertEqual(len(self.store.get(code, FrameType.DAY)), 0)
+        self.assertIsNone(self.store.last_frame(code, FrameType.DAY))
+
+        self.assertEqual(
+            self.store.append(code, FrameType.DAY, day_bars("2022-01-01", 5)), 5
+        )
+        self.assertEqual(
+            self.store.append(code, FrameType.DAY, day_bars("2022-01-06", 5)), 10
+        )
+
+        bars = self.store.get(code, FrameType.DAY)
+        self.assertIsInstance(bars, np.memmap)
+        self.assertEqual(bars.dtype, bars_dtype)
+        self.assertEqual(len(bars), 10)
+        self.assertEqual(
+            self.store.last_frame(code, FrameType.DAY), np.datetime64("2022-01-10")
+        )
+
+        bars = self.store.get(
+            code, FrameType.DAY, datetime.date(2022, 1, 3), datetime.date(2022, 1, 7)
+        )
+        self.assertEqual(len(bars), 5)
+        self.assertEqual(bars["frame"][0], np.datetime64("2022-01-03"))
+        self.assertIsInstance(bars, np.memmap)
+
+        # frames must increase
+        with self.assertRaises(ValueError):
+            self.store.append(code, FrameType.DAY, day_bars("2022-01-10", 2))
+
+        with self.assertRaises(TypeError):
+            self.store.append(
+                code, FrameType.DAY, day_bars("2022-02-01", 2, bars_with_limit_dtype)
+            )
+
+        self.assertListEqual(self.store.codes(FrameType.DAY), [code])
+        self.assertListEqual(self.store.codes(FrameType.MIN1), [])
+
+    def test_torn_tail(self):
+        code = "600000.XSHG"
+        self.store.append(code, FrameType.MIN30, day_bars("2022-01-01", 3))
+
+        # simulate a crash in the middle of writing a record
+        with open(self.store.path(code, FrameType.MIN30), "ab") as f:
+            f.write(b"\x01" * 7)
+
+        self.assertEqual(len(self.store.get(code, FrameType.MIN30)), 3)
+        self.assertEqual(
+            self.store.append(code, FrameType.MIN30, day_bars("2022-01-04", 1)), 4
+        )
+        bars = self.store.get(code, FrameType.MIN30)
+        self.assertEqual(bars["frame"][-1], np.datetime64("2022-01-04"))
+
+    def test_uncommitted_records(self):
+        code = "600000.XSHG"
+        self.store.append(code, FrameType.DAY, day_bars("2022-01-01", 3))
+
+        # 进程在写完整条记录之后、发布记录数之前崩溃
+        with open(self.store.path(code, FrameType.DAY), "ab") as f:
+            f.write(day_bars("2022-01-04", 2).tobytes())
+
+        self.assertEqual(len(self.store.get(code, FrameType.DAY)), 3)
+        self.assertEqual(
+            self.store.append(code, FrameType.DAY, day_bars("2022-01-04", 1)), 4
+        )
+
+    def test_fsync_before_publish(self):
+        code = "600000.XSHG"
+        calls = []
+        fsync, pwrite = os.fsync, os.pwrite
+
+        def record_fsync(fd):
+            calls.append("fsync")
+            fsync(fd)
+
+        def record_pwrite(fd, data, offset):
+            calls.append("pwrite")
+            return pwrite(fd, data, offset)
+
+        with mock.patch("os.fsync", record_fsync), mock.patch(
+            "os.pwrite", record_pwrite
+        ):
+            self.store.append(code, FrameType.DAY, day_bars("2022-01-01", 3))
+        self.assertEqual(calls, ["fsync", "pwrite", "fsync"])
+
+        calls.clear()
+        store = BarsStore(self.tmp.name, fsync=False)
+        with mock.patch("os.fsync", record_fsync), mock.patch(
+            "os.pwrite", record_pwrite
+        ):
+            store.append(code, FrameType.DAY, day_bars("2022-01-04", 1))
+        self.assertEqual(calls, ["pwrite"])
+        self.assertEqual(len(self.store.get(code, FrameType.DAY)), 4)
+
+    def test_with_limit(self):
+        code = "000001.XSHE"
+        bars = day_bars("2022-01-01", 3, bars_with_limit_dtype)
+        bars["high_limit"] = 1.1
+        self.store.append(code, FrameType.DAY, bars)
+
+        actual = self.store.get(code, FrameType.DAY)
+        self.assertEqual(actual.dtype, bars_with_limit_dtype)
+        np.testing.assert_array_equal(actual, bars)
@@ -0,0 +1,78 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import (
+    bars_dtype_with_code,
+    compact_bars_dtype_with_code,
+    compact_limit_price_only_dtype,
+    limit_price_only_dtype,
+)
+from coretypes.symbols import SymbolTable
+
+
+class SymbolTableTest(unittest.TestCase):
+    def test_intern(self):
+        table = SymbolTable(["000001.XSHE", "600000.XSHG"])
+        self.assertEqual(len(table), 2)
+        self.assertIn("600000.XSHG", table)
+
+        ids = table.intern(["600000.XSHG", "000002.XSHE", "000001.XSHE", "000002.XSHE"])
+        self.assertEqual(ids.dtype, np.int32)
+        self.assertListEqual(ids.tolist(), [1, 2, 0, 2])
+        self.assertEqual(table.intern("000001.XSHE"), 0)
+
+        self.assertListEqual(
+            table.lookup(["000001.XSHE", "nonexist"]).tolist(), [0, -1]
+        )
+        self.assertEqual(len(table), 3)
+
+        self.assertListEqual(
+            table.decode([2, 0]).tolist(), ["000002.XSHE", "000001.XSHE"]
+        )
+        with self.assertRaises(KeyError):
+            table.decode([3])
+
+        # rebuild from codes
+        copy = SymbolTable(table.codes)
+        self.assertListEqual(copy.lookup(table.codes).tolist(), [0, 1, 2])
+
+    def test_grow(self):
+        table = SymbolTable()
+        codes = [f"{i:06d}.XSHE" for i in range(1000)]
+        for i in range(0, 1000, 100):
+            table.intern(codes[i : i + 100])
+
+        self.assertListEqual(table.codes.tolist(), codes)
+
+    def test_encode_array(self):
+        panel = np.zeros(3, dtype=bars_dtype_with_code)
+        panel["code"] = ["000001.XSHE", "600000.XSHG", "000001.XSHE"]
+        panel["close"] = [1, 2, 3]
+
+        table = SymbolTable()
+        compact = table.encode_array(panel)
+        self.assertEqual(compact.dtype, compact_bars_dtype_with_code)
+        self.assertListEqual(compact["code"].tolist(), [0, 1, 0])
+        np.testing.assert_array_equal(compact["close"], panel["close"])
+
+        np.testing.assert_array_equal(table.decode_array(compact), panel)
+
+    def test_limit_price(self):
+        arr = np.array(
+            [(datetime.date(2022, 1, 4), "000001.XSHE", 11.0, 9.0)],
+            dtype=limit_price_only_dtype,
+        )
+
+        table = SymbolTable()
+        compact = table.encode_array(arr)
+        self.assertEqual(compact.dtype, compact_limit_price_only_dtype)
+        self.assertEqual(compact["frame"][0], np.datetime64("2022-01-04"))
+
+        actual = table.decode_array(compact)
+        self.assertEqual(actual["code"][0], "000001.XSHE")
+        self.assertEqual(actual["high_limit"][0], 11.0)
+
+        with self.assertRaises(TypeError):
+            table.encode_array(compact)
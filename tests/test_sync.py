@@ -0,0 +1,131 @@
+import datetime
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from coretypes import (
+    BarsStore,
+    FrameType,
+    QuotesFetcher,
+    SyncEngine,
+    TradingCalendar,
+    bars_dtype,
+    security_info_dtype,
+)
+from coretypes.sync import plan_sync
+
+days = np.arange(
+    np.datetime64("2022-01-03"), np.datetime64("2022-03-01"), dtype="datetime64[D]"
+)
+days = days[np.is_busday(days)]
+
+
+def securities():
+    return np.array(
+        [
+            ("A", "A", "A", "2022-01-03", "2200-01-01", "stock"),
+            ("B", "B", "B", "2022-02-07", "2200-01-01", "stock"),
+            ("C", "C", "C", "2021-01-04", "2022-01-10", "stock"),
+            ("D", "D", "D", "2022-03-07", "2200-01-01", "stock"),
+            ("E", "E", "E", "2022-01-03", "2200-01-01", "index"),
+        ],
+        dtype=security_info_dtype,
+    )
+
+
+class MockFetcher(QuotesFetcher):
+    def __init__(self, fail=()):
+        self.calls = []
+        self.fail = set(fail)
+
+    async def get_security_list(self):
+        return securities()
+
+    async def get_all_trade_days(self):
+        return days
+
+    async def get_bars(self, sec, end, n_bars, frame_type, allow_unclosed=True):
+        self.calls.append((sec, end, n_bars))
+        if sec in self.fail:
+            raise ConnectionError(sec)
+
+        ipo = securities()["ipo"][securities()["code"] == sec][0]
+        frames = days.astype("datetime64[s]")
+        frames = frames[frames >= ipo]
+        i = np.searchsorted(frames, np.datetime64(end, "s"), "right")
+        bars = np.zeros(min(i, n_bars), dtype=bars_dtype)
+        bars["frame"] = frames[max(i - n_bars, 0) : i]
+        return bars
+
+
+class SyncTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = BarsStore(os.path.join(self.tmp.name, "bars"))
+        self.checkpoint = os.path.join(self.tmp.name, "sync.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_plan_sync(self):
+        calendar = TradingCalendar(days)
+        last = np.array(
+            ["2022-02-10", "NaT", "NaT", "NaT", "2022-02-25"], dtype="datetime64[s]"
+        )
+        tasks = plan_sync(securities(), last, calendar, FrameType.DAY, "2022-02-25")
+
+        self.assertListEqual(list(tasks["code"]), ["A", "B", "C"])
+        self.assertEqual(tasks["start"][0], np.datetime64("2022-02-11"))
+        np.testing.assert_array_equal(tasks["n_bars"], [11, 15, 6])
+        # delisted: only up to its end date
+        self.assertEqual(tasks["end"][2], np.datetime64("2022-01-10"))
+
+        tasks = plan_sync(
+            securities(), last, calendar, FrameType.DAY, "2022-02-25", "2022-02-21"
+        )
+        np.testing.assert_array_equal(tasks["n_bars"], [11, 5])
+
+    async def test_run(self):
+        fetcher = MockFetcher(fail=["B"])
+        engine = SyncEngine(
+            fetcher,
+            self.store,
+            concurrency=2,
+            chunk_size=10,
+            checkpoint=self.checkpoint,
+        )
+        end = datetime.date(2022, 2, 25)
+
+        progress = await engine.run([FrameType.DAY], end=end, types=["stock"])
+        self.assertEqual(progress.tasks, 3)
+        self.assertEqual(progress.done, 2)
+        self.assertEqual(progress.failed, 1)
+        self.assertIn(("B", FrameType.DAY), progress.errors)
+        self.assertEqual(progress.bars_fetched, 40 + 6)
+        self.assertEqual(len(self.store.get("A", FrameType.DAY)), 40)
+        self.assertEqual(
+            self.store.last_frame("C", FrameType.DAY), np.datetime64("2022-01-10")
+        )
+
+        with open(self.checkpoint) as f:
+            done = json.load(f)["1d"]["done"]
+        self.assertListEqual(sorted(done), ["A", "C", "D"])
+
+        # resume: only the failed security is fetched
+        fetcher.fail.clear()
+        fetcher.calls.clear()
+        progress = await engine.run([FrameType.DAY], end=end, types=["stock"])
+        self.assertEqual({call[0] for call in fetcher.calls}, {"B"})
+        self.assertEqual(progress.skipped, 3)
+        self.assertEqual(progress.bars_fetched, 15)
+
+        # incremental: the next day only fetches one bar per security
+        fetcher.calls.clear()
+        progress = await engine.run(
+            [FrameType.DAY], end=datetime.date(2022, 2, 28), types=["stock"]
+        )
+        self.assertEqual(progress.bars_planned, 2)
+        self.assertEqual(sorted(call[0] for call in fetcher.calls), ["A", "B"])
@@ -0,0 +1,115 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from coretypes import FrameType, bars_dtype
+from coretypes.resample import minutes_of_frame, minutes_per_day, resample
+from coretypes.trade_calendar import TradingCalendar
+
+
+def dt(s: str) -> np.datetime64:
+    return np.datetime64(s, "s")
+
+
+class TradingCalendarTest(unittest.TestCase):
+    def setUp(self):
+        days = np.arange("2021-12-20", "2022-02-15", dtype="datetime64[D]")
+        days = days[np.is_busday(days)]
+        # Spring Festival
+        holiday = (days >= np.datetime64("2022-01-31")) & (
+            days <= np.datetime64("2022-02-04")
+        )
+        self.cal = TradingCalendar(days[~holiday].astype(object))
+
+    def test_tables(self):
+        weeks = self.cal.frames(FrameType.WEEK)
+        self.assertIn(dt("2022-01-28"), weeks)
+        self.assertNotIn(dt("2022-02-04"), weeks)
+
+        months = self.cal.frames(FrameType.MONTH)
+        self.assertListEqual(
+            months.astype("datetime64[D]").astype(str).tolist(),
+            ["2021-12-31", "2022-01-28", "2022-02-14"],
+        )
+        self.assertEqual(len(self.cal.frames(FrameType.MIN30)), 8)
+        self.assertListEqual(
+            self.cal.is_trade_day(["2022-01-28", "2022-01-31"]).tolist(), [True, False]
+        )
+
+    def test_floor_ceil(self):
+        cal = self.cal
+        frames = np.array(
+            [dt("2022-01-04T10:07"), dt("2022-01-04T12:00"), dt("2022-01-29T10:00")]
+        )
+
+        np.testing.assert_array_equal(
+            cal.floor(frames, FrameType.MIN30),
+            [dt("2022-01-04T10:00"), dt("2022-01-04T11:30"), dt("2022-01-28T15:00")],
+        )
+        np.testing.assert_array_equal(
+            cal.ceil(frames, FrameType.MIN30),
+            [dt("2022-01-04T10:30"), dt("2022-01-04T13:30"), dt("2022-02-07T10:00")],
+        )
+        np.testing.assert_array_equal(
+            cal.floor(frames, FrameType.DAY),
+            [dt("2022-01-04"), dt("2022-01-04"), dt("2022-01-28")],
+        )
+        np.testing.assert_array_equal(
+            cal.ceil(datetime.date(2022, 1, 29), FrameType.WEEK), dt("2022-02-11")
+        )
+        np.testing.assert_array_equal(
+            cal.floor(dt("2022-01-04T09:00"), FrameType.MIN60), dt("2022-01-03T15:00")
+        )
+
+    def test_shift_count(self):
+        cal = self.cal
+        ends = np.array([dt("2022-01-04T10:00"), dt("2022-02-07T10:30")])
+        np.testing.assert_array_equal(
+            cal.shift(ends, -3, FrameType.MIN30),
+            [dt("2022-01-03T14:00"), dt("2022-01-28T14:30")],
+        )
+        np.testing.assert_array_equal(
+            cal.shift(ends, np.array([1, 2]), FrameType.DAY),
+            [dt("2022-01-05"), dt("2022-02-09")],
+        )
+        self.assertTrue(np.isnat(cal.shift(ends, -1000, FrameType.DAY)).all())
+
+        self.assertListEqual(
+            cal.count(
+                ["2022-01-28", "2022-01-01"],
+                ["2022-02-07", "2022-01-31"],
+                FrameType.DAY,
+            ).tolist(),
+            [2, 20],
+        )
+        self.assertEqual(
+            cal.count(dt("2022-01-04T11:00"), dt("2022-01-04T13:30"), FrameType.MIN30),
+            3,
+        )
+        self.assertEqual(cal.count("2022-01-30", "2022-01-29", FrameType.DAY), 0)
+
+    def test_get_frames(self):
+        frames = self.cal.get_frames(
+            dt("2022-01-28T14:00"), dt("2022-02-07T10:30"), FrameType.MIN60
+        )
+        self.assertListEqual(
+            frames.astype(str).tolist(),
+            ["2022-01-28T14:00:00", "2022-01-28T15:00:00", "2022-02-07T10:30:00"],
+        )
+        self.assertEqual(
+            len(self.cal.get_frames("2022-01-01", "2022-01-31", FrameType.DAY)), 20
+        )
+
+    def test_sessions_agree_with_resample(self):
+        day = dt("2022-01-04")
+        minutes = self.cal.get_frames(day, day + 86400, FrameType.MIN1)
+        self.assertEqual(len(minutes), minutes_per_day)
+
+        bars = np.zeros(len(minutes), dtype=bars_dtype)
+        bars["frame"] = minutes
+        for frame_type in minutes_of_frame:
+            np.testing.assert_array_equal(
+                resample(bars, frame_type)["frame"],
+                self.cal.get_frames(day, day + 86400, frame_type),
+            )
@@ -0,0 +1,134 @@
+import asyncio
+import datetime
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from coretypes import QuotesFetcher, valuation_dtype
+from coretypes.valuation import ValuationCube
+
+codes = ["000001.XSHE", "000002.XSHE", "600000.XSHG"]
+days = np.array(["2022-01-04", "2022-01-05", "2022-01-06"], dtype="datetime64[D]")
+
+
+def make(day, codes, offset=0.0):
+    valuations = np.zeros(len(codes), dtype=valuation_dtype)
+    valuations["code"] = codes
+    valuations["day"] = np.datetime64(day, "s")
+    base = np.arange(len(codes), dtype=np.float64) + offset
+    valuations["market_cap"] = base * 10
+    valuations["pe_ratio"] = base[::-1]
+    return valuations
+
+
+class MockFetcher(QuotesFetcher):
+    def __init__(self):
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.max_tasks = 0
+
+    async def get_valuation(self, code, day):
+        self.calls.append((tuple(code), day))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        self.max_tasks = max(self.max_tasks, len(asyncio.all_tasks()))
+        try:
+            await asyncio.sleep(0.001)
+        finally:
+            self.running -= 1
+        i = int(np.searchsorted(days, np.datetime64(day)))
+        valuations = make(day, code)
+        valuations["market_cap"] = [(codes.index(c) + i) * 10 for c in code]
+        return valuations
+
+
+class ValuationCubeTest(unittest.IsolatedAsyncioTestCase):
+    def test_append_and_query(self):
+        cube = ValuationCube(["market_cap", "pe_ratio"], codes[:2])
+        cube.append(make(days[0], codes[:2]))
+        # a day may be filled in several batches, and new codes add columns
+        cube.append(
+            np.concatenate([make(days[1], codes[:1]), make(days[1], codes[1:])])
+        )
+
+        self.assertEqual(cube.shape, (2, 3))
+        np.testing.assert_array_equal(cube.days, days[:2])
+        np.testing.assert_array_equal(
+            cube.cross_section(days[0], "market_cap"), [0, 10, np.nan]
+        )
+        np.testing.assert_array_equal(
+            cube.cross_section(datetime.date(2022, 1, 5), "market_cap"), [0, 0, 10]
+        )
+
+        frames, values = cube.series("000002.XSHE", "market_cap")
+        np.testing.assert_array_equal(frames, days[:2])
+        np.testing.assert_array_equal(values, [10, 0])
+
+        frames, matrix = cube.between("pe_ratio", start=days[1])
+        self.assertEqual(matrix.shape, (1, 3))
+
+        with self.assertRaises(KeyError):
+            cube.cross_section(days[2], "market_cap")
+        with self.assertRaises(ValueError):
+            cube.append(make(days[0], codes))
+        with self.assertRaises(ValueError):
+            ValuationCube(["unknown"])
+
+        # growing beyond the initial capacity keeps old data
+        for i in range(40):
+            cube.append(make(days[1] + i + 1, codes + [f"X{i}"]))
+        self.assertEqual(cube.shape, (42, 43))
+        np.testing.assert_array_equal(
+            cube.cross_section(days[0], "market_cap")[:3], [0, 10, np.nan]
+        )
+
+    def test_rank_and_quantile(self):
+        cube = ValuationCube(["market_cap"])
+        valuations = make(days[0], codes + ["X"])
+        valuations["market_cap"] = [3.0, np.nan, 1.0, 2.0]
+        cube.append(valuations)
+
+        np.testing.assert_array_equal(cube.rank("market_cap")[0], [2, np.nan, 0, 1])
+        np.testing.assert_array_equal(
+            cube.rank("market_cap", pct=True)[0], [1, np.nan, 0, 0.5]
+        )
+        np.testing.assert_array_equal(cube.quantile("market_cap", 0.5), [2.0])
+        self.assertEqual(cube.quantile("market_cap", [0, 1]).shape, (2, 1))
+
+    async def test_update_and_persist(self):
+        fetcher = MockFetcher()
+        cube = ValuationCube(["market_cap", "pe_ratio"])
+        await cube.update(fetcher, days[:2], codes, batch_size=2, concurrency=2)
+        self.assertEqual(len(fetcher.calls), 4)
+        self.assertEqual(fetcher.max_running, 2)
+
+        # requests are created within a bounded window, not all up front
+        fetcher = MockFetcher()
+        await ValuationCube().update(fetcher, days, codes, batch_size=1, concurrency=2)
+        self.assertEqual(len(fetcher.calls), 9)
+        self.assertLessEqual(fetcher.max_tasks, 3)
+        self.assertEqual(cube.shape, (2, 3))
+        np.testing.assert_array_equal(
+            cube.cross_section(days[1], "market_cap"), [10, 20, 30]
+        )
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "valuation")
+            cube.save(path)
+            loaded = ValuationCube.load(path)
+
+            self.assertIsInstance(loaded.field("market_cap"), np.memmap)
+            np.testing.assert_array_equal(loaded.days, cube.days)
+            np.testing.assert_array_equal(loaded.codes, cube.codes)
+
+            # only the last day and later are fetched again
+            fetcher.calls.clear()
+            await loaded.update(fetcher, days, codes, batch_size=3)
+            self.assertEqual([day for _, day in fetcher.calls], list(days[1:].tolist()))
+            self.assertEqual(loaded.shape, (3, 3))
+            np.testing.assert_array_equal(
+                loaded.field("market_cap")[:2], cube.field("market_cap")
+            )
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+
+from coretypes import (
+    BarsFrame,
+    FrameType,
+    bars_dtype,
+    bars_dtype_ids,
+    bars_dtype_with_code,
+    bars_with_limit_dtype,
+)
+from coretypes.wire import dumps, loads
+
+
+def make_bars(n: int, dtype=bars_dtype) -> np.ndarray:
+    bars = np.zeros(n, dtype=dtype)
+    bars["frame"] = np.datetime64("2022-01-03") + np.arange(n)
+    bars["close"] = np.arange(n)
+    bars["volume"] = np.arange(n) * 100
+    return bars
+
+
+class WireTest(unittest.TestCase):
+    def test_single(self):
+        bars = make_bars(5)
+        msg = dumps(bars, FrameType.DAY, "000001.XSHE")
+
+        frame_type, batch = loads(msg)
+        self.assertEqual(frame_type, FrameType.DAY)
+        actual = batch["000001.XSHE"]
+        self.assertEqual(actual.dtype, bars_dtype)
+        np.testing.assert_array_equal(actual, bars)
+
+        # zero copy
+        buffer = bytearray(msg)
+        _, batch = loads(buffer)
+        batch["000001.XSHE"]["close"][0] = 100
+        self.assertEqual(loads(buffer)[1]["000001.XSHE"]["close"][0], 100)
+
+    def test_batch_columnar(self):
+        batch = {
+            "000001.XSHE": make_bars(3, bars_with_limit_dtype),
+            "600000.XSHG": make_bars(7, bars_with_limit_dtype),
+            "000002.XSHE": make_bars(0, bars_with_limit_dtype),
+        }
+        frame_type, actual = loads(dumps(batch, columnar=True))
+        self.assertIsNone(frame_type)
+        self.assertListEqual(list(actual.keys()), list(batch.keys()))
+
+        for code, bars in batch.items():
+            self.assertIsInstance(actual[code], BarsFrame)
+            np.testing.assert_array_equal(actual[code].to_bars(), bars)
+            self.assertEqual(actual[code]["volume"].ctypes.data % 8, 0)
+
+    def test_panel(self):
+        panel = np.zeros(4, dtype=bars_dtype_with_code)
+        panel["code"] = ["B", "A", "B", "A"]
+        panel["close"] = [1, 2, 3, 4]
+
+        _, actual = loads(dumps(panel, FrameType.MIN1))
+        self.assertListEqual(actual["A"]["close"].tolist(), [2, 4])
+        self.assertListEqual(actual["B"]["close"].tolist(), [1, 3])
+        self.assertEqual(actual["A"].dtype, bars_dtype)
+
+    def test_dtype_ids(self):
+        # the wire format shares dtype ids with BarsStore and the codec
+        for dtype, dtype_id in bars_dtype_ids.items():
+            msg = dumps(make_bars(1, dtype), FrameType.DAY, "A")
+            self.assertEqual(msg[5], dtype_id)
+            self.assertEqual(loads(msg)[1]["A"].dtype, dtype)
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            loads(b"\x00" * 16)
+
+        with self.assertRaises(TypeError):
+            dumps({"A": make_bars(1), "B": make_bars(1, bars_with_limit_dtype)})